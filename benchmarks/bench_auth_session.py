@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark for authenticated feed fetching against a local stand-in login server
+
+Runs a source with several subscriber-only feeds a number of times and
+reports the logins each run needed: the first run logs in, later runs
+reuse the encrypted cookie jar, and a run after the server drops all
+sessions logs in once for all of its feeds.
+
+Usage: python benchmarks/bench_auth_session.py [--feeds N] [--runs N]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from scrapers.base_scraper import BaseScraper
+from utils.auth_session import AuthSession
+
+# Cookies are not kept for bare IP addresses, so the stand-in is reached by name
+HOST = 'localhost'
+PORT = 8743
+CREDENTIALS = 'reader@example.com:hunter2'
+
+FEED = (
+    '<?xml version="1.0"?><rss version="2.0"><channel><title>Members</title>'
+    '<item><title>Markets rally on {name}</title><link>https://example.com/{name}</link></item>'
+    '</channel></rss>'
+)
+
+
+class BenchScraper(BaseScraper):
+    async def scrape(self):
+        async with self:
+            return await self.fetch_rss_feeds(self.config['rss_feeds'])
+
+
+class LoginStandIn:
+    """Form login handing out session cookies, and feeds that need one"""
+
+    def __init__(self, login_delay: float):
+        self.login_delay = login_delay
+        self.sessions = set()
+        self.logins = 0
+        self.rejected = 0
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post('/login', self._handle_login)
+        app.router.add_get('/feed/{name}', self._handle_feed)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, HOST, PORT).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle_login(self, request):
+        from aiohttp import web
+
+        form = await request.post()
+        # A real login is a few redirects and a slow password check
+        await asyncio.sleep(self.login_delay)
+        if f"{form.get('email')}:{form.get('password')}" != CREDENTIALS:
+            return web.Response(status=403)
+        self.logins += 1
+        token = os.urandom(16).hex()
+        self.sessions.add(token)
+        response = web.Response(text='welcome')
+        response.set_cookie('session', token, max_age=3600, httponly=True)
+        return response
+
+    async def _handle_feed(self, request):
+        from aiohttp import web
+
+        if request.cookies.get('session') not in self.sessions:
+            self.rejected += 1
+            return web.Response(status=401)
+        return web.Response(text=FEED.format(name=request.match_info['name']), content_type='application/rss+xml')
+
+
+async def run(feeds: int, runs: int, login_delay: float):
+    server = LoginStandIn(login_delay)
+    await server.start()
+    os.environ['BENCH_CREDENTIALS'] = CREDENTIALS
+    cookie_dir = tempfile.mkdtemp(prefix='bench-cookies-')
+    auth_config = {'login_url': f"http://{HOST}:{PORT}/login", 'credentials_env': 'BENCH_CREDENTIALS', 'success_cookie': 'session'}
+    config = {'rss_feeds': [f"http://{HOST}:{PORT}/feed/{i}" for i in range(feeds)], 'max_articles_per_run': 10}
+
+    try:
+        for index in range(runs):
+            label = 'cold' if index == 0 else 'reuse'
+            if index == runs - 1 and runs > 2:
+                # Sessions revoked server-side: every feed gets a 401
+                server.sessions.clear()
+                label = 'revoked'
+
+            # A new scraper per run, as a scheduled run starts a new process
+            scraper = BenchScraper(config)
+            scraper.auth = AuthSession.from_config('bench', auth_config, cookie_dir)
+            logins, rejected = server.logins, server.rejected
+            start = time.perf_counter()
+            articles = await scraper.scrape()
+            elapsed = time.perf_counter() - start
+            print(f"run {index + 1} ({label}): {len(articles)}/{feeds} feeds, {server.logins - logins} logins, "
+                  f"{server.rejected - rejected} 401s, {elapsed * 1000:.1f} ms")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authenticated session benchmark")
+    parser.add_argument('--feeds', type=int, default=4)
+    parser.add_argument('--runs', type=int, default=4)
+    parser.add_argument('--login-delay', type=float, default=0.3, help="Seconds the stand-in takes per login")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.feeds, args.runs, args.login_delay))
+
+
+if __name__ == "__main__":
+    main()
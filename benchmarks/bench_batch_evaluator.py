@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark for sweeping filter settings with the batch evaluator
+
+Usage: python benchmarks/bench_batch_evaluator.py [--articles N] [--configs N] [--check N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import SOURCES, WORDS, _BenchScraper, make_entries
+from utils.article_filter import ArticleFilter
+from utils.batch_evaluator import COUNTERS, BatchEvaluator
+from utils.storage import Storage
+
+
+def make_articles(count: int):
+    """Parse synthetic entries published over the last two days"""
+    rng = random.Random(11)
+    now = time.time()
+    scrapers = [type(f"{name.title()}Scraper", (_BenchScraper,), {})({}) for name in SOURCES]
+    articles = []
+    for i, entry in enumerate(make_entries(count)):
+        entry['published'] = time.gmtime(now - rng.randint(0, 48 * 3600))
+        articles.append(scrapers[i % len(scrapers)]._parse_rss_entry(entry))
+    return articles, now
+
+
+def check(articles, now, configurations, results):
+    """Run ArticleFilter with each configuration and report counters the sweep got wrong"""
+    storage = Storage(tempfile.mkdtemp(prefix='bench-history-'))
+    differing = 0
+    for position, filters in enumerate(configurations):
+        article_filter = ArticleFilter({'filters': filters}, storage)
+        article_filter.now = datetime.utcfromtimestamp(now)
+        article_filter.filter_articles(articles, log_stats=False)
+        stats = article_filter.last_stats
+        wrong = {counter: (getattr(stats, counter), int(results.iloc[position][counter]))
+                 for counter in COUNTERS if getattr(stats, counter) != results.iloc[position][counter]}
+        if wrong:
+            differing += 1
+            print(f"  config {position} (threshold {filters['similarity_threshold']}): filter vs sweep {wrong}")
+    print(f"check: {differing} of {len(configurations)} configurations differ from ArticleFilter")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch filter evaluation benchmark")
+    parser.add_argument('--articles', type=int, default=20000)
+    parser.add_argument('--configs', type=int, default=50)
+    parser.add_argument('--check', type=int, default=0, help="configurations to re-run through ArticleFilter")
+    args = parser.parse_args()
+
+    articles, now = make_articles(args.articles)
+
+    start = time.perf_counter()
+    evaluator = BatchEvaluator(articles, now=now)
+    print(f"precompute: {len(articles)} articles, {len(evaluator.edge_source)} edges in {time.perf_counter() - start:.2f}s")
+
+    base = {'exclude_keywords': ['sponsored', 'celebrity']}
+    rng = random.Random(3)
+    configurations = [
+        dict(base,
+             similarity_threshold=rng.choice([0.6, 0.7, 0.75, 0.8, 0.9]),
+             duplicate_threshold_hours=rng.choice([6, 12, 24, 48]),
+             required_keywords=rng.sample(WORDS, rng.randint(2, 12)))
+        for _ in range(args.configs)
+    ]
+
+    start = time.perf_counter()
+    results = evaluator.sweep(configurations)
+    elapsed = time.perf_counter() - start
+    print(f"sweep: {len(configurations)} configurations in {elapsed:.2f}s "
+          f"({elapsed / len(configurations) * 1000:.1f} ms each)")
+    print(results.describe().loc[['min', 'max'], ['final_count', 'duplicates_by_similarity']].to_string())
+
+    if args.check:
+        check(articles, now, configurations[:args.check], results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Check that indexed duplicate detection decides exactly as comparing every pair
+
+Runs headlines through SimilarityIndex and through the original loop that
+compares each article with every accepted one, and reports any article
+the two decide differently, with the time each took. The built-in
+headlines are real coverage of the same stories by several outlets;
+archived feed files (as read by `main.py backfill`) can be added.
+
+Usage: python benchmarks/bench_dedup_parity.py [FEED_DIR ...] [--repeat N]
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+from difflib import SequenceMatcher
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.article import Article
+from utils.article_features import SimilarityIndex, extract_entities, shares_key_info
+
+# (source, title, description) as published; stories are covered by several outlets
+HEADLINES = [
+    ('bloomberg', "Apple shares slump after earnings miss", "Apple Inc. shares fell in late trading after quarterly revenue missed analyst estimates on weaker iPhone demand in China."),
+    ('cnbc', "Apple share slumps after earning misses", "Shares of Apple dropped after the company reported quarterly revenue that fell short of Wall Street expectations."),
+    ('wsj', "Apple Stock Falls as iPhone Sales Disappoint", ""),
+    ('ft', "Fed holds rates steady, signals two cuts this year", "The Federal Reserve left its benchmark rate unchanged and officials penciled in two quarter-point reductions before year-end."),
+    ('cnbc', "Fed holds rates steady and signals two cuts this year", "The Federal Reserve kept rates unchanged on Wednesday, while signaling two cuts later this year."),
+    ('bloomberg', "Powell Says Fed Needs More Confidence Before Cutting Rates", ""),
+    ('wsj', "KKR agrees $5bn buyout of software-maker Envestnet", "The private equity group will pay $63 a share in cash for the wealth management software provider."),
+    ('ft', "KKR agrees $5bn buyout of software maker Envestnet", "Bain Capital-backed deal values the wealth technology company at about $4.5bn excluding debt."),
+    ('bloomberg', "Bain Capital to Buy Envestnet for $4.5 Billion", ""),
+    ('economist', "Why oil prices are falling despite war in the Middle East", "Traders are more worried about weak demand in China than about supply disruptions."),
+    ('forbes', "Oil prices fall as China demand worries outweigh Middle East risk", ""),
+    ('cnbc', "Oil falls as China demand worries outweigh Middle East supply risk", ""),
+    ('wsj', "Nvidia Becomes World's Most Valuable Company", "The chip maker's market value surpassed Microsoft's as investors bet on artificial intelligence."),
+    ('bloomberg', "Nvidia becomes world's most valuable company, overtaking Microsoft", ""),
+    ('ft', "Nvidia overtakes Microsoft as world's most valuable company", ""),
+    ('cnbc', "Tesla deliveries drop for first time in four years", "Tesla delivered fewer vehicles in the first quarter than a year earlier, as competition from Chinese makers intensified."),
+    ('bloomberg', "Tesla Deliveries Drop for the First Time in Four Years", ""),
+    ('forbes', "Tesla stock slides after first delivery decline since 2020", ""),
+    ('ft', "ECB cuts interest rates for first time since 2019", "The European Central Bank lowered its deposit rate by a quarter point to 3.75 per cent."),
+    ('wsj', "ECB Cuts Rates for First Time Since 2019", ""),
+    ('economist', "The ECB cuts rates before the Fed. Will it regret it?", ""),
+    ('bloomberg', "Boeing CEO Calhoun to step down in management shake-up", "Chief Executive Dave Calhoun will leave at the end of the year as the planemaker grapples with a safety crisis."),
+    ('cnbc', "Boeing CEO Dave Calhoun to step down at end of year in management shake-up", ""),
+    ('wsj', "Boeing CEO to Exit as Part of Broad Management Shake-Up", ""),
+    ('ft', "Bitcoin hits record high above $73,000", "The largest cryptocurrency rose to an all-time high, driven by inflows into US spot exchange-traded funds."),
+    ('forbes', "Bitcoin Hits New Record High Above $73,000", ""),
+    ('cnbc', "Bitcoin tops $73,000 to hit fresh record", ""),
+    ('wsj', "US job growth beats expectations as unemployment edges up", "Employers added 275,000 jobs in February, but the unemployment rate rose to 3.9%."),
+    ('bloomberg', "US Job Growth Beats Forecasts While Unemployment Rate Rises", ""),
+    ('cnbc', "Jobs report February 2024: Payrolls rose 275,000", ""),
+    ('ft', "Shein files confidentially for London IPO", ""),
+    ('bloomberg', "Shein Files Confidentially for London IPO After US Setback", ""),
+    ('economist', "China's property crisis deepens as Country Garden misses payment", ""),
+    ('ft', "Country Garden misses bond payment as China property crisis deepens", ""),
+    ('wsj', "Microsoft to invest $10 billion in OpenAI", ""),
+    ('cnbc', "Microsoft announces multibillion-dollar investment in ChatGPT-maker OpenAI", ""),
+    ('bloomberg', "Microsoft Invests $10 Billion in ChatGPT Maker OpenAI", ""),
+    ('forbes', "Goldman Sachs profit jumps on trading and investment banking rebound", ""),
+    ('wsj', "Goldman Sachs Profit Jumps on Trading, Dealmaking Rebound", ""),
+    ('ft', "Goldman profits jump as dealmaking rebounds", ""),
+]
+
+
+def load_headlines(feed_dirs):
+    """Articles of the built-in headlines plus those in archived feed files"""
+    now = time.time()
+    articles = [
+        Article(hashlib.md5(f"{source}:{title}".encode()).digest(), source, title,
+                f"https://{source}.example.com/{index}", description, published_ts=now - index)
+        for index, (source, title, description) in enumerate(HEADLINES)
+    ]
+    if feed_dirs:
+        from scrapers.feed_file_parser import find_feed_files, parse_feed_file
+
+        for root in feed_dirs:
+            for path in find_feed_files(root):
+                articles.extend(parse_feed_file(path, os.path.basename(os.path.dirname(path)) or 'archive')[1])
+    return articles
+
+
+def ratio(text1: str, text2: str) -> float:
+    """Similarity as ArticleFilter computed it before the index"""
+    if not text1 or not text2:
+        return 0.0
+    return SequenceMatcher(None, text1, text2).ratio()
+
+
+def baseline(articles, threshold: float):
+    """Position of the first accepted article each one is similar to, comparing every pair"""
+    accepted, decisions = [], []
+    for article in articles:
+        title, description = article.normalized_title, article.normalized_description
+        match = None
+        for position, seen in enumerate(accepted):
+            seen_title, seen_description = seen.normalized_title, seen.normalized_description
+            if ratio(title, seen_title) > threshold or \
+                    shares_key_info(extract_entities(title), extract_entities(seen_title)) or \
+                    (len(description) > 50 and len(seen_description) > 50 and
+                     ratio(description[:200], seen_description[:200]) > 0.8):
+                match = position
+                break
+        decisions.append(match)
+        if match is None:
+            accepted.append(article)
+    return decisions
+
+
+def indexed(articles, threshold: float):
+    """Position of the first accepted article each one is similar to, through SimilarityIndex"""
+    index = SimilarityIndex(threshold)
+    decisions = []
+    for article in articles:
+        match = index.find_similar(article.features)
+        decisions.append(match)
+        if match is None:
+            index.add(article.features)
+    return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Duplicate detection parity check")
+    parser.add_argument('feed_dirs', nargs='*', help="Directories of archived feed files to add")
+    parser.add_argument('--threshold', type=float, default=0.75)
+    parser.add_argument('--repeat', type=int, default=1, help="Copies of the corpus, for timing")
+    args = parser.parse_args()
+
+    articles = load_headlines(args.feed_dirs) * args.repeat
+    articles.sort(key=lambda x: (x.priority, x.published_ts), reverse=True)
+
+    start = time.perf_counter()
+    expected = baseline(articles, args.threshold)
+    baseline_seconds = time.perf_counter() - start
+    for article in articles:
+        article._features = None
+    start = time.perf_counter()
+    found = indexed(articles, args.threshold)
+    indexed_seconds = time.perf_counter() - start
+
+    mismatches = [position for position, (a, b) in enumerate(zip(expected, found)) if a != b]
+    for position in mismatches[:20]:
+        print(f"MISMATCH {articles[position].title!r}: all pairs {expected[position]}, index {found[position]}")
+    duplicates = sum(match is not None for match in expected)
+    print(f"{len(articles)} articles, {duplicates} duplicates; all pairs {baseline_seconds:.3f}s, "
+          f"index {indexed_seconds:.3f}s; {len(mismatches)} decisions differ")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
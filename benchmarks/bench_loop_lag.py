@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark for event-loop blocking by feed parsing, inline versus offloaded
+
+Parses synthetic feed documents on the loop and in a process pool under
+the loop monitor, and reports the lag and blocked time each way.
+
+Usage: python benchmarks/bench_loop_lag.py [--feeds N] [--entries N]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.loop_monitor import LoopMonitor
+
+
+def make_feed(index: int, entries: int) -> bytes:
+    """RSS document with HTML summaries"""
+    items = ''.join(
+        f"<item><title>Markets move on report {index}-{i}</title><link>https://example.com/{index}/{i}</link>"
+        f"<description>&lt;p&gt;Stocks &lt;b&gt;rose&lt;/b&gt; after report {i} on rates&lt;/p&gt;</description>"
+        f"<pubDate>Mon, 06 Jan 2025 10:{i % 60:02d}:00 GMT</pubDate></item>"
+        for i in range(entries)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Bench</title>{items}</channel></rss>'.encode('utf-8')
+
+
+def parse(body: bytes) -> int:
+    import feedparser
+
+    return len(feedparser.parse(body).entries)
+
+
+async def run(feeds, mode: str, pool=None):
+    monitor = LoopMonitor({'threshold_ms': 20})
+    monitor.start()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    with monitor.stage('parse'):
+        if mode == 'inline':
+            for body in feeds:
+                parse(body)
+                # Yield between feeds, as fetch_rss_feeds does between scrapers
+                await asyncio.sleep(0)
+        else:
+            await asyncio.gather(*(loop.run_in_executor(pool, parse, body) for body in feeds))
+    elapsed = time.perf_counter() - start
+    report = await monitor.stop()
+    blocked = sum(report['blocked_seconds'].values())
+    print(f"{mode:9s} {elapsed:.2f}s wall, lag p99 {report['lag_p99_ms']:.0f} ms, max {report['lag_max_ms']:.0f} ms, "
+          f"blocked {blocked:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag benchmark")
+    parser.add_argument('--feeds', type=int, default=24)
+    parser.add_argument('--entries', type=int, default=30)
+    args = parser.parse_args()
+
+    feeds = [make_feed(index, args.entries) for index in range(args.feeds)]
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        # Warm this process and the workers so imports are not measured
+        parse(feeds[0])
+        list(pool.map(parse, feeds[:2]))
+        asyncio.run(run(feeds, 'inline'))
+        asyncio.run(run(feeds, 'offloaded', pool))
+
+
+if __name__ == "__main__":
+    main()
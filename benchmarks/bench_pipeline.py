@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the parse/filter pipeline on synthetic feed entries
+
+Usage: python benchmarks/bench_pipeline.py [--articles N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from scrapers.base_scraper import BaseScraper
+from utils.article_filter import ArticleFilter
+from utils.storage import Storage
+
+WORDS = [
+    'market', 'stocks', 'bonds', 'fed', 'rate', 'inflation', 'bitcoin', 'crypto',
+    'ai', 'startup', 'buyout', 'fund', 'defense', 'space', 'election', 'policy',
+    'earnings', 'merger', 'tech', 'trading', 'investment', 'bank', 'china', 'oil'
+]
+COMPANIES = ['Apple', 'Microsoft', 'Goldman Sachs', 'SpaceX', 'Blackstone', 'OpenAI', 'Boeing', 'Tesla']
+SOURCES = ['bloomberg', 'cnbc', 'ft', 'wsj', 'forbes', 'economist']
+
+
+class _Tag:
+    def __init__(self, term):
+        self.term = term
+
+
+class _BenchScraper(BaseScraper):
+    async def scrape(self):
+        return []
+
+
+def make_entries(count: int, seed: int = 7):
+    """Build feedparser-like entries where about a fifth re-report an earlier story"""
+    rng = random.Random(seed)
+    vocabulary = WORDS + [''.join(rng.choice('abcdefghilmnoprstu') for _ in range(rng.randint(3, 9))) for _ in range(2000)]
+    now = time.gmtime()
+    stories = []
+    entries = []
+    for i in range(count):
+        if stories and rng.random() < 0.2:
+            # Same story from another outlet, lightly reworded
+            company, words, amount = rng.choice(stories)
+            words = words[:-1] + [rng.choice(vocabulary)]
+        else:
+            company = rng.choice(COMPANIES)
+            words = [rng.choice(vocabulary) for _ in range(8)]
+            amount = rng.randint(1, 500)
+            stories.append((company, words, amount))
+        text = ' '.join(words)
+        entries.append({
+            'title': f"{company} {text} {amount} billion",
+            'link': f"https://example.com/{rng.choice(SOURCES)}/{i}?utm_source=rss",
+            'summary': f"<p>{company} said {text} market.</p>",
+            'published': now,
+            'tags': [_Tag(rng.choice(WORDS)), _Tag(rng.choice(WORDS))],
+            'author': rng.choice(['Staff', 'Reuters', 'Jane Doe'])
+        })
+    return entries
+
+
+def bench_parse(entries):
+    """Parse entries and report time, allocation peak and retained bytes per article"""
+    scrapers = [type(f"{name.title()}Scraper", (_BenchScraper,), {})({}) for name in SOURCES]
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    articles = []
+    for i, entry in enumerate(entries):
+        articles.append(scrapers[i % len(scrapers)]._parse_rss_entry(entry))
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(f"parse:  {len(articles)} articles in {elapsed:.3f}s, "
+          f"{retained / len(articles):.0f} B/article retained, peak {peak / 1e6:.1f} MB")
+    return articles
+
+
+def bench_filter(articles):
+    """Run the article filter against an empty history"""
+    config = {
+        'filters': {
+            'similarity_threshold': 0.75,
+            'duplicate_threshold_hours': 24,
+            'required_keywords': ['market', 'crypto', 'tech', 'investment'],
+            'exclude_keywords': ['sponsored', 'celebrity'],
+            'priority_keywords': WORDS[:10]
+        }
+    }
+    article_filter = ArticleFilter(config, Storage(tempfile.mkdtemp(prefix='bench-history-')))
+    
+    # Timed without tracemalloc, which slows the similarity loop several-fold
+    start = time.perf_counter()
+    filtered = article_filter.filter_articles(articles)
+    elapsed = time.perf_counter() - start
+    
+    print(f"filter: {len(articles)} -> {len(filtered)} articles in {elapsed:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse/filter pipeline benchmark")
+    parser.add_argument('--articles', type=int, default=500)
+    args = parser.parse_args()
+    
+    articles = bench_parse(make_entries(args.articles))
+    bench_filter(articles)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark for processed-history load, append and cleanup with a large retained history
+
+Usage: python benchmarks/bench_storage.py [--ids N] [--days D]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from utils.storage import Storage, SortedDigests, COMPACTED_SEGMENT
+
+
+def build_history(history_dir: str, total_ids: int, days: int):
+    """Write total_ids spread over the last `days` days as compacted day segments"""
+    storage = Storage(history_dir)
+    today = datetime.utcnow()
+    per_day = total_ids // days
+    for offset in range(days):
+        day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        digests = [offset.to_bytes(4, 'big') + i.to_bytes(12, 'big') for i in range(per_day)]
+        storage._write_segment(day, COMPACTED_SEGMENT, digests)
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def timed(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage benchmark")
+    parser.add_argument('--ids', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=8)
+    args = parser.parse_args()
+
+    history_dir = tempfile.mkdtemp(prefix='bench-storage-')
+    timed(f"build {args.ids} ids over {args.days} days", lambda: build_history(history_dir, args.ids, args.days))
+    print(f"on disk: {disk_usage(history_dir) / 1e6:.1f} MB")
+
+    storage = timed("load", lambda: Storage(history_dir))
+    timed("append 300-id run segment", lambda: storage.add_processed_articles(os.urandom(16) for _ in range(300)))
+
+    # Nothing expired: should not touch live entries
+    timed("cleanup, nothing expired", lambda: storage.cleanup_old_entries(args.days))
+
+    # Oldest day expired
+    timed("cleanup, one day expired", lambda: storage.cleanup_old_entries(args.days - 2))
+
+    # Restored from a warm-start snapshot: expiry should leave the other days frozen
+    snapshot = storage.snapshot()
+    snapshot.update(history_dir=history_dir, index=SortedDigests(snapshot['index']))
+    restored = timed("load from snapshot", lambda: Storage(history_dir, snapshot=snapshot))
+    timed("cleanup restored, one day expired", lambda: restored.cleanup_old_entries(args.days - 3))
+    print(f"restored days still frozen: {len(restored._frozen)}")
+    print(f"retained: {len(storage)} ids")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
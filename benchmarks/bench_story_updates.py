@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark for story updates against local Telegram and Slack API stand-ins
+
+Runs the pipeline over synthetic runs in which every story is covered by
+three outlets, two in the run that breaks it and one in the next run,
+with story updates off and on. Reports the messages sent and edited
+and the article links the Telegram messages end up with: one per outlet
+covering a story with updates on, and repeated stories with them off.
+
+Usage: python benchmarks/bench_story_updates.py [--stories N] [--runs N]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import tempfile
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from main import NewsAggregator
+from utils.article import Article
+
+HOST = '127.0.0.1'
+PORT = 8744
+OUTLETS = ['wsj', 'ft', 'cnbc', 'bloomberg', 'forbes', 'economist']
+WORDS = (
+    'rates inflation merger bond yields oil output tariffs earnings guidance layoffs chip exports '
+    'housing starts payrolls lender default currency rally selloff probe antitrust dividend buyback '
+    'pension fund stake refinery strike freight copper lithium mine subsidy budget deficit'
+).split()
+
+
+class ApiStandIn:
+    """Telegram Bot API and Slack Web API methods used by the notifiers, counting calls"""
+
+    def __init__(self):
+        self.calls = {}
+        self.messages = {}
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle_telegram)
+        app.router.add_post('/api/{method}', self._handle_slack)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, HOST, PORT).start()
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle_telegram(self, request):
+        from aiohttp import web
+
+        method = request.match_info['method']
+        data = dict(await request.post()) or await request.json()
+        self.calls[f"telegram.{method}"] = self.calls.get(f"telegram.{method}", 0) + 1
+        if method == 'sendMessage':
+            message_id = len(self.messages) + 1
+        elif method == 'editMessageText':
+            message_id = int(data['message_id'])
+        else:
+            return web.json_response({'ok': False, 'error_code': 404, 'description': 'Not Found'}, status=404)
+        self.messages[('telegram', message_id)] = data['text']
+        chat = {'id': int(data['chat_id']), 'type': 'channel', 'title': 'Bench'}
+        result = {'message_id': message_id, 'date': int(time.time()), 'chat': chat, 'text': data['text']}
+        return web.json_response({'ok': True, 'result': result})
+
+    async def _handle_slack(self, request):
+        from aiohttp import web
+
+        method = request.match_info['method']
+        data = await request.json()
+        self.calls[f"slack.{method}"] = self.calls.get(f"slack.{method}", 0) + 1
+        ts = data.get('ts') or f"{time.time():.6f}"
+        self.messages[('slack', ts)] = json.dumps(data['blocks'])
+        return web.json_response({'ok': True, 'channel': data['channel'], 'ts': ts})
+
+
+def make_runs(stories: int, runs: int):
+    """Articles per run; each story breaks with two outlets and gets a third in the next run"""
+    rng = random.Random(7)
+    topics = [' '.join(rng.sample(WORDS, 7)) for _ in range(stories * runs)]
+    batches = [[] for _ in range(runs + 1)]
+    now = time.time()
+    for index, topic in enumerate(topics):
+        run = index // stories
+        outlets = rng.sample(OUTLETS, 3)
+        for copy, outlet in enumerate(outlets):
+            title = f"Company{index} {topic}" + (' update' if copy else '')
+            url = f"https://{outlet}.example.com/{index}"
+            article = Article(hashlib.md5(url.encode()).digest(), outlet, title, url,
+                              description='', published_ts=now, scraped_ts=now)
+            batches[run + (copy == 2)].append(article)
+    return batches
+
+
+def make_config(data_dir: str, story_updates: bool):
+    return {
+        'sources': {},
+        'notifications': {
+            'telegram': {'enabled': True, 'api_url': f"http://{HOST}:{PORT}/bot"},
+            'slack': {'enabled': True, 'channel': 'C0BENCH', 'api_url': f"http://{HOST}:{PORT}/api"},
+        },
+        'filters': {'similarity_threshold': 0.75},
+        'story_updates': {'enabled': story_updates},
+        'display': {'max_articles_per_notification': 25},
+        'storage': {
+            'history_dir': os.path.join(data_dir, 'history'),
+            'history_retention_days': 7,
+            'stories_file': os.path.join(data_dir, 'stories.json'),
+        },
+    }
+
+
+async def run(stories: int, runs: int, story_updates: bool):
+    server = ApiStandIn()
+    await server.start()
+    try:
+        aggregator = NewsAggregator(config=make_config(tempfile.mkdtemp(prefix='bench-stories-'), story_updates))
+        for articles in make_runs(stories, runs):
+            await aggregator.run(articles)
+
+        texts = [text for (api, _), text in server.messages.items() if api == 'telegram']
+        listed = sum(text.count('](https://') for text in texts)
+        print(f"story updates {'on ' if story_updates else 'off'}: "
+              f"telegram {server.calls.get('telegram.sendMessage', 0)} sent / {server.calls.get('telegram.editMessageText', 0)} edited, "
+              f"slack {server.calls.get('slack.chat.postMessage', 0)} sent / {server.calls.get('slack.chat.update', 0)} edited, "
+              f"{listed} article links in Telegram for {stories * runs} stories")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Story updates benchmark")
+    parser.add_argument('--stories', type=int, default=8, help="Stories breaking per run")
+    parser.add_argument('--runs', type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ.update({'TELEGRAM_BOT_TOKEN': '123456:bench', 'TELEGRAM_CHAT_ID': '-1001', 'SLACK_BOT_TOKEN': 'xoxb-bench'})
+    os.environ.pop('SLACK_WEBHOOK_URL', None)
+    asyncio.run(run(args.stories, args.runs, False))
+    asyncio.run(run(args.stories, args.runs, True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark for WebSub push delivery against a local hub stand-in
+
+Polls a local feed advertising a hub, subscribes through the hub, then
+measures the time from the hub pushing an entry to the filtered article
+coming out of the pipeline.
+
+Usage: python benchmarks/bench_websub.py [--pushes N]
+"""
+
+import os
+import sys
+import time
+import hmac
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from scrapers.base_scraper import BaseScraper
+from utils.article_filter import ArticleFilter
+from utils.feed_server import FeedServer
+from utils.storage import Storage
+from utils.websub import WebSubSubscriber
+
+HOST = '127.0.0.1'
+HUB_PORT = 8741
+SUBSCRIBER_PORT = 8742
+
+
+class BenchScraper(BaseScraper):
+    async def scrape(self):
+        return []
+
+
+def render_feed(hub_url: str, feed_url: str, items):
+    """RSS document with hub and self links"""
+    entries = ''.join(
+        f"<item><title>{title}</title><link>https://example.com/{guid}</link><guid>{guid}</guid>"
+        f"<description>{title} moves the market</description>"
+        f"<pubDate>{format_datetime(datetime.now(timezone.utc), usegmt=True)}</pubDate></item>"
+        for guid, title in items
+    )
+    return (
+        '<?xml version="1.0"?><rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        f'<title>Bench</title><link>https://example.com/</link>'
+        f'<atom:link rel="hub" href="{hub_url}"/><atom:link rel="self" href="{feed_url}"/>'
+        f'{entries}</channel></rss>'
+    ).encode('utf-8')
+
+
+class HubStandIn:
+    """Publisher and hub: serves the feed, verifies subscribers and pushes signed updates"""
+
+    def __init__(self):
+        self.hub_url = f"http://{HOST}:{HUB_PORT}/hub"
+        self.feed_url = f"http://{HOST}:{HUB_PORT}/feed.rss"
+        self.items = [('seed-0', 'Market opens higher')]
+        self.feed_requests = 0
+        self.subscribers = {}
+        self.verified = asyncio.Event()
+        self._runner = None
+        self._session = None
+
+    async def start(self):
+        import aiohttp
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get('/feed.rss', self._handle_feed)
+        app.router.add_post('/hub', self._handle_subscribe)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, HOST, HUB_PORT).start()
+        self._session = aiohttp.ClientSession()
+
+    async def stop(self):
+        await self._session.close()
+        await self._runner.cleanup()
+
+    async def _handle_feed(self, request):
+        from aiohttp import web
+
+        self.feed_requests += 1
+        return web.Response(body=render_feed(self.hub_url, self.feed_url, self.items),
+                            content_type='application/rss+xml')
+
+    async def _handle_subscribe(self, request):
+        from aiohttp import web
+
+        form = await request.post()
+        asyncio.ensure_future(self._verify(dict(form)))
+        return web.Response(status=202)
+
+    async def _verify(self, form):
+        """Verify intent as a hub does, before accepting the subscription"""
+        challenge = os.urandom(8).hex()
+        params = {
+            'hub.mode': form['hub.mode'],
+            'hub.topic': form['hub.topic'],
+            'hub.challenge': challenge,
+            'hub.lease_seconds': form['hub.lease_seconds'],
+        }
+        async with self._session.get(form['hub.callback'], params=params) as response:
+            if response.status == 200 and await response.text() == challenge:
+                self.subscribers[form['hub.callback']] = form['hub.secret']
+                self.verified.set()
+
+    async def publish(self, guid: str, title: str):
+        """Add an entry and push the updated feed to every subscriber"""
+        self.items.insert(0, (guid, title))
+        body = render_feed(self.hub_url, self.feed_url, self.items[:1])
+        for callback, secret in self.subscribers.items():
+            signature = hmac.new(secret.encode('utf-8'), body, 'sha256').hexdigest()
+            headers = {'Content-Type': 'application/rss+xml', 'X-Hub-Signature': f"sha256={signature}"}
+            async with self._session.post(callback, data=body, headers=headers) as response:
+                assert response.status == 202, response.status
+
+
+async def run(pushes: int):
+    hub = HubStandIn()
+    await hub.start()
+
+    config = {
+        'filters': {
+            'similarity_threshold': 0.75,
+            'duplicate_threshold_hours': 24,
+            'required_keywords': ['market'],
+            'exclude_keywords': [],
+            'priority_keywords': []
+        }
+    }
+    article_filter = ArticleFilter(config, Storage(tempfile.mkdtemp(prefix='bench-history-')))
+    delivered = asyncio.Queue()
+
+    async def on_articles(articles):
+        for article in article_filter.filter_articles(articles):
+            await delivered.put((time.perf_counter(), article))
+
+    state_path = os.path.join(tempfile.mkdtemp(prefix='bench-websub-'), 'websub.json')
+    websub = WebSubSubscriber(f"http://{HOST}:{SUBSCRIBER_PORT}/websub", state_path, on_articles=on_articles)
+    scraper = BenchScraper({'max_articles_per_run': 10})
+    websub.register(scraper)
+
+    server = FeedServer(HOST, SUBSCRIBER_PORT)
+    await server.start(websub.routes())
+    await websub.start()
+
+    try:
+        # The first poll finds the hub; the maintenance loop subscribes right away
+        async with scraper:
+            polled = await scraper.fetch_rss_feeds([hub.feed_url])
+        start = time.perf_counter()
+        await asyncio.wait_for(hub.verified.wait(), 10)
+        print(f"poll: {len(polled)} articles; subscribed and verified in {(time.perf_counter() - start) * 1000:.1f} ms")
+        assert websub.is_active(hub.feed_url)
+
+        async with scraper:
+            requests = hub.feed_requests
+            polled = await scraper.fetch_rss_feeds([hub.feed_url])
+        print(f"poll with active lease: {len(polled)} articles, {hub.feed_requests - requests} feed requests")
+
+        latencies = []
+        for i in range(pushes):
+            start = time.perf_counter()
+            await hub.publish(f"push-{i}", f"Market moves on update {i}")
+            delivered_at, article = await asyncio.wait_for(delivered.get(), 10)
+            latencies.append(delivered_at - start)
+        latencies.sort()
+        print(f"push to filtered article: median {statistics.median(latencies) * 1000:.1f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms over {pushes} pushes")
+    finally:
+        await websub.stop()
+        await server.stop()
+        await hub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSub push delivery benchmark")
+    parser.add_argument('--pushes', type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.pushes))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,189 +6,1248 @@ Financial News Aggregator Main Entry Point
 import os
 import sys
 import json
+import time
 import logging
 import asyncio
+import argparse
+import tempfile
+import copy
+import contextlib
+import itertools
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-import yaml
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional, Set, Tuple
 
 # Add src to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from scrapers.bloomberg_scraper import BloombergScraper
-from scrapers.cnbc_scraper import CNBCScraper
-from scrapers.ft_scraper import FTScraper
-from scrapers.wsj_scraper import WSJScraper
-from scrapers.forbes_scraper import ForbesScraper
-from scrapers.economist_scraper import EconomistScraper
-from notifiers.telegram_notifier import TelegramNotifier
-from notifiers.slack_notifier import SlackNotifier
+# Scrapers, notifiers and their third-party dependencies are imported on first use
+from utils.lazy_loader import STARTUP, load_object
+from scrapers import SCRAPERS
+from notifiers import ALTERNATIVE_CREDENTIALS, NOTIFIERS
+from utils.article import Article
+from utils.article_archive import ArticleArchive
 from utils.article_filter import ArticleFilter
+from utils.auth_session import AuthSession
+from utils.duplicate_stats import DuplicateStats
+from utils.feed_archive import FeedArchive
+from utils.enrichment import Enricher
+from utils.entry_cache import DEFAULT_SETTINGS as ENTRY_CACHE_DEFAULTS, EntryCache
+from utils.feed_health import DEFAULT_SETTINGS as FETCH_DEFAULTS, FeedHealth
+from utils.search_index import SearchIndex
+from utils.trending import TrendTracker
+from utils.warm_start import WARM_START_FILE, WarmStart
+from utils.loop_monitor import LoopMonitor
+from utils.logging_setup import setup_logging, setup_worker_logging
+from utils.sharding import default_run_id, parse_shard, read_spool, write_spool
 from utils.storage import Storage
+from utils.story_index import StoryIndex
 
-# Load environment variables
-load_dotenv()
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('aggregator.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def load_config(config_path: str) -> Dict[str, Any]:
+    """Load configuration from YAML file"""
+    # Imported here: runs starting from a warm-start snapshot never parse YAML
+    import yaml
+    
+    try:
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f)
+    except Exception as e:
+        logger.error(f"Failed to load config: {e}")
+        raise
+
+
+def check_config(config: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Validate configuration without importing scrapers or notifiers"""
+    errors = []
+    warnings = []
+    
+    if not isinstance(config, dict):
+        return ["Config is empty or not a mapping"], warnings
+        
+    for section in ['sources', 'notifications', 'filters', 'storage', 'display']:
+        if section not in config:
+            errors.append(f"Missing '{section}' section")
+            
+    for name, source in (config.get('sources') or {}).items():
+        if not isinstance(source, dict) or not source.get('enabled'):
+            continue
+        if name not in SCRAPERS and 'class' not in source:
+            errors.append(f"Unknown source '{name}' (no registered scraper and no 'class')")
+        feeds = source.get('rss_feeds', [])
+        if not isinstance(feeds, list) or not all(isinstance(feed, str) for feed in feeds):
+            errors.append(f"sources.{name}.rss_feeds must be a list of URLs")
+            
+    for name, channel in (config.get('notifications') or {}).items():
+        if not isinstance(channel, dict) or not channel.get('enabled'):
+            continue
+        if name not in NOTIFIERS:
+            errors.append(f"Unknown notifier '{name}'")
+            continue
+        alternative = ALTERNATIVE_CREDENTIALS.get(name)
+        if alternative and all(os.getenv(env_var) for env_var in alternative.values()):
+            continue
+        for env_var in NOTIFIERS[name][1].values():
+            if not os.getenv(env_var):
+                warnings.append(f"{env_var} not set; {name} notifications will be skipped")
+                
+    filters = config.get('filters') or {}
+    threshold = filters.get('similarity_threshold', 0.75)
+    if not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+        errors.append("filters.similarity_threshold must be between 0.0 and 1.0")
+    for key in ['priority_keywords', 'exclude_keywords', 'required_keywords']:
+        if not isinstance(filters.get(key, []), list):
+            errors.append(f"filters.{key} must be a list")
+            
+    if 'history_dir' not in (config.get('storage') or {}):
+        errors.append("storage.history_dir is required")
+        
+    subscriptions = config.get('subscriptions') or {}
+    if not isinstance(subscriptions, dict):
+        errors.append("subscriptions must be a mapping of name to rules")
+        subscriptions = {}
+    for name, subscription in subscriptions.items():
+        if not isinstance(subscription, dict):
+            errors.append(f"subscriptions.{name} must be a mapping")
+            continue
+        for key in ['required_keywords', 'exclude_keywords', 'sources']:
+            if not isinstance(subscription.get(key, []), list):
+                errors.append(f"subscriptions.{name}.{key} must be a list")
+        for source in subscription.get('sources') or []:
+            if source not in (config.get('sources') or {}):
+                warnings.append(f"subscriptions.{name} lists unknown source '{source}'")
+        targets = subscription.get('targets')
+        if not isinstance(targets, dict) or not targets:
+            errors.append(f"subscriptions.{name}.targets must map notifier names to settings")
+            continue
+        for channel in targets:
+            if channel not in NOTIFIERS:
+                errors.append(f"subscriptions.{name} targets unknown notifier '{channel}'")
+                
+    return errors, warnings
+
+
+def create_scrapers(config: Dict[str, Any], shard: Optional[Tuple[int, int]] = None) -> List:
+    """Initialize all enabled news scrapers, optionally limited to one shard of the feeds"""
+    scrapers = []
+    health = FeedHealth(config['storage'].get('feed_health_file'), config.get('fetch'))
+    entry_cache = EntryCache(config['storage'].get('entry_cache_file'), config.get('entry_cache'))
+    
+    for name, source_config in config['sources'].items():
+        scraper = create_scraper(config, name, source_config, shard)
+        if scraper is not None:
+            scraper.health = health
+            scraper.entry_cache = entry_cache
+            scrapers.append(scraper)
+            
+    return scrapers
+    
+    
+def create_scraper(config: Dict[str, Any], name: str, source_config: Dict[str, Any],
+                   shard: Optional[Tuple[int, int]] = None):
+    """Scraper of one source, or None if it is disabled; the caller sets the shared feed health and entry cache"""
+    if not source_config.get('enabled'):
+        return None
+        
+    # Custom sources may name their scraper class directly
+    class_path = source_config.get('class') or SCRAPERS.get(name)
+    if not class_path:
+        logger.warning(f"No scraper registered for source '{name}'")
+        return None
+        
+    scraper_class = load_object(class_path)
+    scraper = scraper_class(source_config)
+    scraper.shard = shard
+    scraper.config_key = name
+    scraper.auth = AuthSession.from_config(name, source_config.get('auth'), config['storage'].get('cookie_dir'))
+    return scraper
+    
+    
+async def gather_articles(scrapers: List, deadline: Optional[float] = None) -> List[Article]:
+    """Run scrapers concurrently and collect their articles"""
+    all_articles = []
+    
+    # All fetches of the run share one deadline
+    health = next((scraper.health for scraper in scrapers if scraper.health is not None), None)
+    if health is not None:
+        deadline = deadline or time.monotonic() + health.deadline_seconds
+        for scraper in scrapers:
+            scraper.deadline = deadline
+            
+    results = await asyncio.gather(*(scraper.scrape() for scraper in scrapers), return_exceptions=True)
+    
+    # Saving waits on file locks other runs may hold, so it happens off the event loop
+    if health is not None:
+        await asyncio.to_thread(health.save)
+    entry_cache = next((scraper.entry_cache for scraper in scrapers if scraper.entry_cache is not None), None)
+    if entry_cache is not None:
+        await asyncio.to_thread(entry_cache.save)
+    
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Scraper {scrapers[i].__class__.__name__} failed: {result}")
+        else:
+            all_articles.extend(result)
+            
+    return all_articles
+    
+    
+def scrape_shard(config: Dict[str, Any], shard: Tuple[int, int]) -> List[Article]:
+    """Fetch and parse one shard of the feeds; runs in a worker process"""
+    articles = asyncio.run(gather_articles(create_scrapers(config, shard)))
+    logger.info(f"Shard {shard[0] + 1}/{shard[1]} collected {len(articles)} articles")
+    return articles
+    
+    
 class NewsAggregator:
     """Main news aggregator class"""
     
-    def __init__(self, config_path: str = "config.yaml"):
-        """Initialize the news aggregator"""
-        self.config = self._load_config(config_path)
-        self.storage = Storage(self.config['storage']['history_file'])
+    def __init__(self, config_path: str = "config.yaml", config: Dict[str, Any] = None, workers: int = 1,
+                 warm_state: Dict[str, Any] = None):
+        """Initialize the news aggregator
+        
+        With workers > 1 the feeds are fetched and parsed by that many worker
+        processes, each owning a shard of the feed URLs; this process merges
+        their articles and filters, notifies and records them once.
+        warm_state is the last run's warm-start snapshot, if still valid.
+        """
+        self.config = config if config is not None else self._load_config(config_path)
+        self.config_path = config_path
+        self.workers = workers
+        self.storage = Storage(
+            self.config['storage']['history_dir'],
+            legacy_file=self.config['storage'].get('history_file'),
+            snapshot=warm_state['history'] if warm_state else None
+        )
         self.filter = ArticleFilter(self.config, self.storage)
+        self.archive = self._initialize_archive()
+        search_dir = self.config['storage'].get('search_index_dir')
+        self.search_index = SearchIndex(search_dir) if search_dir else None
+        trends_file = self.config['storage'].get('trends_file')
+        self.trends = TrendTracker(trends_file, self.config.get('trending')) if trends_file else None
+        # Set in long-running mode; receives each run's curated articles
+        self.feed_server = None
+        # Set in long-running mode when WebSub is enabled; pushed articles wait in _pushed for one batch run
+        self.websub = None
+        self._pushed: List[Article] = []
+        self._push_flush = None
+        self._run_lock = None
+        enrichment = self.config.get('enrichment') or {}
+        self.enricher = Enricher(enrichment) if enrichment.get('enabled') else None
+        loop_monitor = self.config.get('loop_monitor') or {}
+        self.loop_monitor = LoopMonitor(loop_monitor) if loop_monitor.get('enabled') else None
+        self.stories = self._initialize_stories()
         self.scrapers = self._initialize_scrapers()
+        for scraper in self.scrapers:
+            scraper.loop_monitor = self.loop_monitor
         self.notifiers = self._initialize_notifiers()
+        STARTUP.mark('aggregator_ready')
         
     def _load_config(self, config_path: str) -> Dict[str, Any]:
         """Load configuration from YAML file"""
-        try:
-            with open(config_path, 'r') as f:
-                return yaml.safe_load(f)
-        except Exception as e:
-            logger.error(f"Failed to load config: {e}")
-            raise
-            
-    def _initialize_scrapers(self) -> List:
-        """Initialize all enabled news scrapers"""
-        scrapers = []
+        return load_config(config_path)
         
-        if self.config['sources']['bloomberg']['enabled']:
-            scrapers.append(BloombergScraper(self.config['sources']['bloomberg']))
-            
-        if self.config['sources']['cnbc']['enabled']:
-            scrapers.append(CNBCScraper(self.config['sources']['cnbc']))
+    def _initialize_archive(self) -> Optional[ArticleArchive]:
+        """Open the article archive if configured; the filter then records its decisions"""
+        archive_dir = self.config['storage'].get('archive_dir')
+        if not archive_dir:
+            return None
             
-        if self.config['sources']['ft']['enabled']:
-            scrapers.append(FTScraper(self.config['sources']['ft']))
-            
-        if self.config['sources']['wsj']['enabled']:
-            scrapers.append(WSJScraper(self.config['sources']['wsj']))
-            
-        if self.config['sources']['forbes']['enabled']:
-            scrapers.append(ForbesScraper(self.config['sources']['forbes']))
-            
-        if self.config['sources']['economist']['enabled']:
-            scrapers.append(EconomistScraper(self.config['sources']['economist']))
+        self.filter.record_decisions = True
+        return ArticleArchive(archive_dir, lock=self.storage.lock)
+        
+    def _initialize_stories(self) -> Optional[StoryIndex]:
+        """Open the index of delivered stories if story updates are enabled"""
+        settings = self.config.get('story_updates') or {}
+        if not settings.get('enabled'):
+            return None
             
-        return scrapers
+        return StoryIndex(self.config['storage'].get('stories_file'), settings, self.filter.similarity_threshold)
+        
+    def _initialize_scrapers(self) -> List:
+        """Initialize all enabled news scrapers; worker processes create their own"""
+        if self.workers > 1:
+            return []
+        return create_scrapers(self.config)
         
-    def _initialize_notifiers(self) -> List:
-        """Initialize all enabled notifiers"""
+    def _initialize_notifiers(self, channels: Optional[Set[str]] = None,
+                              subscriptions: Optional[Set[str]] = None) -> List:
+        """Initialize all enabled notifiers and the notifiers of each subscription
+        
+        Config reloads pass the changed channels and subscriptions to build
+        only the notifiers sending through or for them.
+        """
         notifiers = []
+        everything = channels is None and subscriptions is None
+        channels = channels or set()
+        subscriptions = subscriptions or set()
         
-        if self.config['notifications']['telegram']['enabled']:
-            telegram_config = self.config['notifications']['telegram']
-            telegram_config['bot_token'] = os.getenv('TELEGRAM_BOT_TOKEN')
-            telegram_config['chat_id'] = os.getenv('TELEGRAM_CHAT_ID')
-            if telegram_config['bot_token'] and telegram_config['chat_id']:
-                notifiers.append(TelegramNotifier(telegram_config))
-            else:
-                logger.warning("Telegram credentials not found in environment")
+        for name, channel_config in self.config['notifications'].items():
+            if not channel_config.get('enabled') or name not in NOTIFIERS:
+                continue
+            if not everything and name not in channels:
+                continue
                 
-        if self.config['notifications']['slack']['enabled']:
-            slack_config = self.config['notifications']['slack']
-            slack_config['webhook_url'] = os.getenv('SLACK_WEBHOOK_URL')
-            if slack_config['webhook_url']:
-                notifiers.append(SlackNotifier(slack_config))
-            else:
-                logger.warning("Slack webhook URL not found in environment")
+            notifier = self._create_notifier(name, channel_config)
+            if notifier:
+                notifiers.append(notifier)
                 
+        for subscription_name, subscription in (self.config.get('subscriptions') or {}).items():
+            for name, target in (subscription.get('targets') or {}).items():
+                if not everything and name not in channels and subscription_name not in subscriptions:
+                    continue
+                if name not in NOTIFIERS:
+                    logger.warning(f"Subscription '{subscription_name}' targets unknown notifier '{name}'")
+                    continue
+                    
+                # Targets override the channel's settings, e.g. with their own chat_id
+                channel_config = dict(self.config['notifications'].get(name) or {})
+                overrides = {
+                    key: os.path.expandvars(value) if isinstance(value, str) else value
+                    for key, value in (target or {}).items()
+                }
+                
+                notifier = self._create_notifier(name, channel_config, overrides, subscription_name)
+                if notifier:
+                    notifiers.append(notifier)
+                    
         return notifiers
         
-    async def aggregate_news(self) -> List[Dict[str, Any]]:
-        """Aggregate news from all sources"""
-        all_articles = []
+    def _create_notifier(self, name: str, channel_config: Dict[str, Any],
+                         overrides: Optional[Dict[str, Any]] = None, subscription: Optional[str] = None):
+        """Fill credentials from the environment and build a notifier, or None if they are missing"""
+        class_path, credentials = NOTIFIERS[name]
+        alternative = ALTERNATIVE_CREDENTIALS.get(name, {})
+        for key, env_var in itertools.chain(credentials.items(), alternative.items()):
+            channel_config[key] = os.getenv(env_var)
+        channel_config.update(overrides or {})
         
-        # Run all scrapers concurrently
-        tasks = []
-        for scraper in self.scrapers:
-            tasks.append(scraper.scrape())
+        # Skip before importing the notifier's SDK if credentials are missing;
+        # an unexpanded ${VAR} in a subscription target counts as missing
+        def present(keys):
+            return all(channel_config[key] and not str(channel_config[key]).startswith('$') for key in keys)
             
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if not present(credentials) and not (alternative and present(alternative)):
+            target = f" for subscription '{subscription}'" if subscription else ""
+            logger.warning(f"{name.title()} credentials{target} not found in environment")
+            return None
+            
+        notifier_class = load_object(class_path)
+        notifier = notifier_class(channel_config)
+        notifier.channel = name
+        notifier.subscription = subscription
+        return notifier
         
-        for i, result in enumerate(results):
+    async def collect_articles(self, deadline: Optional[float] = None) -> List[Article]:
+        """Fetch and parse all feeds, in worker processes when configured"""
+        if self.workers <= 1:
+            return await gather_articles(self.scrapers, deadline)
+            
+        # Spawned workers start clean instead of inheriting the loop and logging threads
+        context = multiprocessing.get_context('spawn')
+        loop = asyncio.get_running_loop()
+        all_articles = []
+        
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                 initializer=setup_worker_logging,
+                                 initargs=(self.config.get('logging'),)) as pool:
+            futures = [
+                loop.run_in_executor(pool, scrape_shard, self.config, (index, self.workers))
+                for index in range(self.workers)
+            ]
+            results = await asyncio.gather(*futures, return_exceptions=True)
+            
+        for index, result in enumerate(results):
             if isinstance(result, Exception):
-                logger.error(f"Scraper {self.scrapers[i].__class__.__name__} failed: {result}")
+                logger.error(f"Worker for shard {index + 1}/{self.workers} failed: {result}")
             else:
                 all_articles.extend(result)
                 
+        return all_articles
+        
+    async def aggregate_news(self, articles: List[Article] = None) -> List[Article]:
+        """Aggregate news from all sources, or filter articles collected elsewhere"""
+        # Fetching feeds and enriching articles share the run's deadline
+        fetch_config = dict(FETCH_DEFAULTS, **(self.config.get('fetch') or {}))
+        deadline = time.monotonic() + fetch_config['deadline_seconds']
+        
+        with self.stage('collect'):
+            all_articles = articles if articles is not None else await self.collect_articles(deadline)
         logger.info(f"Collected {len(all_articles)} articles total")
         
+        # Every article counts towards entity rates, whether it passes the filters or not
+        if self.trends is not None:
+            with self.stage('trending'):
+                self.trends.observe(all_articles)
+                
         # Filter articles
-        filtered_articles = self.filter.filter_articles(all_articles)
+        with self.stage('filter'):
+            filtered_articles = self.filter.filter_articles(all_articles)
         logger.info(f"Filtered to {len(filtered_articles)} articles")
         
+        # Boost articles naming entities that spike against their baseline
+        if self.trends is not None:
+            with self.stage('trending'):
+                self.trends.rank(filtered_articles)
+                await asyncio.to_thread(self.trends.save)
+                
         # Sort by priority and timestamp
-        filtered_articles.sort(key=lambda x: (x.get('priority', 0), x.get('timestamp', '')), reverse=True)
+        filtered_articles.sort(key=lambda x: (x.priority, x.published_ts), reverse=True)
         
-        # Limit to max articles per notification
-        max_articles = self.config['display']['max_articles_per_notification']
-        if len(filtered_articles) > max_articles:
-            filtered_articles = filtered_articles[:max_articles]
-            
+        if self.enricher is not None:
+            with self.stage('enrich'):
+                filtered_articles = await self.enrich(filtered_articles, deadline)
+                
         return filtered_articles
         
-    async def notify(self, articles: List[Dict[str, Any]]):
-        """Send notifications to all configured channels"""
-        if not articles:
-            logger.info("No new articles to notify")
-            return
+    def stage(self, name: str):
+        """Context attributing event-loop blocking to a pipeline stage, when the loop monitor is on"""
+        if self.loop_monitor is None:
+            return contextlib.nullcontext()
+        return self.loop_monitor.stage(name)
+        
+    async def enrich(self, articles: List[Article], deadline: Optional[float] = None) -> List[Article]:
+        """Add page text to the top-ranked articles and filter them again with it"""
+        if not await self.enricher.enrich(articles, deadline):
+            return articles
+            
+        refined = self.filter.refine(articles)
+        refined.sort(key=lambda x: (x.priority, x.published_ts), reverse=True)
+        if len(refined) < len(articles):
+            logger.info(f"Page text filtered out {len(articles) - len(refined)} more articles")
+        return refined
+        
+    def route(self, articles: List[Article]) -> Dict[Optional[str], List[Article]]:
+        """Articles for each subscription, with None for the default channels
+        
+        Each slice is limited to max_articles_per_notification, or to the
+        subscription's own max_articles.
+        """
+        max_articles = self.config['display']['max_articles_per_notification']
+        routes = {None: articles[:max_articles]}
+        
+        for name, selected in self.filter.route(articles).items():
+            limit = self.filter.subscriptions[name].get('max_articles', max_articles)
+            routes[name] = selected[:limit]
+            if selected:
+                logger.info(f"Subscription '{name}' matched {len(selected)} articles")
+                
+        return routes
+        
+    async def notify(self, articles: List[Article], routes: Dict[Optional[str], List[Article]] = None):
+        """Send notifications to all configured channels
+        
+        With story updates, notifiers that can edit their messages also
+        list the other outlets of each article, and the story index learns
+        which message carries which story.
+        """
+        if routes is None:
+            routes = self.route(articles)
             
-        # Notify all channels concurrently
+        also = None
+        if self.stories is not None:
+            also = self.stories.other_sources(itertools.chain.from_iterable(routes.values()), self.filter.last_similar)
+            
+        # Notify all channels concurrently, each with its subscription's slice
         tasks = []
+        notifiers = []
         for notifier in self.notifiers:
-            tasks.append(notifier.send_notification(articles))
+            selected = routes.get(getattr(notifier, 'subscription', None))
+            if selected:
+                if also is not None and hasattr(notifier, 'edit_message'):
+                    tasks.append(notifier.send_notification(selected, also))
+                else:
+                    tasks.append(notifier.send_notification(selected))
+                notifiers.append(notifier)
+                
+        if not tasks:
+            logger.info("No new articles to notify")
+            return
             
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
         for i, result in enumerate(results):
             if isinstance(result, Exception):
-                logger.error(f"Notifier {self.notifiers[i].__class__.__name__} failed: {result}")
+                logger.error(f"Notifier {notifiers[i].__class__.__name__} failed: {result}")
+            elif self.stories is not None:
+                selected = routes.get(getattr(notifiers[i], 'subscription', None))
+                self.stories.record(notifiers[i], selected, result or [], also)
                 
-    async def run(self):
-        """Main execution method"""
+    async def update_stories(self, updates: Dict[str, List[Article]]):
+        """Add the outlets of later copies to delivered stories by editing the messages carrying them"""
+        editors = {StoryIndex.notifier_key(notifier): notifier for notifier in self.notifiers
+                   if hasattr(notifier, 'edit_message')}
+        tasks = []
+        for notifier_key, ref, stories, also in self.stories.add_sources(updates):
+            notifier = editors.get(notifier_key)
+            if notifier is not None:
+                tasks.append(notifier.edit_message(ref, stories, also))
+        if not tasks:
+            return
+            
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        edited = sum(result is True for result in results)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Failed to edit a delivered story: {result}")
+        self.stories.count_edits(edited)
+        logger.info(f"Edited {edited}/{len(tasks)} messages with later coverage of their stories")
+                
+    async def run(self, articles: List[Article] = None):
+        """Main execution method; articles are given when merging spooled shards"""
         logger.info("Starting news aggregation...")
-        
+        if self.loop_monitor is not None:
+            self.loop_monitor.start()
+            
         try:
             # Aggregate news
-            articles = await self.aggregate_news()
-            
+            articles = await self.aggregate_news(articles)
+            updates = {}
+            with self.stage('route'):
+                # Later coverage of delivered stories is added to their messages instead of sent
+                if self.stories is not None:
+                    articles, updates = self.stories.match(articles, self.filter.last_similar)
+                routed = self.route(articles)
+                
+                # Claim the routed articles so an overlapping run cannot send them too; the history
+                # lock may be held by another run for a while, so it is waited for off the event loop
+                claimed = await asyncio.to_thread(self.storage.claim, list(itertools.chain(
+                    (article.digest for selected in routed.values() for article in selected),
+                    (article.digest for found in updates.values() for article in found)
+                )))
+                routes = {
+                    name: [article for article in selected if article.digest in claimed]
+                    for name, selected in routed.items()
+                }
+                updates = {
+                    story_id: [article for article in found if article.digest in claimed]
+                    for story_id, found in updates.items()
+                }
+                
             # Send notifications
-            await self.notify(articles)
-            
-            # Update storage with processed articles
-            for article in articles:
-                self.storage.add_processed_article(article['id'])
+            try:
+                with self.stage('notify'):
+                    await self.notify(articles, routes)
+                    if updates:
+                        await self.update_stories(updates)
+            except BaseException:
+                self.storage.release()
+                raise
                 
-            # Clean up old history
-            self.storage.cleanup_old_entries(self.config['storage']['history_retention_days'])
-            
+            # Recording takes the file locks of the history, archive, stories and search index,
+            # so each step runs off the event loop
+            with self.stage('record'):
+                # Record the claimed articles as processed
+                await asyncio.to_thread(self.storage.commit)
+                
+                # Archive every article this run saw with its decision
+                if self.archive is not None:
+                    await asyncio.to_thread(self.archive_decisions, routed, claimed)
+                    
+                if self.stories is not None:
+                    await asyncio.to_thread(self.stories.save)
+                    
+                # Refresh the served feed with what the default channels received
+                if self.feed_server is not None:
+                    self.feed_server.publish(routes[None])
+                    
+                # Make the delivered articles searchable
+                if self.search_index is not None:
+                    await asyncio.to_thread(self.index_delivered, routes)
+                    
+                # Clean up old history
+                await asyncio.to_thread(self.storage.cleanup_old_entries, self.config['storage']['history_retention_days'])
+                
+                if self.search_index is not None:
+                    await asyncio.to_thread(self.search_index.wait)
+                    
             logger.info("News aggregation completed successfully")
             
         except Exception as e:
             logger.error(f"Error during news aggregation: {e}")
             raise
+        finally:
+            if self.loop_monitor is not None:
+                await self.loop_monitor.stop()
+            
+    def archive_decisions(self, routed: Dict[Optional[str], List[Article]], claimed: Set[bytes]):
+        """Append the filter decisions of this run to the article archive
+        
+        Accepted articles become 'delivered' when routed and claimed,
+        'claimed_elsewhere' when another run claimed them first and
+        'over_limit' when no channel had room for them. Archive failures are
+        logged; the run has already been delivered and committed.
+        """
+        subscriptions = {}
+        for name, selected in routed.items():
+            for article in selected:
+                names = subscriptions.setdefault(article.digest, [])
+                if name is not None:
+                    names.append(name)
+                    
+        records = []
+        for article, decision, reason in self.filter.last_decisions:
+            names = ()
+            if decision == 'accepted':
+                if article.digest not in subscriptions:
+                    decision = 'over_limit'
+                elif article.digest not in claimed:
+                    decision = 'claimed_elsewhere'
+                else:
+                    decision = 'delivered'
+                    names = subscriptions[article.digest]
+            records.append((article, decision, reason, names))
+            
+        try:
+            self.archive.append(records)
+            self.archive.compact()
+        except Exception as e:
+            logger.error(f"Failed to archive articles: {e}")
+            
+    async def serve(self, host: str, port: int, interval: Optional[float] = None, run_now: bool = False):
+        """Long-running mode: run on schedule and serve the latest curated feed over HTTP
+        
+        Runs happen at schedule.run_times (UTC), or every interval minutes.
+        A failed run is logged and the next one is still scheduled. With
+        websub.enabled, feeds advertising a hub are subscribed to and their
+        pushed entries run through the pipeline as they arrive; scheduled
+        runs poll the other feeds. Runs and push batches never overlap.
+        """
+        from utils.feed_server import FeedServer
+        
+        server_config = self.config.get('server') or {}
+        self.feed_server = FeedServer(
+            host, port,
+            title=server_config.get('title', 'Financial News'),
+            max_items=server_config.get('max_items', 100),
+            max_age=server_config.get('max_age', 60)
+        )
+        self._run_lock = asyncio.Lock()
+        self.websub = self._initialize_websub()
+        await self.feed_server.start(self.websub.routes() if self.websub is not None else ())
+        if self.websub is not None:
+            await self.websub.start()
+        reload_seconds = server_config.get('reload_seconds', 5)
+        config_watch = None
+        if reload_seconds and self.config_path and os.path.exists(self.config_path):
+            config_watch = asyncio.ensure_future(self._watch_config(reload_seconds))
+            
+        try:
+            while True:
+                if run_now:
+                    async with self._run_lock:
+                        try:
+                            await self.run()
+                        except Exception:
+                            pass  # Already logged by run()
+                run_now = True
+                
+                delay = interval * 60 if interval else next_run_delay(self.config['schedule']['run_times'])
+                logger.info(f"Next run in {delay / 60:.0f} minutes")
+                await asyncio.sleep(delay)
+        finally:
+            if config_watch is not None:
+                config_watch.cancel()
+            if self._push_flush is not None:
+                self._push_flush.cancel()
+            if self.websub is not None:
+                await self.websub.stop()
+            await self.feed_server.stop()
+            
+    async def _watch_config(self, interval: float):
+        """Reload the config file whenever its content changes, between runs"""
+        from utils.config_reload import ConfigWatcher
+        
+        watcher = ConfigWatcher(self.config_path)
+        # The config as in the file; self.config also carries the notifiers' credentials
+        current = load_config(self.config_path)
+        while True:
+            await asyncio.sleep(interval)
+            if not watcher.changed():
+                continue
+            try:
+                new_config = load_config(self.config_path)
+            except Exception:
+                continue  # Already logged by load_config; the running config stays
+            errors, _ = check_config(new_config)
+            if errors:
+                logger.error("Config reload rejected: " + '; '.join(errors))
+                continue
+                
+            # Runs and push batches in progress finish with the config they started with
+            async with self._run_lock:
+                if self.reload_config(current, new_config) is not None:
+                    current = new_config
+                    
+    def reload_config(self, old: Dict[str, Any], new: Dict[str, Any]) -> Optional[List[str]]:
+        """Swap in a new config, rebuilding only what its changed parts affect
+        
+        A changed source rebuilds its scraper and a changed channel or
+        subscription its notifiers; filters or subscriptions rebuild the
+        filter and its keyword index. Everything else, including the
+        history, caches, feed health and unchanged scrapers and notifiers,
+        is kept. Components are built before any is swapped in, so a
+        failed reload leaves the running config untouched; returns the
+        changed parts, or None on failure. Sections set up at startup
+        (storage, server, websub, logging) keep their running values.
+        """
+        from utils.config_reload import RESTART_SECTIONS, diff_config
+        
+        started = time.perf_counter()
+        changed = diff_config(old, new)
+        if not changed:
+            return changed
+        sections = {path.split('.')[0] for path in changed}
+        entries = lambda section: {path.split('.', 1)[1] for path in changed if path.startswith(section + '.')}
+        
+        config = copy.deepcopy(new)
+        restart = sorted(sections & set(RESTART_SECTIONS))
+        for section in restart:
+            config[section] = self.config.get(section)
+        if restart:
+            logger.warning(f"Config changes to {', '.join(restart)} take effect after a restart")
+            
+        previous = self.config
+        self.config = config
+        try:
+            article_filter = self.filter
+            if sections & {'filters', 'subscriptions'}:
+                article_filter = ArticleFilter(config, self.storage)
+                article_filter.record_decisions = self.filter.record_decisions
+                
+            trends = self.trends
+            if 'trending' in sections and trends is not None:
+                trends.save()
+                trends = TrendTracker(trends.path, config.get('trending'))
+                
+            enricher = self.enricher
+            if 'enrichment' in sections:
+                enrichment = config.get('enrichment') or {}
+                enricher = Enricher(enrichment) if enrichment.get('enabled') else None
+                
+            stories = self.stories
+            if 'story_updates' in sections or (stories is not None and 'filters' in sections):
+                settings = config.get('story_updates') or {}
+                if stories is not None:
+                    stories.save()
+                stories = None
+                if settings.get('enabled'):
+                    stories = StoryIndex(config['storage'].get('stories_file'), settings, article_filter.similarity_threshold)
+                    
+            loop_monitor = self.loop_monitor
+            if 'loop_monitor' in sections:
+                settings = config.get('loop_monitor') or {}
+                loop_monitor = LoopMonitor(settings) if settings.get('enabled') else None
+                
+            scrapers = self._reload_scrapers(config, sections, entries('sources'), loop_monitor)
+            
+            channels, subscriptions = entries('notifications'), entries('subscriptions')
+            notifiers = self.notifiers
+            if channels or subscriptions:
+                notifiers = [
+                    notifier for notifier in self.notifiers
+                    if getattr(notifier, 'channel', None) not in channels
+                    and getattr(notifier, 'subscription', None) not in subscriptions
+                ]
+                notifiers += self._initialize_notifiers(channels, subscriptions)
+        except Exception as e:
+            self.config = previous
+            logger.error(f"Config reload failed, keeping the running config: {e}")
+            return None
+            
+        # Swapped together, with no await in between
+        self.filter = article_filter
+        self.trends = trends
+        self.enricher = enricher
+        self.stories = stories
+        self.loop_monitor = loop_monitor
+        if self.websub is not None:
+            for scraper in self.scrapers:
+                if scraper not in scrapers:
+                    self.websub.unregister(scraper)
+            for scraper in scrapers:
+                self.websub.register(scraper)
+        self.scrapers = scrapers
+        self.notifiers = notifiers
+        
+        logger.info(f"Reloaded config in {(time.perf_counter() - started) * 1000:.1f} ms: {', '.join(changed)}")
+        return changed
+        
+    def _reload_scrapers(self, config: Dict[str, Any], sections: Set[str], sources: Set[str],
+                         loop_monitor: Optional[LoopMonitor]) -> List:
+        """Scrapers for a reloaded config: changed sources are rebuilt, the others kept"""
+        if self.workers > 1:
+            return []
+            
+        current = {scraper.config_key: scraper for scraper in self.scrapers}
+        health = next((scraper.health for scraper in self.scrapers), None)
+        if health is None or 'fetch' in sections:
+            health = FeedHealth(config['storage'].get('feed_health_file'), config.get('fetch'))
+        entry_cache = next((scraper.entry_cache for scraper in self.scrapers), None)
+        if entry_cache is None:
+            entry_cache = EntryCache(config['storage'].get('entry_cache_file'), config.get('entry_cache'))
+        elif 'entry_cache' in sections:
+            # Settings change in place; the cached entries stay
+            settings = dict(ENTRY_CACHE_DEFAULTS, **(config.get('entry_cache') or {}))
+            entry_cache.max_entries = settings['max_entries']
+            entry_cache.max_age_hours = settings['max_age_hours']
+            
+        scrapers = []
+        for name, source_config in config['sources'].items():
+            scraper = current.get(name)
+            if name in sources or scraper is None:
+                scraper = create_scraper(config, name, source_config)
+                if scraper is None:
+                    continue
+            scraper.health = health
+            scraper.entry_cache = entry_cache
+            scraper.loop_monitor = loop_monitor
+            scrapers.append(scraper)
+        return scrapers
+        
+    def _initialize_websub(self):
+        """WebSub subscriber for the scrapers' feeds, if enabled"""
+        websub_config = self.config.get('websub') or {}
+        if not websub_config.get('enabled'):
+            return None
+        if not websub_config.get('callback_url'):
+            logger.warning("WebSub is enabled without websub.callback_url; polling all feeds")
+            return None
+        if self.workers > 1:
+            logger.warning("WebSub needs the feeds parsed in this process; polling all feeds with --workers")
+            return None
+            
+        from utils.websub import WebSubSubscriber
+        
+        websub = WebSubSubscriber(
+            websub_config['callback_url'],
+            self.config['storage'].get('websub_file'),
+            settings={key: value for key, value in websub_config.items() if key not in ('enabled', 'callback_url')},
+            on_articles=self.ingest
+        )
+        for scraper in self.scrapers:
+            websub.register(scraper)
+        return websub
+        
+    async def ingest(self, articles: List[Article]):
+        """Queue pushed articles for a run of their own once the batch window has passed"""
+        self._pushed.extend(articles)
+        if self._push_flush is None:
+            self._push_flush = asyncio.ensure_future(self._flush_pushed())
+            
+    async def _flush_pushed(self):
+        """Run the queued pushed articles through the pipeline, after any run in progress"""
+        await asyncio.sleep(self.websub.batch_seconds)
+        async with self._run_lock:
+            # Pushes arriving from here on queue for the next batch
+            articles, self._pushed = self._pushed, []
+            self._push_flush = None
+            try:
+                await self.run(articles)
+            except Exception:
+                pass  # Already logged by run()
+                
+    def index_delivered(self, routes: Dict[Optional[str], List[Article]]):
+        """Add the articles delivered by this run to the search index; failures are logged"""
+        delivered = {article.digest: article for selected in routes.values() for article in selected}
+        try:
+            self.search_index.add(delivered.values())
+        except Exception as e:
+            logger.error(f"Failed to index articles for search: {e}")
+            
+    def enable_recording(self, archive: FeedArchive):
+        """Archive every raw feed response fetched during this run"""
+        archive.start_run()
+        for scraper in self.scrapers:
+            scraper.archive = archive
+            
+    async def replay(self, archive: FeedArchive, days: List[str] = None) -> List[Dict[str, Any]]:
+        """Re-run recorded feed responses through the pipeline with notifiers stubbed out"""
+        # Replays start from an empty history so results depend only on the captures
+        self.storage = Storage(tempfile.mkdtemp(prefix='replay-history-'))
+        self.filter.storage = self.storage
+        self.archive = None
+        self.search_index = None
+        self.enricher = None
+        self.trends = None
+        self.filter.record_decisions = False
+        # Later copies of replayed stories are held back as live runs would, without touching the live index
+        if self.stories is not None:
+            self.stories = StoryIndex(None, self.config.get('story_updates'), self.filter.similarity_threshold)
+            
+        notifier = load_object('notifiers.replay_notifier:ReplayNotifier')()
+        notifier.subscription = None
+        self.notifiers = [notifier]
+        
+        # Entries are memoized across the replayed runs only, as they would be across live runs
+        entry_cache = EntryCache(settings=self.config.get('entry_cache'))
+        for scraper in self.scrapers:
+            scraper.entry_cache = entry_cache
+            
+        report = []
+        runs = archive.list_runs(days)
+        started = time.perf_counter()
+        
+        for run_id, fetched_at, responses in runs:
+            session = archive.replay_session(responses)
+            for scraper in self.scrapers:
+                scraper.replay_session = session
+            self.filter.now = fetched_at
+            
+            delivered_before = len(notifier.deliveries)
+            run_started = time.perf_counter()
+            await self.run()
+            elapsed = time.perf_counter() - run_started
+            
+            delivered = sum(len(batch) for batch in notifier.deliveries[delivered_before:])
+            report.append({
+                'run': run_id,
+                'feeds': len(responses),
+                'delivered': delivered,
+                'entries_reused': entry_cache.last_hits,
+                'entries_parsed': entry_cache.last_misses,
+                'seconds': round(elapsed, 4)
+            })
+            
+        total = time.perf_counter() - started
+        logger.info(f"Replayed {len(runs)} runs in {total:.2f}s")
+        for entry in report:
+            logger.info(
+                f"Run {entry['run']}: {entry['feeds']} feeds, "
+                f"{entry['delivered']} articles, {entry['entries_reused']} of "
+                f"{entry['entries_reused'] + entry['entries_parsed']} entries reused, {entry['seconds']:.3f}s"
+            )
+            
+        return report
+        
+    def backfill(self, root: str, source: str = None, processes: int = None,
+                 chunk_size: int = 5000, dry_run: bool = False) -> DuplicateStats:
+        """Run archived feed files through the current filters and seed the history
+        
+        Files are parsed in a process pool with at most a few files in flight
+        per process, and the parsed articles are filtered in chunks. Memory is
+        bounded by the chunk size plus one digest per distinct article, which
+        repeats across feed snapshots are checked against. Similarity is
+        checked within a chunk. Survivors published within the retention
+        window are written to the history under their publication day.
+        """
+        from scrapers.feed_file_parser import find_feed_files, init_worker, parse_feed_file, source_for_path
+        
+        paths = find_feed_files(root)
+        processes = processes or os.cpu_count() or 1
+        logger.info(f"Backfilling {len(paths)} feed files from {root} with {processes} processes")
+        
+        # Archived articles are judged on content; age only decides what is kept in history
+        self.filter.check_age = False
+        self.filter.record_decisions = False
+        retention_days = self.config['storage']['history_retention_days']
+        cutoff_day = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        today = datetime.utcnow().strftime('%Y-%m-%d')
+        
+        totals = DuplicateStats()
+        seen = set()
+        pending = []
+        files_done = entries = kept = seeded = 0
+        started = last_report = time.perf_counter()
+        
+        def flush():
+            nonlocal kept, seeded
+            survivors = self.filter.filter_articles(pending, log_stats=False)
+            totals.merge(self.filter.last_stats)
+            kept += len(survivors)
+            pending.clear()
+            
+            by_day = {}
+            for article in survivors:
+                day = min(datetime.utcfromtimestamp(article.published_ts).strftime('%Y-%m-%d'), today)
+                if day >= cutoff_day:
+                    by_day.setdefault(day, []).append(article.digest)
+            if by_day and not dry_run:
+                self.storage.add_processed_by_day(by_day)
+                seeded += sum(len(digests) for digests in by_day.values())
+                
+        tasks = iter([(path, source_for_path(root, path, self.config['sources'], source)) for path in paths])
+        context = multiprocessing.get_context('spawn')
+        
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_worker,
+                                 initargs=(self.config['sources'], self.config.get('logging'))) as pool:
+            in_flight = set()
+            while True:
+                for path, file_source in itertools.islice(tasks, processes * 4 - len(in_flight)):
+                    in_flight.add(pool.submit(parse_feed_file, path, file_source))
+                if not in_flight:
+                    break
+                    
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry_count, articles = future.result()
+                    files_done += 1
+                    entries += entry_count
+                    for article in articles:
+                        # Feed snapshots repeat items; count repeats without re-filtering them
+                        if article.digest in seen:
+                            totals.total_articles += 1
+                            totals.duplicates_by_id += 1
+                            continue
+                        seen.add(article.digest)
+                        pending.append(article)
+                        
+                if len(pending) >= chunk_size:
+                    flush()
+                    
+                now = time.perf_counter()
+                if now - last_report >= 10:
+                    last_report = now
+                    logger.info(
+                        f"Backfill: {files_done}/{len(paths)} files, {entries} entries "
+                        f"({entries / (now - started):.0f}/s), {kept} kept"
+                    )
+                    
+        if pending:
+            flush()
+            
+        if not dry_run:
+            self.storage.cleanup_old_entries(retention_days)
+            
+        elapsed = time.perf_counter() - started
+        totals.log_stats()
+        logger.info(
+            f"Backfill finished: {files_done} files, {entries} entries in {elapsed:.1f}s "
+            f"({entries / max(elapsed, 1e-9):.0f} entries/s), {kept} kept, "
+            f"{seeded} written to history{' (dry run)' if dry_run else ''}"
+        )
+        return totals
+
+
+def next_run_delay(run_times: List[str], now: Optional[datetime] = None) -> float:
+    """Seconds until the next of the daily HH:MM run times (UTC)"""
+    now = now or datetime.utcnow()
+    candidates = []
+    for run_time in run_times:
+        hour, minute = (int(part) for part in run_time.split(':'))
+        candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= now:
+            candidate += timedelta(days=1)
+        candidates.append(candidate)
+    return (min(candidates) - now).total_seconds()
+    
+    
+def query_archive(config: Dict[str, Any], args: argparse.Namespace):
+    """Print the archived articles matching the query arguments"""
+    archive_dir = args.archive or config['storage'].get('archive_dir')
+    if not archive_dir or not os.path.isdir(archive_dir):
+        print(f"❌ No article archive at {archive_dir or 'storage.archive_dir'}")
+        sys.exit(1)
+        
+    started = time.perf_counter()
+    frame = ArticleArchive(archive_dir).query(
+        limit=args.limit or None, source=args.source, since=args.since, until=args.until,
+        category=args.category, keyword=args.keyword, decision=args.decision, columns=args.columns
+    )
+    elapsed = time.perf_counter() - started
+    
+    if args.format == 'csv':
+        print(frame.to_csv(index=False), end='')
+    elif args.format == 'json':
+        print(frame.to_json(orient='records', lines=True, date_format='iso'), end='')
+    else:
+        print(frame.to_string(index=False, max_colwidth=80) if len(frame) else "No matching articles")
+        print(f"{len(frame)} rows in {elapsed:.3f}s", file=sys.stderr)
+
+
+def search_articles(config: Dict[str, Any], args: argparse.Namespace):
+    """Print the delivered articles best matching the search arguments"""
+    index_dir = args.index or config['storage'].get('search_index_dir')
+    if not index_dir:
+        print("❌ No search index configured (storage.search_index_dir)")
+        sys.exit(1)
+    index = SearchIndex(index_dir)
+    
+    if args.rebuild:
+        archive_dir = config['storage'].get('archive_dir')
+        if not archive_dir or not os.path.isdir(archive_dir):
+            print(f"❌ No article archive at {archive_dir or 'storage.archive_dir'}")
+            sys.exit(1)
+        index.clear()
+        print(f"Indexed {index.add_archive(ArticleArchive(archive_dir))} delivered articles", file=sys.stderr)
+        
+    if not args.query:
+        return
+        
+    started = time.perf_counter()
+    results = index.search(' '.join(args.query), sources=args.source, since=args.since, until=args.until,
+                           limit=args.limit)
+    elapsed = time.perf_counter() - started
+    
+    if args.format == 'json':
+        for result in results:
+            print(json.dumps(result, ensure_ascii=False))
+        return
+        
+    for result in results:
+        published = datetime.utcfromtimestamp(result['published']).strftime('%Y-%m-%d %H:%M') if result['published'] else ''
+        print(f"{result['score']:7.2f}  {published:16}  {result['source']:10}  {result['title']}")
+        print(f"{'':38}{result['url']}")
+    print(f"{len(results)} results from {len(index)} articles in {elapsed * 1000:.1f}ms", file=sys.stderr)
+    
+    
+def parse_args(argv: List[str] = None) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Financial News Aggregator")
+    parser.add_argument('--config', default='config.yaml', help="Path to config.yaml")
+    parser.add_argument('--record', metavar='DIR', help="Archive raw feed responses into DIR")
+    parser.add_argument('--check-config', action='store_true', help="Validate config.yaml and exit")
+    parser.add_argument('--startup-report', action='store_true', help="Log lazy import times and startup milestones")
+    parser.add_argument('--warm-start', default=WARM_START_FILE, metavar='FILE',
+                        help="Snapshot of parsed config and history reused by the next run ('' to disable)")
+    parser.add_argument('--workers', type=int, default=1, help="Fetch and parse feeds in N worker processes")
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help="Only fetch shard I of N of the feeds and spool the articles for 'merge'")
+    parser.add_argument('--spool', default='data/spool', metavar='DIR', help="Spool directory shared by shards and merge")
+    parser.add_argument('--run-id', default=default_run_id(), help="Run the shards belong to (default: CI run or UTC hour)")
+    
+    subparsers = parser.add_subparsers(dest='command')
+    
+    replay_parser = subparsers.add_parser('replay', help="Replay archived feed responses offline")
+    replay_parser.add_argument('archive', help="Archive directory written by --record")
+    replay_parser.add_argument('--day', action='append', help="Only replay captures from this UTC day (YYYY-MM-DD)")
+    
+    backfill_parser = subparsers.add_parser('backfill', help="Run archived RSS/Atom files through the filters and seed the history")
+    backfill_parser.add_argument('directory', help="Directory of feed files (.xml, .rss, .atom, optionally .gz); top-level folders may be named after sources")
+    backfill_parser.add_argument('--source', help="Source name for all files, instead of the top-level folder")
+    backfill_parser.add_argument('--processes', type=int, help="Parser processes (default: all cores)")
+    backfill_parser.add_argument('--chunk-size', type=int, default=5000, help="Articles filtered per chunk")
+    backfill_parser.add_argument('--dry-run', action='store_true', help="Report filter results without writing the history")
+    
+    query_parser = subparsers.add_parser('query', help="Query the article archive")
+    query_parser.add_argument('--archive', metavar='DIR', help="Archive directory (default: storage.archive_dir)")
+    query_parser.add_argument('--source', action='append', help="Only this source; repeatable")
+    query_parser.add_argument('--since', help="Published on or after this UTC date or ISO time")
+    query_parser.add_argument('--until', help="Published on or before this UTC date or ISO time")
+    query_parser.add_argument('--category', help="Only articles with this category")
+    query_parser.add_argument('--keyword', help="Title or description contains this text, ignoring case")
+    query_parser.add_argument('--decision', action='append',
+                              help="Only this filter decision (delivered, similar, excluded, ...); repeatable")
+    query_parser.add_argument('--columns', type=lambda value: value.split(','),
+                              help="Comma-separated columns to show (default: published,source,decision,title,url)")
+    query_parser.add_argument('--limit', type=int, default=100, help="Maximum rows to return (0 for all)")
+    query_parser.add_argument('--format', choices=['table', 'csv', 'json'], default='table', help="Output format")
+    
+    search_parser = subparsers.add_parser('search', help="Full-text search over delivered articles")
+    search_parser.add_argument('query', nargs='*', help="Search terms; a trailing * matches a prefix, e.g. buyout*")
+    search_parser.add_argument('--index', metavar='DIR', help="Index directory (default: storage.search_index_dir)")
+    search_parser.add_argument('--source', action='append', help="Only this source; repeatable")
+    search_parser.add_argument('--since', help="Published on or after this UTC date or ISO time")
+    search_parser.add_argument('--until', help="Published on or before this UTC date or ISO time")
+    search_parser.add_argument('--limit', type=int, default=10, help="Number of results")
+    search_parser.add_argument('--format', choices=['table', 'json'], default='table', help="Output format")
+    search_parser.add_argument('--rebuild', action='store_true', help="Rebuild the index from the article archive first")
+    
+    serve_parser = subparsers.add_parser('serve', help="Run on schedule and serve the latest feed as JSON and RSS")
+    serve_parser.add_argument('--host', help="Address to listen on (default: server.host or 127.0.0.1)")
+    serve_parser.add_argument('--port', type=int, help="Port to listen on (default: server.port or 8080)")
+    serve_parser.add_argument('--interval', type=float, metavar='MINUTES', help="Run every N minutes instead of schedule.run_times")
+    serve_parser.add_argument('--run-now', action='store_true', help="Run once at startup instead of waiting for the schedule")
+    
+    merge_parser = subparsers.add_parser('merge', help="Filter and notify the articles spooled by --shard runs")
+    merge_parser.add_argument('--shards', type=int, required=True, help="Number of shards to wait for")
+    merge_parser.add_argument('--wait', type=float, default=300, help="Seconds to wait for missing shards")
+    
+    return parser.parse_args(argv)
 
 
 async def main():
     """Main entry point"""
-    aggregator = NewsAggregator()
-    await aggregator.run()
+    args = parse_args()
+    
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+    
+    # A snapshot from the last run skips parsing the config and reading the history
+    warm_start = WarmStart(args.warm_start, args.config) if args.warm_start and not args.command else None
+    warm_state = warm_start.load() if warm_start is not None else None
+    config = warm_state['config'] if warm_state else load_config(args.config)
+    STARTUP.mark('config_loaded')
+    
+    if args.check_config:
+        errors, warnings = check_config(config)
+        for warning in warnings:
+            print(f"⚠️  {warning}")
+        for error in errors:
+            print(f"❌ {error}")
+        if errors:
+            sys.exit(1)
+        print(f"✅ {args.config} is valid")
+        return
+        
+    if args.command == 'query':
+        query_archive(config, args)
+        return
+        
+    if args.command == 'search':
+        search_articles(config, args)
+        return
+        
+    # Log writes happen on a background thread, off the event loop
+    log_listener = setup_logging(config.get('logging'))
+    # The snapshot was read before logging was set up from its config
+    if warm_start is not None:
+        warm_start.log_outcome()
+    
+    try:
+        if args.shard:
+            # One shard of a multi-host run: fetch and parse only, the merge step delivers
+            articles = await gather_articles(create_scrapers(config, args.shard))
+            write_spool(args.spool, args.run_id, args.shard, articles)
+            return
+            
+        if args.record and args.workers > 1:
+            logger.error("--record needs a single process; drop --workers")
+            sys.exit(2)
+            
+        # Notifiers fill credentials into their config, which must not reach the snapshot
+        snapshot_config = copy.deepcopy(config) if warm_start is not None else None
+        aggregator = NewsAggregator(args.config, config, workers=args.workers, warm_state=warm_state)
+        
+        if args.command == 'backfill':
+            aggregator.backfill(args.directory, args.source, args.processes, args.chunk_size, args.dry_run)
+            return
+            
+        if args.command == 'merge':
+            articles = await asyncio.to_thread(read_spool, args.spool, args.run_id, args.shards, args.wait)
+            await aggregator.run(articles)
+            return
+            
+        if args.command == 'serve':
+            server_config = config.get('server') or {}
+            await aggregator.serve(
+                args.host or server_config.get('host', '127.0.0.1'),
+                args.port or server_config.get('port', 8080),
+                args.interval, args.run_now
+            )
+            return
+            
+        if args.command == 'replay':
+            await aggregator.replay(FeedArchive(args.archive), args.day)
+            return
+            
+        if args.record:
+            aggregator.enable_recording(FeedArchive(args.record))
+            
+        await aggregator.run()
+        
+        if warm_start is not None:
+            warm_start.save(snapshot_config, aggregator.storage)
+            
+        if args.startup_report:
+            logger.info("Startup report:\n" + STARTUP.format())
+    finally:
+        log_listener.stop()
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1 +1,18 @@
-# News notifiers package 
\ No newline at end of file
+# News notifiers package
+
+# Channel name -> (notifier class, config key -> environment variable), imported only when enabled
+NOTIFIERS = {
+    'telegram': ('notifiers.telegram_notifier:TelegramNotifier', {
+        'bot_token': 'TELEGRAM_BOT_TOKEN',
+        'chat_id': 'TELEGRAM_CHAT_ID'
+    }),
+    'slack': ('notifiers.slack_notifier:SlackNotifier', {
+        'webhook_url': 'SLACK_WEBHOOK_URL'
+    })
+}
+
+# Credentials a channel can be configured with instead, filled from the environment when set
+ALTERNATIVE_CREDENTIALS = {
+    # A bot token posts through the Web API, so messages can be edited later
+    'slack': {'bot_token': 'SLACK_BOT_TOKEN'}
+}
@@ -0,0 +1,25 @@
+"""
+Stub notifier used when replaying recorded feed responses
+"""
+
+import logging
+from typing import List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayNotifier:
+    """Capture notifications instead of delivering them"""
+    
+    def __init__(self, config: Dict[str, Any] = None):
+        """Initialize replay notifier"""
+        self.config = config or {}
+        self.deliveries = []
+        
+    async def send_notification(self, articles: List[Dict[str, Any]]):
+        """Record the articles that would have been sent"""
+        if not articles:
+            return
+            
+        self.deliveries.append(list(articles))
+        logger.info(f"Replay: would send {len(articles)} articles")
\ No newline at end of file
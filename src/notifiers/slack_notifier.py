@@ -3,30 +3,57 @@ Slack notifier for sending news updates
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import aiohttp
 import json
 
 logger = logging.getLogger(__name__)
 
+# Articles in one message: Slack allows 50 blocks, a header then an article and a divider each
+MAX_ARTICLES = 25
+
 
 class SlackNotifier:
-    """Send notifications to Slack"""
+    """Send notifications to Slack
+    
+    Messages go to the incoming webhook, or with a bot token through
+    chat.postMessage to the configured channel. Only messages posted with
+    the bot token can be edited later.
+    """
     
     def __init__(self, config: Dict[str, Any]):
         """Initialize Slack notifier"""
         self.config = config
-        self.webhook_url = config['webhook_url']
+        self.webhook_url = config.get('webhook_url')
+        self.bot_token = config.get('bot_token')
+        self.slack_channel = config.get('channel')
+        # Web API base URL; a local stand-in in tests
+        self.api_url = (config.get('api_url') or 'https://slack.com/api').rstrip('/')
+        if self.bot_token and not self.slack_channel:
+            raise ValueError("Slack bot_token needs a channel to post to")
+            
+    async def send_notification(self, articles: List[Dict[str, Any]],
+                                also: Optional[Dict[str, List[List[str]]]] = None) -> List[Tuple[List[Any], List[str]]]:
+        """Send articles to Slack
         
-    async def send_notification(self, articles: List[Dict[str, Any]]):
-        """Send articles to Slack"""
+        also lists other outlets of an article by its ID. Returns the channel
+        and timestamp of a message posted with the bot token, with the IDs of
+        its articles.
+        """
         try:
             if not articles:
-                return
+                return []
                 
             # Format message for Slack
-            payload = self._format_slack_message(articles)
+            payload = self._format_slack_message(articles, also)
             
+            if self.bot_token:
+                payload['channel'] = self.slack_channel
+                data = await self._call('chat.postMessage', payload)
+                shown = articles if len(articles) <= MAX_ARTICLES else articles[:MAX_ARTICLES - 1]
+                logger.info(f"Sent {len(articles)} articles to Slack")
+                return [([data['channel'], data['ts']], [article['id'] for article in shown])]
+                
             # Send to Slack webhook
             async with aiohttp.ClientSession() as session:
                 async with session.post(
@@ -39,19 +66,44 @@ class SlackNotifier:
                         raise Exception(f"Slack webhook failed: {response.status} - {error_text}")
                         
             logger.info(f"Sent {len(articles)} articles to Slack")
+            return []
             
         except Exception as e:
             logger.error(f"Error sending Slack notification: {e}")
             raise
             
-    def _format_slack_message(self, articles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def edit_message(self, ref: List[Any], articles: List[Dict[str, Any]],
+                           also: Dict[str, List[List[str]]]) -> bool:
+        """Render a posted message again with its articles' outlets"""
+        payload = self._format_slack_message(articles, also)
+        payload['channel'], payload['ts'] = ref
+        await self._call('chat.update', payload)
+        return True
+        
+    async def _call(self, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Call a Web API method with the bot token"""
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f"{self.api_url}/{method}",
+                json=payload,
+                headers={'Authorization': f"Bearer {self.bot_token}"}
+            ) as response:
+                data = await response.json(content_type=None)
+                
+        if not data.get('ok'):
+            raise Exception(f"Slack {method} failed: {response.status} - {data.get('error')}")
+        return data
+        
+    def _format_slack_message(self, articles: List[Dict[str, Any]],
+                              also: Optional[Dict[str, List[List[str]]]] = None) -> Dict[str, Any]:
         """Format articles for Slack blocks"""
+        title = self.config.get('title', 'Financial News Update')
         blocks = [
             {
                 "type": "header",
                 "text": {
                     "type": "plain_text",
-                    "text": "📰 Financial News Update",
+                    "text": f"📰 {title}",
                     "emoji": True
                 }
             }
@@ -73,6 +125,12 @@ class SlackNotifier:
                 }
             }
             
+            # Add the other outlets covering the story
+            sources = (also or {}).get(article['id'])
+            if sources:
+                links = ', '.join(f"<{link}|{name.upper()}>" for name, link in sources)
+                block["text"]["text"] += f"\n↳ also {links}"
+                
             # Add description if configured
             if self.config.get('include_summary') and article.get('description'):
                 description = article['description'][:200]
@@ -103,5 +161,5 @@ class SlackNotifier:
             
         return {
             "blocks": blocks,
-            "text": f"Financial News Update - {len(articles)} new articles"
+            "text": f"{title} - {len(articles)} new articles"
         } 
\ No newline at end of file
@@ -3,10 +3,11 @@ Telegram notifier for sending news updates
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 from telegram import Bot
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
 
 logger = logging.getLogger(__name__)
 
@@ -17,68 +18,122 @@ class TelegramNotifier:
     def __init__(self, config: Dict[str, Any]):
         """Initialize Telegram notifier"""
         self.config = config
-        self.bot = Bot(token=config['bot_token'])
+        # api_url points the bot at another Bot API server, such as a local stand-in
+        self.bot = Bot(token=config['bot_token'], base_url=config.get('api_url') or 'https://api.telegram.org/bot')
         self.chat_id = config['chat_id']
         
-    async def send_notification(self, articles: List[Dict[str, Any]]):
-        """Send articles to Telegram"""
+    async def send_notification(self, articles: List[Dict[str, Any]],
+                                also: Optional[Dict[str, List[List[str]]]] = None) -> List[Tuple[List[Any], List[str]]]:
+        """Send articles to Telegram
+        
+        also lists other outlets of an article by its ID. Articles are split
+        across messages only between articles; returns the chat and message
+        ID of each message with the IDs of its articles.
+        """
         try:
             if not articles:
-                return
+                return []
                 
-            # Format message
-            message = self._format_message(articles)
-            
-            # Split message if too long
             max_length = self.config.get('max_message_length', 4096)
-            
-            if len(message) <= max_length:
-                await self.bot.send_message(
-                    chat_id=self.chat_id,
-                    text=message,
-                    parse_mode=ParseMode.MARKDOWN_V2,
-                    disable_web_page_preview=True
-                )
-            else:
-                # Split into multiple messages
-                chunks = self._split_message(message, max_length)
-                for chunk in chunks:
-                    await self.bot.send_message(
-                        chat_id=self.chat_id,
-                        text=chunk,
-                        parse_mode=ParseMode.MARKDOWN_V2,
-                        disable_web_page_preview=True
-                    )
+            sent = []
+            for index, selected in enumerate(self._pack(articles, also, max_length)):
+                if index:
                     await asyncio.sleep(0.5)  # Avoid rate limiting
+                message = self._format_message(selected, also)
+                if len(message) > max_length:
+                    # A single article too long for a message is sent in pieces, which cannot be edited
+                    for chunk in self._split_message(message, max_length):
+                        await self._send(chunk)
+                    continue
                     
+                sent_message = await self._send(message)
+                sent.append(([sent_message.chat_id, sent_message.message_id], [article['id'] for article in selected]))
+                
             logger.info(f"Sent {len(articles)} articles to Telegram")
+            return sent
             
         except Exception as e:
             logger.error(f"Error sending Telegram notification: {e}")
             raise
             
-    def _format_message(self, articles: List[Dict[str, Any]]) -> str:
-        """Format articles for Telegram"""
-        lines = ["📰 *Financial News Update*\n"]
+    async def edit_message(self, ref: List[Any], articles: List[Dict[str, Any]],
+                           also: Dict[str, List[List[str]]]) -> bool:
+        """Render a sent message again with its articles' outlets; False if it no longer fits"""
+        message = self._format_message(articles, also)
+        if len(message) > self.config.get('max_message_length', 4096):
+            return False
+            
+        chat_id, message_id = ref
+        try:
+            await self.bot.edit_message_text(
+                text=message,
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode=ParseMode.MARKDOWN_V2,
+                disable_web_page_preview=True
+            )
+        except BadRequest as e:
+            # Another run already made the same edit
+            if 'not modified' not in str(e).lower():
+                raise
+        return True
         
+    async def _send(self, text: str):
+        """Send one message to the chat"""
+        return await self.bot.send_message(
+            chat_id=self.chat_id,
+            text=text,
+            parse_mode=ParseMode.MARKDOWN_V2,
+            disable_web_page_preview=True
+        )
+        
+    def _pack(self, articles: List[Dict[str, Any]], also: Optional[Dict[str, List[List[str]]]],
+              max_length: int) -> List[List[Dict[str, Any]]]:
+        """Group articles into messages of at most max_length characters"""
+        header = len(self._format_message([]))
+        messages = [[]]
+        length = header
         for article in articles:
-            # Escape special characters for Markdown V2
-            title = self._escape_markdown(article['title'])
-            source = self._escape_markdown(article['source'].upper())
-            url = article['url']
+            block = len(self._format_article(article, also)) + 1
+            if messages[-1] and length + block > max_length:
+                messages.append([])
+                length = header
+            messages[-1].append(article)
+            length += block
+        return messages
+        
+    def _format_message(self, articles: List[Dict[str, Any]],
+                        also: Optional[Dict[str, List[List[str]]]] = None) -> str:
+        """Format articles for Telegram"""
+        title = self._escape_markdown(self.config.get('title', 'Financial News Update'))
+        lines = [f"📰 *{title}*\n"]
+        lines.extend(self._format_article(article, also) for article in articles)
+        return "\n".join(lines)
+        
+    def _format_article(self, article: Dict[str, Any], also: Optional[Dict[str, List[List[str]]]] = None) -> str:
+        """Format one article, followed by its other outlets"""
+        # Escape special characters for Markdown V2
+        title = self._escape_markdown(article['title'])
+        source = self._escape_markdown(article['source'].upper())
+        url = article['url']
+        
+        # Add priority indicator
+        if article.get('priority', 0) > 0:
+            lines = [f"🔴 *{source}*: [{title}]({url})"]
+        else:
+            lines = [f"▫️ *{source}*: [{title}]({url})"]
+            
+        sources = (also or {}).get(article['id'])
+        if sources:
+            links = ', '.join(f"[{self._escape_markdown(name.upper())}]({link})" for name, link in sources)
+            lines.append(f"   ↳ also {links}")
+            
+        if self.config.get('include_summary') and article.get('description'):
+            description = self._escape_markdown(article['description'][:200])
+            lines.append(f"   _{description}_\n")
+        else:
+            lines.append("")
             
-            # Add priority indicator
-            if article.get('priority', 0) > 0:
-                lines.append(f"🔴 *{source}*: [{title}]({url})")
-            else:
-                lines.append(f"▫️ *{source}*: [{title}]({url})")
-                
-            if self.config.get('include_summary') and article.get('description'):
-                description = self._escape_markdown(article['description'][:200])
-                lines.append(f"   _{description}_\n")
-            else:
-                lines.append("")
-                
         return "\n".join(lines)
         
     def _escape_markdown(self, text: str) -> str:
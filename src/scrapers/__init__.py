@@ -1 +1,11 @@
-# News scrapers package 
\ No newline at end of file
+# News scrapers package
+
+# Source name -> scraper class, imported only when the source is enabled
+SCRAPERS = {
+    'bloomberg': 'scrapers.bloomberg_scraper:BloombergScraper',
+    'cnbc': 'scrapers.cnbc_scraper:CNBCScraper',
+    'ft': 'scrapers.ft_scraper:FTScraper',
+    'wsj': 'scrapers.wsj_scraper:WSJScraper',
+    'forbes': 'scrapers.forbes_scraper:ForbesScraper',
+    'economist': 'scrapers.economist_scraper:EconomistScraper'
+}
\ No newline at end of file
@@ -2,14 +2,20 @@
 Base scraper class for all news sources
 """
 
+import time
+import random
+import asyncio
 import logging
+import calendar
 import hashlib
+import contextlib
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import List, Dict, Any
-import aiohttp
-import feedparser
-from bs4 import BeautifulSoup
+from datetime import timezone
+from typing import List, Dict, Any, Optional, Tuple
+from utils.article import Article
+from utils.lazy_loader import STARTUP
+from utils.sharding import in_shard
+from utils.url_canonicalizer import UrlCanonicalizer
 
 logger = logging.getLogger(__name__)
 
@@ -21,109 +27,288 @@ class BaseScraper(ABC):
         """Initialize the scraper with configuration"""
         self.config = config
         self.source_name = self.__class__.__name__.replace('Scraper', '').lower()
+        # Key of the source in config['sources'], set when created from the config
+        self.config_key = None
         self.session = None
+        self.canonicalizer = UrlCanonicalizer(self.source_name, config.get('url_rules'))
+        # Set by the aggregator when recording or replaying raw feed responses
+        self.archive = None
+        self.replay_session = None
+        # (index, count) when only one shard of the feeds is fetched by this process
+        self.shard = None
+        # Shared FeedHealth driving timeouts, retries, hedging and circuits, and the run's fetch deadline
+        self.health = None
+        self.deadline = None
+        # WebSubSubscriber told about the hubs of parsed feeds; feeds it receives by push are not polled
+        self.websub = None
+        # Shared EntryCache of parsed entries, so unchanged entries are not parsed again
+        self.entry_cache = None
+        # AuthSession logging the session in for sources with credentials; None fetches anonymously
+        self.auth = None
+        # LoopMonitor attributing event-loop blocking to stages, when enabled
+        self.loop_monitor = None
         
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        if self.replay_session:
+            self.session = self.replay_session
+        else:
+            import aiohttp
+            self.session = aiohttp.ClientSession()
+            # All feeds of the source share this session and its login
+            if self.auth is not None:
+                await self.auth.open(self.session)
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
         if self.session:
+            if self.auth is not None and not self.replay_session:
+                self.auth.save(self.session)
             await self.session.close()
             
     @abstractmethod
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def scrape(self) -> List[Article]:
         """Scrape articles from the news source"""
         pass
         
-    async def fetch_rss_feeds(self, feed_urls: List[str]) -> List[Dict[str, Any]]:
-        """Fetch and parse RSS feeds"""
+    async def fetch_rss_feeds(self, feed_urls: List[str]) -> List[Article]:
+        """Fetch and parse RSS feeds concurrently"""
+        STARTUP.mark('first_request')
+        feed_urls = [feed_url for feed_url in feed_urls if in_shard(feed_url, self.shard)]
+        if self.websub is not None:
+            feed_urls = [feed_url for feed_url in feed_urls if not self.websub.is_active(feed_url)]
+        
+        # Replays serve recorded responses as-is, without timeouts, retries or circuits
+        if self.health is not None and not self.replay_session:
+            deadline = self.deadline or time.monotonic() + self.health.deadline_seconds
+            responses = await asyncio.gather(*(self._fetch_with_policy(feed_url, deadline) for feed_url in feed_urls))
+        else:
+            responses = await asyncio.gather(*(self._fetch_logged(feed_url) for feed_url in feed_urls))
+            
         articles = []
+        for feed_url, response in zip(feed_urls, responses):
+            if response is None:
+                continue
+            status, headers, body = response
+            
+            if self.archive:
+                self.archive.record(self.source_name, feed_url, status, headers, body)
+                
+            if status == 200:
+                # Parsing holds the loop while other scrapers' requests are in flight
+                with self.loop_monitor.stage('parse') if self.loop_monitor is not None else contextlib.nullcontext():
+                    articles.extend(self.parse_feed(feed_url, body, headers))
+            else:
+                logger.warning(f"Failed to fetch RSS feed {feed_url}: {status}")
+                
+        return articles
+        
+    def parse_feed(self, feed_url: str, body: bytes, headers: Dict[str, str]) -> List[Article]:
+        """Articles of a fetched or pushed feed document"""
+        import feedparser
+        
+        # Parse raw bytes so live and replayed runs decode identically
+        feed = feedparser.parse(body, response_headers=headers)
+        if self.websub is not None:
+            self.websub.discover(self, feed_url, feed)
+            
+        articles = []
+        for entry in feed.entries[:self.config.get('max_articles_per_run', 10)]:
+            article = self._parse_rss_entry(entry, feed_url)
+            if article:
+                articles.append(article)
+        return articles
+        
+    async def _fetch(self, feed_url: str, timeout: Optional[float] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """One GET of a feed as (status, lowercased headers, body)"""
+        kwargs = {}
+        if timeout is not None:
+            import aiohttp
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout)
+            
+        # A login rejected mid-run is renewed once, shared with the other feeds that saw it
+        for attempt in range(2):
+            generation = self.auth.generation if self.auth is not None else None
+            async with self.session.get(feed_url, **kwargs) as response:
+                body = await response.read()
+                headers = {key.lower(): value for key, value in response.headers.items()}
+                status = response.status
+            if status not in (401, 403) or generation is None or self.replay_session or attempt:
+                break
+            if not await self.auth.refresh(self.session, generation):
+                break
+        return status, headers, body
+            
+    async def _fetch_logged(self, feed_url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """Fetch a feed once; errors are logged and give None"""
+        try:
+            return await self._fetch(feed_url)
+        except Exception as e:
+            logger.error(f"Error fetching RSS feed {feed_url}: {e}")
+            return None
+            
+    async def _fetch_with_policy(self, feed_url: str, deadline: float) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """Fetch a feed under its circuit, timeout, hedging and retry policy
         
-        for feed_url in feed_urls:
+        Hosts with an open circuit are skipped. Timeouts follow the feed's
+        latency history, a hedge request goes out once the feed is slower
+        than its p95, and failed attempts are retried after full-jitter
+        exponential backoff while the run's deadline allows.
+        """
+        health = self.health
+        state = health.check(feed_url)
+        if state == 'open':
+            logger.info(f"Skipping RSS feed {feed_url}: circuit open for its host")
+            return None
+            
+        # A probe of a failing host gets one attempt
+        attempts = 1 if state == 'probe' else health.retries + 1
+        response = None
+        error = 'deadline exceeded'
+        
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+                
+            started = time.monotonic()
             try:
-                async with self.session.get(feed_url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        feed = feedparser.parse(content)
-                        
-                        for entry in feed.entries[:self.config.get('max_articles_per_run', 10)]:
-                            article = self._parse_rss_entry(entry)
-                            if article:
-                                articles.append(article)
-                    else:
-                        logger.warning(f"Failed to fetch RSS feed {feed_url}: {response.status}")
-                        
+                response = await self._fetch_hedged(
+                    feed_url, min(health.timeout_for(feed_url), remaining), health.hedge_delay(feed_url)
+                )
             except Exception as e:
-                logger.error(f"Error fetching RSS feed {feed_url}: {e}")
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            else:
+                status = response[0]
+                if status < 400:
+                    health.record_success(feed_url, time.monotonic() - started)
+                    return response
+                error = f"HTTP {status}"
+                # Other client errors will not change on retry, and the host is answering
+                if status < 500 and status != 429:
+                    health.record_failure(feed_url, error, host_down=False)
+                    return response
+                    
+            if attempt + 1 < attempts:
+                backoff = random.uniform(0, health.backoff_seconds * 2 ** attempt)
+                if time.monotonic() + backoff >= deadline:
+                    break
+                await asyncio.sleep(backoff)
                 
-        return articles
+        health.record_failure(feed_url, error)
+        logger.error(f"Error fetching RSS feed {feed_url}: {error}")
+        return response
         
-    def _parse_rss_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
-        """Parse RSS feed entry into article format"""
+    async def _fetch_hedged(self, feed_url: str, timeout: float,
+                            hedge_after: Optional[float]) -> Tuple[int, Dict[str, str], bytes]:
+        """Fetch a feed, sending a second request if the first is slower than hedge_after
+        
+        The first response to arrive wins and the other request is cancelled.
+        """
+        if not hedge_after or hedge_after >= timeout:
+            return await self._fetch(feed_url, timeout)
+            
+        primary = asyncio.ensure_future(self._fetch(feed_url, timeout))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+            
+        self.health.hedged += 1
+        hedge = asyncio.ensure_future(self._fetch(feed_url, timeout - hedge_after))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.health.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+                
+    def _parse_rss_entry(self, entry: Dict[str, Any], feed_url: Optional[str] = None) -> Optional[Article]:
+        """Parse RSS feed entry into an article record; entries of a feed_url go through the entry cache"""
+        key = None
+        if self.entry_cache is not None and feed_url:
+            key = self.entry_cache.key(self, feed_url, entry)
+            if key is not None:
+                article = self.entry_cache.get(key)
+                if article is not None:
+                    return article
+                    
         try:
-            # Generate unique ID
-            article_id = self._generate_article_id(entry.get('link', ''))
+            # Same article via different feeds or tracking links gets one ID
+            article_key = self.canonicalizer.article_key(entry)
             
             # Extract basic information
-            article = {
-                'id': article_id,
-                'source': self.source_name,
-                'title': entry.get('title', ''),
-                'url': entry.get('link', ''),
-                'description': self._clean_html(entry.get('summary', '')),
-                'timestamp': self._parse_date(entry.get('published', entry.get('updated', ''))),
-                'categories': [tag.term for tag in entry.get('tags', [])],
-                'author': entry.get('author', ''),
-                'scraped_at': datetime.utcnow().isoformat()
-            }
+            article = Article(
+                digest=self._generate_article_id(article_key),
+                source=self.source_name,
+                title=entry.get('title', ''),
+                url=self.canonicalizer.clean(entry.get('link', '')),
+                description=self._clean_html(entry.get('summary', '')),
+                published_ts=self._parse_date(entry.get('published', entry.get('updated', ''))),
+                categories=[tag.term for tag in entry.get('tags', [])],
+                author=entry.get('author', ''),
+                scraped_ts=time.time()
+            )
             
             # Check for priority keywords
-            article['priority'] = self._calculate_priority(article)
+            article.priority = self._calculate_priority(article)
             
+            if key is not None:
+                self.entry_cache.put(key, article)
             return article
             
         except Exception as e:
             logger.error(f"Error parsing RSS entry: {e}")
             return None
             
-    def _generate_article_id(self, url: str) -> str:
-        """Generate unique article ID from URL"""
-        return hashlib.md5(url.encode()).hexdigest()
+    def _generate_article_id(self, article_key: str) -> bytes:
+        """Generate unique article ID digest from the canonical article key"""
+        return hashlib.md5(article_key.encode()).digest()
         
     def _clean_html(self, html_text: str) -> str:
         """Remove HTML tags from text"""
         if not html_text:
             return ''
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html_text, 'html.parser')
         return soup.get_text().strip()
         
-    def _parse_date(self, date_str: str) -> str:
-        """Parse date string to ISO format"""
+    def _parse_date(self, date_str: str) -> float:
+        """Parse date string to UTC epoch seconds"""
         if not date_str:
-            return datetime.utcnow().isoformat()
+            return time.time()
             
         try:
             # feedparser returns a time struct
             if hasattr(date_str, 'tm_year'):
-                return datetime(*date_str[:6]).isoformat()
+                return float(calendar.timegm(date_str[:6]))
             else:
                 # Try parsing string date
                 from dateutil import parser
-                return parser.parse(date_str).isoformat()
+                parsed = parser.parse(date_str)
+                if parsed.tzinfo is None:
+                    parsed = parsed.replace(tzinfo=timezone.utc)
+                return parsed.timestamp()
         except:
-            return datetime.utcnow().isoformat()
+            return time.time()
             
-    def _calculate_priority(self, article: Dict[str, Any]) -> int:
+    def _calculate_priority(self, article: Article) -> int:
         """Calculate article priority based on keywords"""
         priority = 0
         
         # Priority keywords from config
         priority_keywords = ['breaking', 'urgent', 'exclusive', 'alert']
         
-        text = (article.get('title', '') + ' ' + article.get('description', '')).lower()
+        text = (article.title + ' ' + article.description).lower()
         
         for keyword in priority_keywords:
             if keyword in text:
@@ -5,6 +5,7 @@ Bloomberg news scraper
 import os
 import logging
 from typing import List, Dict, Any
+from utils.article import Article
 from .base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -13,7 +14,7 @@ logger = logging.getLogger(__name__)
 class BloombergScraper(BaseScraper):
     """Scraper for Bloomberg news"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def scrape(self) -> List[Article]:
         """Scrape articles from Bloomberg"""
         async with self:
             articles = []
@@ -4,6 +4,7 @@ The Economist news scraper
 
 import logging
 from typing import List, Dict, Any
+from utils.article import Article
 from .base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 class EconomistScraper(BaseScraper):
     """Scraper for The Economist news"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def scrape(self) -> List[Article]:
         """Scrape articles from The Economist"""
         async with self:
             articles = []
@@ -0,0 +1,92 @@
+"""
+Parser for archived RSS/Atom files, used by backfill worker processes
+"""
+
+import os
+import gzip
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from utils.article import Article
+from utils.logging_setup import setup_worker_logging
+from utils.url_canonicalizer import UrlCanonicalizer
+from .base_scraper import BaseScraper
+
+logger = logging.getLogger(__name__)
+
+# Files picked up when walking a backfill directory; .gz variants are decompressed
+FEED_EXTENSIONS = ('.xml', '.rss', '.atom', '.feed')
+
+# Source configs and per-source parsers of this worker process
+_SOURCES: Dict[str, Any] = {}
+_PARSERS: Dict[str, 'FeedFileParser'] = {}
+
+
+class FeedFileParser(BaseScraper):
+    """Parse feed files from disk with the same entry handling as live scrapers"""
+    
+    def __init__(self, source: str, config: Dict[str, Any]):
+        """Initialize parser for one source"""
+        super().__init__(config)
+        self.source_name = source
+        self.canonicalizer = UrlCanonicalizer(source, config.get('url_rules'))
+        
+    async def scrape(self) -> List[Article]:
+        """Archived files are parsed with parse_file, not scraped"""
+        return []
+        
+    def parse_file(self, path: str) -> Tuple[int, List[Article]]:
+        """Parse every entry of a feed file; returns the entry count and the articles"""
+        import feedparser
+        
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            feed = feedparser.parse(f.read())
+            
+        articles = []
+        for entry in feed.entries:
+            article = self._parse_rss_entry(entry)
+            if article:
+                articles.append(article)
+                
+        return len(feed.entries), articles
+
+
+def find_feed_files(root: str) -> List[str]:
+    """Feed files under root in path order"""
+    paths = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            name = filename[:-3] if filename.endswith('.gz') else filename
+            if name.endswith(FEED_EXTENSIONS) and not filename.startswith('.'):
+                paths.append(os.path.join(directory, filename))
+    return paths
+
+
+def source_for_path(root: str, path: str, sources: Dict[str, Any], default: Optional[str] = None) -> str:
+    """Source of a feed file: the default if given, else the top directory if it names a source"""
+    if default:
+        return default
+    top = os.path.relpath(path, root).split(os.sep)[0]
+    return top if top in sources else 'archive'
+
+
+def init_worker(sources: Dict[str, Any], logging_config: Optional[Dict[str, Any]] = None):
+    """Process pool initializer"""
+    setup_worker_logging(logging_config)
+    _SOURCES.clear()
+    _SOURCES.update(sources or {})
+    _PARSERS.clear()
+
+
+def parse_feed_file(path: str, source: str) -> Tuple[int, List[Article]]:
+    """Parse one feed file in a worker process; unreadable files count as empty"""
+    parser = _PARSERS.get(source)
+    if parser is None:
+        parser = _PARSERS[source] = FeedFileParser(source, _SOURCES.get(source) or {})
+        
+    try:
+        return parser.parse_file(path)
+    except Exception as e:
+        logger.error(f"Error parsing feed file {path}: {e}")
+        return 0, []
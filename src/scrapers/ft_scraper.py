@@ -2,10 +2,9 @@
 Financial Times news scraper
 """
 
-import os
 import logging
 from typing import List, Dict, Any
-from bs4 import BeautifulSoup
+from utils.article import Article
 from .base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -14,14 +13,13 @@ logger = logging.getLogger(__name__)
 class FTScraper(BaseScraper):
     """Scraper for Financial Times news"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def scrape(self) -> List[Article]:
         """Scrape articles from Financial Times"""
         async with self:
             articles = []
             
-            # FT requires subscription authentication
-            # This is a placeholder for FT API integration
-            # You would need to implement proper authentication
+            # With FT_CREDENTIALS and sources.ft.auth configured, the session is logged in
+            # (or reuses the login kept from an earlier run) before any feed is fetched
             
             # Try RSS feeds if available
             ft_rss_feeds = [
@@ -33,14 +31,8 @@ class FTScraper(BaseScraper):
             
             # Note: FT RSS feeds may have limited content
             # Full articles typically require authentication
-            credentials = os.getenv('FT_CREDENTIALS')
             
-            if credentials:
-                # Implement authenticated scraping here
-                # This would involve logging in and maintaining session
-                logger.info("FT credentials found, but authenticated scraping not yet implemented")
-            
-            # Try public RSS feeds
+            # Try RSS feeds
             try:
                 rss_articles = await self.fetch_rss_feeds(ft_rss_feeds[:self.config.get('max_articles_per_run', 10)])
                 articles.extend(rss_articles)
@@ -4,6 +4,7 @@ Wall Street Journal news scraper
 
 import logging
 from typing import List, Dict, Any
+from utils.article import Article
 from .base_scraper import BaseScraper
 
 logger = logging.getLogger(__name__)
@@ -12,7 +13,7 @@ logger = logging.getLogger(__name__)
 class WSJScraper(BaseScraper):
     """Scraper for Wall Street Journal news"""
     
-    async def scrape(self) -> List[Dict[str, Any]]:
+    async def scrape(self) -> List[Article]:
         """Scrape articles from Wall Street Journal"""
         async with self:
             articles = []
@@ -22,9 +23,8 @@ class WSJScraper(BaseScraper):
                 rss_articles = await self.fetch_rss_feeds(self.config['rss_feeds'])
                 articles.extend(rss_articles)
             
-            # Note: Full WSJ articles require subscription
-            # You would need to implement authenticated scraping
-            # or use WSJ API if available with your subscription
+            # Note: Full WSJ articles require subscription; with WSJ_CREDENTIALS and
+            # sources.wsj.auth configured the feeds are fetched in a logged-in session
             
             logger.info(f"Scraped {len(articles)} articles from Wall Street Journal")
             return articles 
\ No newline at end of file
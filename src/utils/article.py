@@ -0,0 +1,126 @@
+"""
+Compact article record shared by scrapers, filters and notifiers
+"""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from .article_features import ArticleFeatures, normalize_text
+
+
+class Article:
+    """Slotted article record with a read-only dict view for notifiers
+    
+    Source names, authors and categories are interned, times are stored as
+    UTC epoch seconds and the ID as raw digest bytes. The dict view renders
+    the ID as hex and times as ISO strings, as the original article dicts did.
+    """
+    
+    __slots__ = (
+        'digest', 'source', 'title', 'url', 'description', 'published_ts',
+        'categories', 'author', 'scraped_ts', 'priority', 'body',
+        '_normalized_title', '_normalized_description', '_features'
+    )
+    
+    # Keys exposed through the dict view
+    FIELDS = (
+        'id', 'source', 'title', 'url', 'description', 'timestamp',
+        'categories', 'author', 'scraped_at', 'priority'
+    )
+    
+    def __init__(self, digest: bytes, source: str, title: str, url: str,
+                 description: str = '', published_ts: float = 0.0,
+                 categories: Sequence[str] = (), author: str = '',
+                 scraped_ts: float = 0.0, priority: int = 0):
+        """Initialize article record"""
+        self.digest = digest
+        self.source = sys.intern(source)
+        self.title = title
+        self.url = url
+        self.description = description
+        self.published_ts = published_ts
+        self.categories = tuple(sys.intern(category) for category in categories)
+        self.author = sys.intern(author) if author else ''
+        self.scraped_ts = scraped_ts
+        self.priority = priority
+        # Full text extracted from the article page by the enrichment stage
+        self.body = ''
+        self._normalized_title = None
+        self._normalized_description = None
+        self._features = None
+        
+    @property
+    def id(self) -> str:
+        """Hex article ID as stored in the processed history"""
+        return self.digest.hex()
+        
+    @property
+    def timestamp(self) -> str:
+        """Publication time as an ISO string"""
+        return self._isoformat(self.published_ts)
+        
+    @property
+    def scraped_at(self) -> str:
+        """Scrape time as an ISO string"""
+        return self._isoformat(self.scraped_ts)
+        
+    @property
+    def normalized_title(self) -> str:
+        """Normalized title, computed on first use"""
+        if self._normalized_title is None:
+            self._normalized_title = normalize_text(self.title)
+        return self._normalized_title
+        
+    @property
+    def normalized_description(self) -> str:
+        """Normalized description, computed on first use"""
+        if self._normalized_description is None:
+            self._normalized_description = normalize_text(self.description)
+        return self._normalized_description
+        
+    @property
+    def features(self) -> ArticleFeatures:
+        """Duplicate detection features, extracted on first use"""
+        if self._features is None:
+            self._features = ArticleFeatures(self.normalized_title, self.normalized_description)
+        return self._features
+        
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return list(value) if key == 'categories' else value
+        
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access with a default"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+            
+    def keys(self) -> List[str]:
+        """Keys of the dict view"""
+        return list(self.FIELDS)
+        
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+        
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+        
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+        
+    def to_dict(self) -> Dict[str, Any]:
+        """Materialize the dict view"""
+        return {key: self[key] for key in self.FIELDS}
+        
+    def __repr__(self) -> str:
+        return f"Article(id={self.id!r}, source={self.source!r}, title={self.title!r})"
+        
+    @staticmethod
+    def _isoformat(ts: Optional[float]) -> str:
+        """Render epoch seconds as a naive UTC ISO string"""
+        if not ts:
+            return ''
+        return datetime.utcfromtimestamp(ts).isoformat()
\ No newline at end of file
@@ -0,0 +1,299 @@
+"""
+Day-partitioned Parquet archive of fetched articles and their filter decisions
+"""
+
+import os
+import glob
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from .article import Article
+from .file_lock import FileLock
+from .storage import _owner
+
+logger = logging.getLogger(__name__)
+
+# Compacted partitions hold one file under this name
+COMPACTED_FILE = 'day.parquet'
+
+# Lock file guarding compaction when no lock is shared with the archive
+LOCK_FILE = '.lock'
+
+# Columns of every archive file, in order
+COLUMNS = (
+    'id', 'source', 'title', 'url', 'description', 'published', 'scraped',
+    'categories', 'author', 'priority', 'decision', 'reason', 'subscriptions', 'run'
+)
+
+# Columns shown by queries when none are requested
+DEFAULT_COLUMNS = ['published', 'source', 'decision', 'title', 'url']
+
+
+def _schema():
+    """Arrow schema of the archive; pyarrow is imported on first use"""
+    import pyarrow as pa
+    
+    return pa.schema([
+        ('id', pa.string()),
+        ('source', pa.string()),
+        ('title', pa.string()),
+        ('url', pa.string()),
+        ('description', pa.string()),
+        ('published', pa.timestamp('us', tz='UTC')),
+        ('scraped', pa.timestamp('us', tz='UTC')),
+        ('categories', pa.list_(pa.string())),
+        ('author', pa.string()),
+        ('priority', pa.int32()),
+        ('decision', pa.string()),
+        ('reason', pa.string()),
+        ('subscriptions', pa.list_(pa.string())),
+        ('run', pa.string()),
+    ])
+
+
+class ArticleArchive:
+    """Append-only columnar archive of every article a run saw
+    
+    Layout under the archive root, partitioned by publication day (articles
+    without one use their scrape day):
+        day=<YYYY-MM-DD>/part-<run>-<host>-<pid>.parquet   one file per run and day
+        day=<YYYY-MM-DD>/day.parquet                        compacted partition
+        
+    Runs never rewrite each other's files, so appends need no lock;
+    compaction, which removes the files it merged, holds the lock given
+    (the history's, in the aggregator) or one in the archive root. Queries open only the partitions in their time range, read only the
+    requested columns and stream record batches instead of loading the
+    archive. Compaction merges a day's run files into one file sorted by
+    source and publication time, so row group statistics can skip sources.
+    """
+    
+    def __init__(self, root: str, lock: Optional[FileLock] = None):
+        """Initialize article archive"""
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.lock = lock if lock is not None else FileLock(os.path.join(root, LOCK_FILE))
+        
+    def append(self, records: Iterable[Tuple[Article, str, str, Sequence[str]]], run_id: str = None) -> int:
+        """Write (article, decision, reason, subscriptions) records; returns the number written"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        run_id = run_id or datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        
+        for article, decision, reason, subscriptions in records:
+            day_ts = article.published_ts or article.scraped_ts
+            day = datetime.utcfromtimestamp(day_ts).strftime('%Y-%m-%d') if day_ts else 'unknown'
+            by_day.setdefault(day, []).append({
+                'id': article.id,
+                'source': article.source,
+                'title': article.title,
+                'url': article.url,
+                'description': article.description,
+                'published': _timestamp(article.published_ts),
+                'scraped': _timestamp(article.scraped_ts),
+                'categories': list(article.categories),
+                'author': article.author,
+                'priority': article.priority,
+                'decision': decision,
+                'reason': reason,
+                'subscriptions': list(subscriptions),
+                'run': run_id,
+            })
+            
+        schema = _schema()
+        filename = f"part-{run_id}-{_owner()}.parquet"
+        for day, rows in by_day.items():
+            rows.sort(key=lambda row: row['published'] or row['scraped'] or _EPOCH)
+            table = pa.Table.from_pylist(rows, schema=schema)
+            self._write(day, filename, table)
+            
+        written = sum(len(rows) for rows in by_day.values())
+        logger.info(f"Archived {written} articles in {len(by_day)} day partitions")
+        return written
+        
+    def days(self, since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+        """Archived days within an inclusive YYYY-MM-DD range, in order"""
+        days = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith('day='):
+                continue
+            day = name[len('day='):]
+            if day == 'unknown':
+                # Undated articles are only part of unbounded queries
+                if since is None and until is None:
+                    days.append(day)
+                continue
+            if (since is None or day >= since) and (until is None or day <= until):
+                days.append(day)
+        return days
+        
+    def files(self, days: Iterable[str]) -> List[str]:
+        """Data files of the given days"""
+        paths = []
+        for day in days:
+            paths.extend(sorted(glob.glob(os.path.join(self._day_dir(day), '*.parquet'))))
+        return paths
+        
+    def scan(self, source: Optional[List[str]] = None, since: Optional[str] = None, until: Optional[str] = None,
+             category: Optional[str] = None, keyword: Optional[str] = None, decision: Optional[List[str]] = None,
+             columns: Optional[List[str]] = None, batch_size: int = 65536) -> Iterator[Any]:
+        """Stream matching rows as Arrow record batches
+        
+        since and until accept a date or an ISO datetime (UTC) and bound the
+        publication time; keyword matches title or description ignoring case;
+        category matches one of an article's categories exactly.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        
+        columns = list(columns or DEFAULT_COLUMNS)
+        unknown = [column for column in columns if column not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown archive columns: {', '.join(unknown)}")
+            
+        since_ts, until_ts = parse_time(since), parse_time(until, end=True)
+        paths = self.files(self.days(
+            since_ts.strftime('%Y-%m-%d') if since_ts else None,
+            until_ts.strftime('%Y-%m-%d') if until_ts else None
+        ))
+        if not paths:
+            return
+            
+        # Predicates are pushed into the scan; partition pruning already bounds the days
+        conditions = []
+        if source:
+            conditions.append(ds.field('source').isin(source))
+        if decision:
+            conditions.append(ds.field('decision').isin(decision))
+        if since_ts:
+            conditions.append(ds.field('published') >= pa.scalar(since_ts, pa.timestamp('us', tz='UTC')))
+        if until_ts:
+            conditions.append(ds.field('published') <= pa.scalar(until_ts, pa.timestamp('us', tz='UTC')))
+        if keyword:
+            conditions.append(
+                pc.match_substring(ds.field('title'), keyword, ignore_case=True)
+                | pc.match_substring(ds.field('description'), keyword, ignore_case=True)
+            )
+            
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+            
+        # List membership is checked per batch, so categories are read only when filtering on them
+        read_columns = columns + ['categories'] if category and 'categories' not in columns else columns
+        dataset = ds.dataset(paths, schema=_schema(), format='parquet')
+        
+        for batch in dataset.to_batches(columns=read_columns, filter=expression, batch_size=batch_size):
+            if category:
+                categories = batch.column('categories')
+                matches = pc.equal(pc.list_flatten(categories), category)
+                parents = pc.filter(pc.list_parent_indices(categories), matches)
+                mask = pc.is_in(pa.array(range(batch.num_rows), pa.int64()), value_set=pc.cast(parents, pa.int64()))
+                batch = batch.filter(mask).select(columns)
+            if batch.num_rows:
+                yield batch
+                
+    def query(self, limit: Optional[int] = None, **criteria) -> 'pandas.DataFrame':
+        """Matching rows as a DataFrame, stopping once limit rows are found"""
+        import pyarrow as pa
+        
+        batches = []
+        rows = 0
+        for batch in self.scan(**criteria):
+            if limit is not None and rows + batch.num_rows >= limit:
+                batches.append(batch.slice(0, limit - rows))
+                rows = limit
+                break
+            batches.append(batch)
+            rows += batch.num_rows
+            
+        columns = list(criteria.get('columns') or DEFAULT_COLUMNS)
+        schema = _schema()
+        empty = pa.schema([schema.field(column) for column in columns])
+        return pa.Table.from_batches(batches, schema=empty).to_pandas()
+        
+    def compact(self, before: Optional[str] = None) -> int:
+        """Merge the run files of each day before the given day (default today, UTC); returns days compacted
+        
+        Only files present when a day is read are merged and removed, so
+        runs appending to that day meanwhile keep their files.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        before = before or datetime.utcnow().strftime('%Y-%m-%d')
+        compacted = 0
+        
+        # Concurrent compactions would merge and remove the same files
+        with self.lock:
+            for day in self.days():
+                if day >= before and day != 'unknown':
+                    continue
+                paths = self.files([day])
+                if len(paths) < 2:
+                    continue
+                    
+                table = pa.concat_tables(pq.read_table(path, schema=_schema()) for path in paths)
+                table = table.sort_by([('source', 'ascending'), ('published', 'ascending')])
+                self._write(day, COMPACTED_FILE, table, group_by='source')
+                
+                compacted_path = os.path.join(self._day_dir(day), COMPACTED_FILE)
+                for path in paths:
+                    if path != compacted_path:
+                        os.remove(path)
+                compacted += 1
+                
+        if compacted:
+            logger.info(f"Compacted {compacted} archive days")
+        return compacted
+        
+    def _write(self, day: str, filename: str, table, group_by: Optional[str] = None):
+        """Atomically write a table into a day partition
+        
+        With group_by, the table must be sorted by that column and each of its
+        values gets its own row group, whose statistics let scans filtering
+        on the column skip the others.
+        """
+        import pyarrow.parquet as pq
+        
+        directory = self._day_dir(day)
+        os.makedirs(directory, exist_ok=True)
+        # Dot-prefixed temporary files are ignored by readers until renamed
+        tmp_path = os.path.join(directory, f".{filename}.{os.getpid()}.tmp")
+        
+        with pq.ParquetWriter(tmp_path, table.schema, compression='zstd') as writer:
+            if group_by is None:
+                writer.write_table(table)
+            else:
+                offset = 0
+                for group in table.column(group_by).value_counts():
+                    count = group['counts'].as_py()
+                    writer.write_table(table.slice(offset, count))
+                    offset += count
+        os.replace(tmp_path, os.path.join(directory, filename))
+        
+    def _day_dir(self, day: str) -> str:
+        """Partition directory of a day"""
+        return os.path.join(self.root, f"day={day}")
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _timestamp(ts: float) -> Optional[datetime]:
+    """Epoch seconds as an aware UTC datetime, None if unset"""
+    return datetime.fromtimestamp(ts, timezone.utc) if ts else None
+
+
+def parse_time(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """Parse a query bound; a bare date covers the whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed = parsed.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
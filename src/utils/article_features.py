@@ -0,0 +1,369 @@
+"""
+Per-article text features used by duplicate detection
+"""
+
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, Optional
+
+# Source prefixes like "Bloomberg: " or "WSJ - "
+_COLON_PREFIX = re.compile(r'^[^:]+:\s*')
+_DASH_PREFIX = re.compile(r'^[^-]+-\s*')
+
+# Common news phrases removed before comparison
+_REMOVE_PHRASES = (
+    'breaking:', 'exclusive:', 'update:', 'alert:', 'just in:',
+    'sources say', 'report says', 'according to'
+)
+
+# Key entities (companies, large numbers, percentages)
+ENTITY_PATTERN = re.compile(
+    r'\b(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*|(?:\d+\.?\d*)[%$]?(?:\s*(?:billion|million|trillion|bn|mn))?)\b'
+)
+
+# Common words that might be falsely detected as entities
+COMMON_WORDS = frozenset({'The', 'This', 'That', 'These', 'Those', 'After', 'Before', 'During'})
+
+# Descriptions are compared on this many normalized characters
+DESCRIPTION_PREFIX = 200
+
+# Characters counted separately for the ratio bound; other ASCII characters share ten buckets by
+# code, and all non-ASCII characters one, which only loosens the bound
+_BUCKET_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789 '
+CHAR_BUCKETS = len(_BUCKET_CHARS) + 11
+
+# Bucket of each character code up to 127, and of everything beyond at index 128
+_bucket_table = None
+
+# Code padding texts in a code matrix; not a code point, so it matches nothing
+PAD_CODE = 0xFFFFFFFF
+
+# Candidates below this many are bounded one by one rather than in one vectorized pass
+VECTOR_MIN = 8
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for comparison"""
+    if not text:
+        return ''
+        
+    # Convert to lowercase
+    text = text.lower()
+    
+    # Remove source prefixes
+    text = _COLON_PREFIX.sub('', text)
+    text = _DASH_PREFIX.sub('', text)
+    
+    # Remove common news phrases
+    for phrase in _REMOVE_PHRASES:
+        text = text.replace(phrase, '')
+        
+    # Remove extra whitespace
+    text = ' '.join(text.split())
+    
+    return text.strip()
+
+
+def extract_entities(text: str) -> FrozenSet[str]:
+    """Extract key entities from text"""
+    return frozenset(ENTITY_PATTERN.findall(text)) - COMMON_WORDS
+
+
+def char_counts(texts: List[str]):
+    """Character counts of texts by bucket, as a (len(texts), CHAR_BUCKETS) int16 array
+    
+    Two texts can match at most the smaller of their counts in each bucket,
+    so summing the minimums bounds SequenceMatcher's quick_ratio, and with
+    it ratio(), from above.
+    """
+    import numpy as np
+    
+    global _bucket_table
+    if _bucket_table is None:
+        table = np.array([len(_BUCKET_CHARS) + code % 10 for code in range(128)] + [CHAR_BUCKETS - 1], dtype=np.intp)
+        for bucket, char in enumerate(_BUCKET_CHARS):
+            table[ord(char)] = bucket
+        _bucket_table = table
+        
+    counts = np.zeros((len(texts), CHAR_BUCKETS), dtype=np.int16)
+    for row, text in enumerate(texts):
+        if text:
+            codes = np.minimum(np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32), 128)
+            counts[row] = np.bincount(_bucket_table[codes], minlength=CHAR_BUCKETS)
+    return counts
+
+
+def char_codes(texts: List[str], width: Optional[int] = None):
+    """Character codes of texts as rows of a uint32 matrix, padded with PAD_CODE"""
+    import numpy as np
+    
+    if width is None:
+        width = max((len(text) for text in texts), default=0)
+    codes = np.full((len(texts), width), PAD_CODE, dtype=np.uint32)
+    for row, text in enumerate(texts):
+        if text:
+            codes[row, :len(text)] = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    return codes
+
+
+def ratio_bounds(counts, lengths, query_counts, query_length: int):
+    """Upper bounds of the SequenceMatcher ratio between a query text and each counted text"""
+    import numpy as np
+    
+    matches = np.minimum(counts, query_counts).sum(axis=1)
+    return 2.0 * matches / np.maximum(lengths + query_length, 1)
+
+
+def shares_key_info(entities1: FrozenSet[str], entities2: FrozenSet[str], shared: Optional[int] = None) -> bool:
+    """Check if two entity sets share most of their key information"""
+    # If both titles have substantial entities and share most of them, they're likely duplicates
+    if len(entities1) >= 2 and len(entities2) >= 2:
+        if shared is None:
+            shared = len(entities1 & entities2)
+        if shared >= min(len(entities1), len(entities2)) * 0.6:
+            return True
+            
+    return False
+
+
+class SubsequenceBound:
+    """Upper bound of SequenceMatcher ratios against one text from the longest common subsequence
+    
+    The matching blocks ratio() counts appear in the same order in both
+    texts, so they never cover more characters than a longest common
+    subsequence. Its length is computed bit-parallel (Hyyrö), with one
+    bitmask of positions per character of this text, or of many other
+    texts at once.
+    """
+    
+    __slots__ = ('text', '_masks', '_full')
+    
+    def __init__(self, text: str):
+        """Precompute the character position masks of text"""
+        self.text = text
+        self._masks: Dict[str, int] = {}
+        for position, char in enumerate(text):
+            self._masks[char] = self._masks.get(char, 0) | (1 << position)
+        self._full = (1 << len(text)) - 1
+        
+    def allows(self, other: str, threshold: float) -> bool:
+        """Whether the ratio between this text and other can exceed threshold"""
+        full = self._full
+        masks = self._masks
+        row = full
+        for char in other:
+            matches = row & masks.get(char, 0)
+            row = ((row + matches) | (row - matches)) & full
+        common = len(self.text) - bin(row).count('1')
+        return 2.0 * common / max(len(self.text) + len(other), 1) > threshold
+        
+    def bounds(self, codes, lengths):
+        """Ratio bounds against each row of a char_codes matrix with the given text lengths
+        
+        The rows are laid end to end in one integer, each followed by a
+        zero guard bit that absorbs its carries, and this text is run
+        through all of them at once.
+        """
+        import numpy as np
+        
+        if not self.text or not len(codes):
+            return np.zeros(len(codes))
+        width = int(lengths.max())
+        stride = width + 1
+        block = np.full((len(codes), stride), PAD_CODE, dtype=np.uint32)
+        block[:, :width] = codes[:, :width]
+        
+        def bits(flags) -> int:
+            return int.from_bytes(np.packbits(flags.ravel(), bitorder='little').tobytes(), 'little')
+            
+        # One comparison and one packbits call for all characters of this text
+        chars = list(self._masks)
+        flags = block.ravel() == np.array([ord(char) for char in chars], dtype=np.uint32)[:, None]
+        packed = np.packbits(flags, axis=1, bitorder='little')
+        masks = {char: int.from_bytes(row.tobytes(), 'little') for char, row in zip(chars, packed)}
+        guards = np.zeros((len(codes), stride), dtype=bool)
+        guards[:, width] = True
+        full = ((1 << block.size) - 1) ^ bits(guards)
+        
+        # Matches are a subset of row, so row - matches is row ^ matches
+        row = full
+        for char in self.text:
+            matches = row & masks[char]
+            row = ((row + matches) | (row ^ matches)) & full
+            
+        ones = np.unpackbits(np.frombuffer(row.to_bytes((block.size + 7) // 8, 'little'), dtype=np.uint8),
+                             count=block.size, bitorder='little').reshape(len(codes), stride)
+        common = width - ones[:, :width].sum(axis=1)
+        return 2.0 * common / np.maximum(lengths + len(self.text), 1)
+        
+    def passing(self, positions, texts: List[str], codes, lengths, threshold: float) -> List[int]:
+        """Candidate positions, ascending, of texts whose ratio with this text can exceed threshold
+        
+        codes and lengths are the char_codes rows and text lengths of all
+        texts; a few candidates are bounded one by one, many in one pass.
+        """
+        if len(positions) < VECTOR_MIN:
+            return [position for position in positions.tolist() if self.allows(texts[position], threshold)]
+        return positions[self.bounds(codes[positions], lengths[positions]) > threshold].tolist()
+
+
+class ArticleFeatures:
+    """Normalized text and entities computed once per article"""
+    
+    __slots__ = ('title', 'description', 'description_length', 'entities',
+                 '_title_matcher', '_description_matcher')
+                
+    def __init__(self, normalized_title: str, normalized_description: str):
+        """Extract features from normalized title and description"""
+        self.title = normalized_title
+        self.description = normalized_description[:DESCRIPTION_PREFIX]
+        self.description_length = len(normalized_description)
+        self.entities = extract_entities(normalized_title)
+        self._title_matcher = None
+        self._description_matcher = None
+        
+    def title_matcher(self) -> SequenceMatcher:
+        """Matcher with this title as the second sequence, built once"""
+        if self._title_matcher is None:
+            self._title_matcher = SequenceMatcher(None)
+            self._title_matcher.set_seq2(self.title)
+        return self._title_matcher
+        
+    def description_matcher(self) -> SequenceMatcher:
+        """Matcher with this description prefix as the second sequence, built once"""
+        if self._description_matcher is None:
+            self._description_matcher = SequenceMatcher(None)
+            self._description_matcher.set_seq2(self.description)
+        return self._description_matcher
+
+
+def _exceeds(matcher: SequenceMatcher, text: str, threshold: float) -> bool:
+    """Check matcher similarity against text, trying cheap upper bounds first"""
+    matcher.set_seq1(text)
+    return (
+        matcher.real_quick_ratio() > threshold and
+        matcher.quick_ratio() > threshold and
+        matcher.ratio() > threshold
+    )
+
+
+class SimilarityIndex:
+    """Features of accepted articles, with lookups that skip hopeless comparisons
+    
+    Entities index the key information check. For the SequenceMatcher
+    comparisons, character counts of every indexed title and description
+    prefix are kept in arrays, and one vectorized pass bounds the ratio of
+    the new text against all of them. Articles passing that bound are
+    checked against the longest common subsequence bound, vectorized too
+    when there are many, and only those passing both are compared.
+    Neither bound falls below the real ratio, so the result is the same as
+    comparing against every accepted article: the earliest similar one.
+    The bounds are cheaper than ratios but still computed against every
+    indexed article, so a run of n articles costs O(n^2); bucketing by
+    shared words or shingles could miss pairs the ratio joins.
+    """
+    
+    def __init__(self, title_threshold: float, description_threshold: float = 0.8):
+        """Initialize empty index"""
+        self.title_threshold = title_threshold
+        self.description_threshold = description_threshold
+        self.entries: List[ArticleFeatures] = []
+        self.by_entity: Dict[str, List[int]] = defaultdict(list)
+        self._titles = _CharProfiles()
+        self._descriptions = _CharProfiles()
+        
+    def __len__(self) -> int:
+        return len(self.entries)
+        
+    def add(self, features: ArticleFeatures) -> int:
+        """Add an accepted article's features and return its position"""
+        position = len(self.entries)
+        self.entries.append(features)
+        for entity in features.entities:
+            self.by_entity[entity].append(position)
+        self._titles.add(features.title)
+        # Short descriptions are never compared, so they are indexed as empty
+        self._descriptions.add(features.description if features.description_length > 50 else '')
+        return position
+        
+    def find_similar(self, features: ArticleFeatures) -> Optional[int]:
+        """Return the earliest position of an indexed article similar to features, if any"""
+        found = None
+        
+        # Key information check only looks at articles sharing an entity
+        if len(features.entities) >= 2:
+            shared_counts = Counter()
+            for entity in features.entities:
+                shared_counts.update(self.by_entity.get(entity, ()))
+            for position, shared in sorted(shared_counts.items()):
+                if shares_key_info(features.entities, self.entries[position].entities, shared):
+                    found = position
+                    break
+                    
+        # Check title similarity
+        if features.title:
+            for position in self._titles.candidates(features.title, self.title_threshold, found):
+                if _exceeds(self.entries[position].title_matcher(), features.title, self.title_threshold):
+                    found = position
+                    break
+                    
+        # Check description similarity if both are substantial
+        if features.description_length > 50 and features.description:
+            for position in self._descriptions.candidates(features.description, self.description_threshold, found):
+                if _exceeds(self.entries[position].description_matcher(), features.description, self.description_threshold):
+                    found = position
+                    break
+                    
+        return found
+
+
+class _CharProfiles:
+    """Indexed texts with their character counts, codes and lengths, in arrays grown by doubling"""
+    
+    def __init__(self):
+        self.texts: List[str] = []
+        self._counts = None
+        self._codes = None
+        self._lengths = None
+        
+    def add(self, text: str):
+        """Append a text's profile"""
+        import numpy as np
+        
+        size = len(self.texts)
+        capacity = len(self._lengths) if self._lengths is not None else 0
+        width = self._codes.shape[1] if self._codes is not None else 0
+        if size == capacity or len(text) > width:
+            if size == capacity:
+                capacity = max(64, 2 * capacity)
+            if len(text) > width:
+                width = max(64, 2 * width, len(text))
+            counts = np.zeros((capacity, CHAR_BUCKETS), dtype=np.int16)
+            codes = np.full((capacity, width), PAD_CODE, dtype=np.uint32)
+            lengths = np.zeros(capacity, dtype=np.int64)
+            if self._counts is not None:
+                counts[:size] = self._counts[:size]
+                codes[:size, :self._codes.shape[1]] = self._codes[:size]
+                lengths[:size] = self._lengths[:size]
+            self._counts, self._codes, self._lengths = counts, codes, lengths
+            
+        self._counts[size] = char_counts([text])[0]
+        self._codes[size] = char_codes([text], width)[0]
+        self._lengths[size] = len(text)
+        self.texts.append(text)
+        
+    def candidates(self, text: str, threshold: float, before: Optional[int] = None) -> List[int]:
+        """Positions of indexed texts, below before, whose ratio with text may exceed threshold
+        
+        Positions come in ascending order and pass both the character count
+        and the common subsequence bound.
+        """
+        import numpy as np
+        
+        size = len(self.texts) if before is None else before
+        if not size:
+            return []
+        bounds = ratio_bounds(self._counts[:size], self._lengths[:size], char_counts([text])[0], len(text))
+        positions = np.flatnonzero(bounds > threshold)
+        return SubsequenceBound(text).passing(positions, self.texts, self._codes, self._lengths, threshold)
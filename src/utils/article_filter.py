@@ -2,15 +2,21 @@
 Article filtering utilities with enhanced duplicate detection
 """
 
+import time
 import logging
-import re
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Set
-from difflib import SequenceMatcher
+from datetime import timezone
+from collections import Counter
+from typing import List, Dict, Any, Optional, Set, Tuple
+from .article import Article
+from .article_features import SimilarityIndex, normalize_text
 from .duplicate_stats import DuplicateStats
+from .keyword_index import KeywordIndex
 
 logger = logging.getLogger(__name__)
 
+# Normalized characters of two bodies that must match for them to be the same story
+BODY_OPENING_CHARS = 500
+
 
 class ArticleFilter:
     """Filter and deduplicate articles"""
@@ -21,218 +27,286 @@ class ArticleFilter:
         self.storage = storage
         self.filters = config.get('filters', {})
         self.similarity_threshold = self.filters.get('similarity_threshold', 0.75)
+        # Reference time for age checks; replays pin this to the capture time
+        self.now = None
+        # Backfills of archived feeds keep articles of any age
+        self.check_age = True
+        # Statistics of the most recent filter_articles call
+        self.last_stats = None
+        # When enabled, (article, decision, reason) for every article of the most recent call
+        self.record_decisions = False
+        self.last_decisions: List[Tuple[Article, str, str]] = []
+        # Copies dropped as similar by the most recent call, by the digest of the article kept
+        self.last_similar: Dict[bytes, List[Article]] = {}
+        
+        # Lowercase keyword lists once rather than per article
+        self.exclude_keywords = [k.lower() for k in self.filters.get('exclude_keywords', [])]
+        self.required_keywords = [k.lower() for k in self.filters.get('required_keywords', [])]
+        self.priority_keywords = [k.lower() for k in self.filters.get('priority_keywords', [])]
         
-    def filter_articles(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Subscriptions select slices of the filtered articles for their own channels
+        self.subscriptions: Dict[str, Dict[str, Any]] = config.get('subscriptions') or {}
+        
+        # Global and subscription keywords share one index, so each article is scanned once
+        self.keyword_index = KeywordIndex()
+        self.keyword_index.add_all(self.exclude_keywords, (None, 'exclude'))
+        self.keyword_index.add_all(self.required_keywords, (None, 'required'))
+        self.keyword_index.add_all(self.priority_keywords, (None, 'priority'))
+        for name, subscription in self.subscriptions.items():
+            self.keyword_index.add_all(subscription.get('exclude_keywords', []), (name, 'exclude'))
+            self.keyword_index.add_all(subscription.get('required_keywords', []), (name, 'required'))
+            
+        # Keyword hits of accepted articles by digest, reused when routing
+        self._keyword_hits: Dict[bytes, Counter] = {}
+        
+    def filter_articles(self, articles: List[Article], log_stats: bool = True) -> List[Article]:
         """Apply all filters to articles"""
         stats = DuplicateStats()
         stats.total_articles = len(articles)
+        self.last_stats = stats
         
         filtered = []
-        seen_titles = []  # Track titles we've already seen
+        self._keyword_hits = {}
+        decisions = self.last_decisions = []
+        copies = self.last_similar = {}
+        record = self.record_decisions
+        seen_ids = set()  # Exact IDs seen this run, across feeds and sources
+        similarity_index = SimilarityIndex(self.similarity_threshold)  # Features of accepted articles
         
         # Sort articles by priority and timestamp to keep the best version
         sorted_articles = sorted(
             articles, 
-            key=lambda x: (x.get('priority', 0), x.get('timestamp', '')), 
+            key=lambda x: (x.priority, x.published_ts), 
             reverse=True
         )
         
+        # Per-article debug lines are only formatted when debug logging is on
+        debug = logger.isEnabledFor(logging.DEBUG)
+        
         for article in sorted_articles:
+            # Check if the same canonical article already came from another feed
+            if article.digest in seen_ids:
+                if debug:
+                    logger.debug(f"Skipping repeated article: {article.title}")
+                stats.duplicates_by_id += 1
+                if record:
+                    decisions.append((article, 'repeated', ''))
+                continue
+            seen_ids.add(article.digest)
+            
             # Check if already processed
             if self._is_duplicate(article):
-                logger.debug(f"Skipping duplicate article: {article['title']}")
+                if debug:
+                    logger.debug(f"Skipping duplicate article: {article.title}")
                 stats.duplicates_by_id += 1
+                if record:
+                    decisions.append((article, 'processed', ''))
                 continue
                 
             # Check for similar articles already in filtered list
-            if self._is_similar_to_existing(article, seen_titles):
-                logger.debug(f"Skipping similar article: {article['title']}")
+            position = similarity_index.find_similar(article.features)
+            if position is not None:
+                if debug:
+                    logger.debug(f"Skipping similar article: {article.title}")
                 stats.duplicates_by_similarity += 1
+                copies.setdefault(filtered[position].digest, []).append(article)
+                if record:
+                    decisions.append((article, 'similar', filtered[position].id))
                 continue
                 
+            # One scan finds the keywords of every rule set
+            hits = self._scan_keywords(article)
+            
             # Check exclude keywords
-            if self._contains_excluded_keywords(article):
-                logger.debug(f"Skipping excluded article: {article['title']}")
+            if self._contains_excluded_keywords(article, hits):
+                if debug:
+                    logger.debug(f"Skipping excluded article: {article.title}")
                 stats.excluded_by_keywords += 1
+                if record:
+                    decisions.append((article, 'excluded', ', '.join(self._matched_keywords(article, (None, 'exclude')))))
                 continue
                 
             # Check required keywords
-            if not self._contains_required_keywords(article):
-                logger.debug(f"Skipping article without required keywords: {article['title']}")
+            if not self._contains_required_keywords(article, hits):
+                if debug:
+                    logger.debug(f"Skipping article without required keywords: {article.title}")
                 stats.excluded_by_requirements += 1
+                if record:
+                    decisions.append((article, 'missing_required', ''))
                 continue
                 
             # Check if article is recent enough
-            if not self._is_recent(article):
-                logger.debug(f"Skipping old article: {article['title']}")
+            if self.check_age and not self._is_recent(article):
+                if debug:
+                    logger.debug(f"Skipping old article: {article.title}")
                 stats.excluded_by_age += 1
+                if record:
+                    decisions.append((article, 'too_old', ''))
                 continue
                 
             # Apply priority keywords
-            self._apply_priority_keywords(article)
+            self._apply_priority_keywords(article, hits)
             
-            # Add to filtered list and track title
+            # Add to filtered list and index it for similarity checks
             filtered.append(article)
-            seen_titles.append({
-                'title': article.get('title', ''),
-                'description': article.get('description', '')
-            })
+            self._keyword_hits[article.digest] = hits
+            similarity_index.add(article.features)
+            if record:
+                decisions.append((article, 'accepted', ''))
             
         stats.final_count = len(filtered)
-        stats.log_stats()
+        if log_stats:
+            stats.log_stats()
         
         return filtered
         
-    def _is_duplicate(self, article: Dict[str, Any]) -> bool:
-        """Check if article has been processed recently"""
-        article_id = article.get('id')
-        if not article_id:
-            return False
-            
-        return self.storage.is_processed(article_id)
+    def refine(self, articles: List[Article]) -> List[Article]:
+        """Re-check filtered articles that have a body from enrichment
         
-    def _is_similar_to_existing(self, article: Dict[str, Any], seen_titles: List[Dict[str, str]]) -> bool:
-        """Check if article is similar to already filtered articles"""
-        article_title = self._normalize_text(article.get('title', ''))
-        article_desc = self._normalize_text(article.get('description', ''))
-        
-        for seen in seen_titles:
-            seen_title = self._normalize_text(seen['title'])
-            seen_desc = self._normalize_text(seen['description'])
+        The body is scanned with the title and description, so exclude
+        keywords found only in the page text drop an article and priority
+        keywords found there raise its priority. Articles from different
+        sources whose bodies open with the same text, as syndicated wire
+        stories do, are duplicates of the first one kept. Statistics and
+        decisions of the last filter_articles call are updated.
+        """
+        stats = self.last_stats
+        positions = {}
+        if self.record_decisions:
+            positions = {
+                article.digest: position
+                for position, (article, decision, _) in enumerate(self.last_decisions)
+                if decision == 'accepted'
+            }
             
-            # Check title similarity
-            title_similarity = self._calculate_similarity(article_title, seen_title)
-            if title_similarity > self.similarity_threshold:
-                return True
+        def decide(article: Article, decision: str, reason: str):
+            if article.digest in positions:
+                self.last_decisions[positions[article.digest]] = (article, decision, reason)
                 
-            # Check if titles contain same key information
-            if self._contains_same_key_info(article_title, seen_title):
-                return True
+        refined = []
+        openings: Dict[str, Article] = {}
+        for article in articles:
+            if not article.body:
+                refined.append(article)
+                continue
                 
-            # Check description similarity if both are substantial
-            if len(article_desc) > 50 and len(seen_desc) > 50:
-                desc_similarity = self._calculate_similarity(article_desc[:200], seen_desc[:200])
-                if desc_similarity > 0.8:  # Higher threshold for descriptions
-                    return True
-                    
-        return False
-        
-    def _normalize_text(self, text: str) -> str:
-        """Normalize text for comparison"""
-        if not text:
-            return ''
-            
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove source prefixes like "Bloomberg: " or "WSJ - "
-        text = re.sub(r'^[^:]+:\s*', '', text)
-        text = re.sub(r'^[^-]+-\s*', '', text)
-        
-        # Remove common news phrases
-        remove_phrases = [
-            'breaking:', 'exclusive:', 'update:', 'alert:', 'just in:',
-            'sources say', 'report says', 'according to'
-        ]
-        for phrase in remove_phrases:
-            text = text.replace(phrase, '')
-            
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        
-        return text.strip()
-        
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Calculate similarity between two texts"""
-        if not text1 or not text2:
-            return 0.0
-        return SequenceMatcher(None, text1, text2).ratio()
-        
-    def _contains_same_key_info(self, title1: str, title2: str) -> bool:
-        """Check if titles contain the same key information (companies, numbers, etc.)"""
-        # Extract key entities (companies, large numbers, percentages)
-        pattern = r'\b(?:[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*|(?:\d+\.?\d*)[%$]?(?:\s*(?:billion|million|trillion|bn|mn))?)\b'
-        
-        entities1 = set(re.findall(pattern, title1))
-        entities2 = set(re.findall(pattern, title2))
-        
-        # Remove common words that might be falsely detected as entities
-        common_words = {'The', 'This', 'That', 'These', 'Those', 'After', 'Before', 'During'}
-        entities1 = entities1 - common_words
-        entities2 = entities2 - common_words
-        
-        # If both titles have substantial entities and share most of them, they're likely duplicates
-        if len(entities1) >= 2 and len(entities2) >= 2:
-            intersection = entities1 & entities2
-            if len(intersection) >= min(len(entities1), len(entities2)) * 0.6:
-                return True
+            opening = normalize_text(article.body)[:BODY_OPENING_CHARS]
+            if len(opening) < BODY_OPENING_CHARS:
+                opening = None
+            kept = openings.get(opening)
+            if kept is not None and kept.source != article.source:
+                stats.duplicates_by_similarity += 1
+                self.last_similar.setdefault(kept.digest, []).append(article)
+                decide(article, 'similar', kept.id)
+                continue
+                
+            text = article.title + ' ' + article.description + ' ' + article.body
+            hits = self.keyword_index.hits(text)
+            if self._contains_excluded_keywords(article, hits):
+                stats.excluded_by_keywords += 1
+                decide(article, 'excluded', ', '.join(self._matched_keywords(article, (None, 'exclude'), text)))
+                continue
+                
+            # Priority keywords found only in the body add to the priority
+            if self.priority_keywords:
+                previous = self._keyword_hits.get(article.digest)
+                article.priority += 10 * (hits[(None, 'priority')] - (previous[(None, 'priority')] if previous else 0))
                 
-        return False
+            self._keyword_hits[article.digest] = hits
+            if opening is not None:
+                openings.setdefault(opening, article)
+            refined.append(article)
+            
+        stats.final_count = len(refined)
+        return refined
         
-    def _contains_excluded_keywords(self, article: Dict[str, Any]) -> bool:
-        """Check if article contains excluded keywords"""
-        exclude_keywords = self.filters.get('exclude_keywords', [])
-        if not exclude_keywords:
+    def route(self, articles: List[Article]) -> Dict[str, List[Article]]:
+        """Articles matching each subscription, preserving order"""
+        routed = {name: [] for name in self.subscriptions}
+        if not routed:
+            return routed
+            
+        for article in articles:
+            hits = self._keyword_hits.get(article.digest)
+            if hits is None:
+                hits = self._scan_keywords(article)
+            for name, subscription in self.subscriptions.items():
+                if self._matches_subscription(name, subscription, article, hits):
+                    routed[name].append(article)
+                    
+        return routed
+        
+    def _matches_subscription(self, name: str, subscription: Dict[str, Any], article: Article, hits: Counter) -> bool:
+        """Check an article against one subscription's sources and keyword rules"""
+        sources = subscription.get('sources')
+        if sources and article.source not in sources:
+            return False
+            
+        if hits[(name, 'exclude')]:
             return False
             
-        text = (article.get('title', '') + ' ' + article.get('description', '')).lower()
+        # Without required keywords a subscription takes everything from its sources
+        if subscription.get('required_keywords') and not hits[(name, 'required')]:
+            return False
+            
+        return True
         
-        for keyword in exclude_keywords:
-            if keyword.lower() in text:
-                return True
-                
-        return False
+    def _scan_keywords(self, article: Article) -> Counter:
+        """Keyword hits per (subscription, rule) tag for an article"""
+        return self.keyword_index.hits(article.title + ' ' + article.description)
         
-    def _contains_required_keywords(self, article: Dict[str, Any]) -> bool:
+    def _matched_keywords(self, article: Article, tag: Tuple[Optional[str], str], text: Optional[str] = None) -> List[str]:
+        """Keywords under a tag that occur in an article, or in text, for decision reasons"""
+        found = self.keyword_index.scan(text or article.title + ' ' + article.description)
+        index = self.keyword_index
+        return sorted(index.keywords[keyword_id] for keyword_id in found if tag in index.postings[keyword_id])
+        
+    def _is_duplicate(self, article: Article) -> bool:
+        """Check if article has been processed recently"""
+        if not article.digest:
+            return False
+            
+        return self.storage.is_processed(article.id)
+        
+    def _contains_excluded_keywords(self, article: Article, hits: Optional[Counter] = None) -> bool:
+        """Check if article contains excluded keywords"""
+        if not self.exclude_keywords:
+            return False
+            
+        if hits is None:
+            hits = self._scan_keywords(article)
+        return hits[(None, 'exclude')] > 0
+        
+    def _contains_required_keywords(self, article: Article, hits: Optional[Counter] = None) -> bool:
         """Check if article contains at least one required keyword"""
-        required_keywords = self.filters.get('required_keywords', [])
-        if not required_keywords:
+        if not self.required_keywords:
             return True  # If no required keywords configured, accept all
             
-        text = (article.get('title', '') + ' ' + article.get('description', '')).lower()
+        if hits is None:
+            hits = self._scan_keywords(article)
+        return hits[(None, 'required')] > 0
         
-        # Check if at least one required keyword is present
-        for keyword in required_keywords:
-            if keyword.lower() in text:
-                return True
-                
-        return False
-        
-    def _is_recent(self, article: Dict[str, Any]) -> bool:
+    def _is_recent(self, article: Article) -> bool:
         """Check if article is recent enough"""
         duplicate_threshold = self.filters.get('duplicate_threshold_hours', 24)
         
-        try:
-            # Parse article timestamp
-            timestamp_str = article.get('timestamp')
-            if not timestamp_str:
-                return True  # Assume recent if no timestamp
-                
-            article_time = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            # Make cutoff_time timezone-aware
-            cutoff_time = datetime.utcnow().replace(tzinfo=None)
+        if not article.published_ts:
+            return True  # Assume recent if no timestamp
             
-            # Convert both to naive for comparison if needed
-            if article_time.tzinfo:
-                article_time = article_time.replace(tzinfo=None)
-                
-            return article_time > cutoff_time - timedelta(hours=duplicate_threshold)
-            
-        except Exception as e:
-            logger.error(f"Error parsing timestamp: {e}")
-            return True  # Assume recent on error
+        if self.now:
+            now_ts = self.now.replace(tzinfo=timezone.utc).timestamp()
+        else:
+            now_ts = time.time()
             
-    def _apply_priority_keywords(self, article: Dict[str, Any]):
+        return article.published_ts > now_ts - duplicate_threshold * 3600
+        
+    def _apply_priority_keywords(self, article: Article, hits: Optional[Counter] = None):
         """Apply priority based on keywords"""
-        priority_keywords = self.filters.get('priority_keywords', [])
-        if not priority_keywords:
+        if not self.priority_keywords:
             return
             
-        text = (article.get('title', '') + ' ' + article.get('description', '')).lower()
-        
-        priority = 0
-        for keyword in priority_keywords:
-            if keyword.lower() in text:
-                priority += 10
-                
-        article['priority'] = article.get('priority', 0) + priority 
\ No newline at end of file
+        if hits is None:
+            hits = self._scan_keywords(article)
+            
+        # Each distinct priority keyword found adds 10
+        article.priority += 10 * hits[(None, 'priority')] 
\ No newline at end of file
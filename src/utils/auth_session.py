@@ -0,0 +1,211 @@
+"""
+Authenticated scraper sessions with an encrypted cookie jar kept between runs
+"""
+
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'login_url': '',              # Form login endpoint; authentication is off without it
+    'username_field': 'email',
+    'password_field': 'password',
+    'extra_fields': {},           # Other fields posted with the login form
+    'success_cookie': '',         # Cookie the site sets on a successful login, if any
+    'session_hours': 24,          # Lifetime of a login whose cookies carry no expiry
+}
+
+# Key derivation work for the cookie jar key; runs once per source and process
+KDF_ITERATIONS = 100000
+
+
+class AuthSession:
+    """Log a scraper's session in, and keep the login cookies between runs
+    
+    Credentials come from an environment variable as "user:password".
+    The cookies of a login are written to cookie_dir encrypted with a key
+    derived from the credentials, so the jar is useless without them and a
+    password change simply forces a new login. The next run loads the jar
+    into its session and fetches straight away; it logs in again only once
+    the login has expired or a feed answers 401 or 403. Concurrent feeds
+    hitting a 401 share one re-login.
+    
+    Encryption needs the cryptography package. Without it the login still
+    happens, but the jar is not written.
+    """
+    
+    def __init__(self, source: str, credentials: str, path: Optional[str] = None,
+                 settings: Optional[Dict[str, Any]] = None):
+        """Initialize for one source; credentials are "user:password" """
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.source = source
+        self.path = path
+        self.login_url = settings['login_url']
+        self.username_field = settings['username_field']
+        self.password_field = settings['password_field']
+        self.extra_fields = settings['extra_fields'] or {}
+        self.success_cookie = settings['success_cookie']
+        self.session_hours = settings['session_hours']
+        self.username, _, self.password = credentials.partition(':')
+        self._credentials = credentials
+        
+        # Expiry of the current login, and a counter telling re-logins apart
+        self.expires = 0.0
+        self.generation = 0
+        self.logins = 0
+        self._lock = asyncio.Lock()
+        self._fernet = None
+        
+    @classmethod
+    def from_config(cls, source: str, config: Optional[Dict[str, Any]], cookie_dir: Optional[str]) -> Optional['AuthSession']:
+        """AuthSession for a source's auth section, or None when it has no credentials or login URL"""
+        if not config:
+            return None
+        env_var = config.get('credentials_env') or f"{source.upper()}_CREDENTIALS"
+        credentials = os.getenv(env_var)
+        if not credentials:
+            return None
+        if not config.get('login_url'):
+            logger.warning(f"{env_var} is set but sources.{source}.auth.login_url is not; fetching {source} anonymously")
+            return None
+            
+        path = os.path.join(cookie_dir, f"{source}.jar") if cookie_dir else None
+        settings = {key: value for key, value in config.items() if key in DEFAULT_SETTINGS}
+        return cls(source, credentials, path, settings)
+        
+    async def open(self, session):
+        """Load the saved login into session, or log in if there is none still valid"""
+        if self._load(session):
+            logger.info(f"Reusing {self.source} login from the cookie jar")
+            return
+        await self.refresh(session, self.generation)
+        
+    async def refresh(self, session, generation: int) -> bool:
+        """Log in again unless another request already did since generation; returns success"""
+        async with self._lock:
+            if self.generation != generation:
+                return self.expires > time.time()
+            return await self._login(session)
+            
+    def save(self, session):
+        """Write the session's cookies to the encrypted jar; failures are logged"""
+        if not self.path or not self.expires:
+            return
+        fernet = self._cipher()
+        if fernet is None:
+            return
+            
+        cookies = [
+            {'domain': morsel['domain'], 'cookie': morsel.OutputString()}
+            for morsel in session.cookie_jar
+        ]
+        data = fernet.encrypt(json.dumps({'expires': self.expires, 'cookies': cookies}).encode('utf-8'))
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            # The jar is encrypted, but there is no reason to let other users read it either
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to write cookie jar {self.path}: {e}")
+            
+    async def _login(self, session) -> bool:
+        """Post the login form; the session's cookie jar keeps the login cookies"""
+        data = dict(self.extra_fields)
+        data[self.username_field] = self.username
+        data[self.password_field] = self.password
+        
+        started = time.time()
+        try:
+            async with session.post(self.login_url, data=data) as response:
+                status = response.status
+                await response.read()
+        except Exception as e:
+            logger.error(f"{self.source} login failed: {e}")
+            return False
+            
+        cookies = {morsel.key: morsel for morsel in session.cookie_jar}
+        if status >= 400 or (self.success_cookie and self.success_cookie not in cookies):
+            logger.error(f"{self.source} login rejected (HTTP {status})")
+            self.expires = 0.0
+            return False
+            
+        self.logins += 1
+        self.generation += 1
+        self.expires = started + self.session_hours * 3600
+        if self.success_cookie:
+            expires = _cookie_expiry(cookies[self.success_cookie], started)
+            if expires:
+                self.expires = expires
+        logger.info(f"Logged in to {self.source}")
+        return True
+        
+    def _load(self, session) -> bool:
+        """Put unexpired saved cookies into session; returns whether there were any"""
+        if not self.path:
+            return False
+        fernet = self._cipher()
+        if fernet is None:
+            return False
+            
+        from cryptography.fernet import InvalidToken
+        from yarl import URL
+        
+        try:
+            with open(self.path, 'rb') as f:
+                state = json.loads(fernet.decrypt(f.read()))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, InvalidToken):
+            # Written with other credentials, or damaged
+            logger.info(f"Ignoring unusable cookie jar {self.path}")
+            return False
+            
+        if state['expires'] <= time.time():
+            return False
+        for cookie in state['cookies']:
+            session.cookie_jar.update_cookies(SimpleCookie(cookie['cookie']), URL(f"https://{cookie['domain']}/"))
+        self.expires = state['expires']
+        return True
+        
+    def _cipher(self):
+        """Fernet keyed by the credentials, or None without the cryptography package"""
+        if self._fernet is None:
+            try:
+                from cryptography.fernet import Fernet
+            except ImportError:
+                logger.warning("Install cryptography to keep logins between runs")
+                self.path = None
+                return None
+            key = hashlib.pbkdf2_hmac(
+                'sha256', self._credentials.encode('utf-8'), f"cookie-jar:{self.source}".encode('utf-8'), KDF_ITERATIONS
+            )
+            self._fernet = Fernet(base64.urlsafe_b64encode(key))
+        return self._fernet
+
+
+def _cookie_expiry(morsel, now: float) -> Optional[float]:
+    """Expiry of a cookie in epoch seconds, from Max-Age or Expires"""
+    if morsel['max-age']:
+        try:
+            return now + int(morsel['max-age'])
+        except ValueError:
+            pass
+    if morsel['expires']:
+        from email.utils import parsedate_to_datetime
+        
+        try:
+            return parsedate_to_datetime(morsel['expires']).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return None
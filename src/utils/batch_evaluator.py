@@ -0,0 +1,322 @@
+"""
+Vectorized evaluation of many filter configurations over one article corpus
+"""
+
+import math
+import time
+import logging
+import itertools
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from .article import Article
+from .article_features import SubsequenceBound, char_codes, char_counts, ratio_bounds
+from .duplicate_stats import DuplicateStats
+from .keyword_index import KeywordIndex
+
+logger = logging.getLogger(__name__)
+
+# Counters reported per configuration, as in DuplicateStats
+COUNTERS = (
+    'total_articles', 'duplicates_by_id', 'duplicates_by_similarity', 'excluded_by_keywords',
+    'excluded_by_requirements', 'excluded_by_age', 'final_count'
+)
+
+
+class BatchEvaluator:
+    """What-if evaluation of ArticleFilter settings without re-running the pipeline
+    
+    The corpus is sorted once the way ArticleFilter sorts it and loaded into
+    columnar arrays. Everything that does not depend on the settings is
+    precomputed: repeated IDs, the history check, a keyword hit column per
+    keyword, and sparse similarity edges between each article and every
+    earlier article find_similar would compare it with, holding the key
+    information flag, the title ratio and the description match.
+    
+    Comparing every pair is quadratic, so ratios are only computed for pairs
+    sharing at least min_shared_shingles of the shingles (adjacent word
+    pairs) of the longer title, or of the longer description. This is a
+    heuristic: reworded copies keep most of their word pairs, but a short
+    title with every other word changed can pass a ratio threshold without
+    sharing one and is missed. Pairs sharing entities are always found.
+    
+    A configuration then reduces to boolean masks over the arrays plus one
+    pass over the edges whose similarity passes its threshold, and produces
+    the same counters as DuplicateStats for one filter_articles call.
+    Title ratios below min_similarity are not kept, so thresholds must be at
+    least that.
+    """
+    
+    def __init__(self, articles: List[Article], storage=None, now: Optional[float] = None,
+                 min_similarity: float = 0.5, description_threshold: float = 0.8, min_shared_shingles: float = 0.2):
+        """Load the corpus and precompute settings-independent features"""
+        started = time.perf_counter()
+        self.now = now if now is not None else time.time()
+        self.min_similarity = min_similarity
+        self.min_shared_shingles = min_shared_shingles
+        
+        # Same order as ArticleFilter, which decides which copy of a story survives
+        self.articles = sorted(articles, key=lambda x: (x.priority, x.published_ts), reverse=True)
+        count = len(self.articles)
+        
+        seen = set()
+        repeated = np.zeros(count, dtype=bool)
+        for position, article in enumerate(self.articles):
+            repeated[position] = article.digest in seen
+            seen.add(article.digest)
+            
+        processed = np.zeros(count, dtype=bool)
+        if storage is not None:
+            for position, article in enumerate(self.articles):
+                processed[position] = bool(article.digest) and storage.is_processed(article.id)
+                
+        self.frame = pd.DataFrame({
+            'id': [article.id for article in self.articles],
+            'source': pd.Categorical([article.source for article in self.articles]),
+            'title': [article.title for article in self.articles],
+            'published_ts': np.array([article.published_ts or 0.0 for article in self.articles], dtype=np.float64),
+            'priority': np.array([article.priority for article in self.articles], dtype=np.int64),
+            'repeated': repeated,
+            'processed': processed
+        })
+        self._texts = [article.title + ' ' + article.description for article in self.articles]
+        self._keyword_hits: Dict[str, np.ndarray] = {}
+        
+        self._build_edges(description_threshold)
+        logger.info(
+            f"Batch evaluator loaded {count} articles with {len(self.edge_source)} "
+            f"similarity edges in {time.perf_counter() - started:.1f}s"
+        )
+        
+    def _build_edges(self, description_threshold: float):
+        """Similarity edges from earlier to later articles, sorted by the later one
+        
+        Articles sharing an entity are candidates for the key information
+        check, as in SimilarityIndex. For the ratios, earlier articles sharing
+        one of the rarest shingles of the title or description are candidates;
+        enough shingles are posted that two texts sharing min_shared_shingles
+        of them always share one. Their character-count and common
+        subsequence bounds must then exceed min_similarity or the description
+        threshold.
+        """
+        features = [article.features for article in self.articles]
+        repeated = self.frame['repeated'].to_numpy()
+        
+        vocabulary: Dict[str, int] = {}
+        
+        def ids(tokens) -> np.ndarray:
+            return np.array(sorted(vocabulary.setdefault(token, len(vocabulary)) for token in tokens), dtype=np.int64)
+            
+        entity_ids = [ids(feature.entities) for feature in features]
+        entity_counts = np.array([len(row) for row in entity_ids], dtype=np.int64)
+        titles = [feature.title for feature in features]
+        # Short descriptions are never compared, so they are profiled as empty
+        descriptions = [feature.description if feature.description_length > 50 else '' for feature in features]
+        title_counts, title_codes = char_counts(titles), char_codes(titles)
+        title_lengths = np.array([len(text) for text in titles], dtype=np.int64)
+        description_counts, description_codes = char_counts(descriptions), char_codes(descriptions)
+        description_lengths = np.array([len(text) for text in descriptions], dtype=np.int64)
+        title_shingles, description_shingles = self._rarest_shingles(titles), self._rarest_shingles(descriptions)
+        
+        entity_postings: Dict[int, List[int]] = defaultdict(list)
+        title_postings: Dict[int, List[int]] = defaultdict(list)
+        description_postings: Dict[int, List[int]] = defaultdict(list)
+        sources, targets, key_info, title_ratio, description_similar = [], [], [], [], []
+        
+        for position, feature in enumerate(features):
+            if not repeated[position]:
+                pairs: Dict[int, list] = {}
+                
+                # Key information: at least 60% of the smaller entity set is shared
+                entities = entity_ids[position]
+                if len(entities) >= 2:
+                    earlier, shared = np.unique(_gather(entity_postings, entities), return_counts=True)
+                    if earlier.size:
+                        smaller = np.minimum(entity_counts[earlier], len(entities))
+                        matches = earlier[(entity_counts[earlier] >= 2) & (shared >= smaller * 0.6)]
+                        for match in matches.tolist():
+                            pairs.setdefault(match, [False, 0.0, False])[0] = True
+                            
+                if feature.title:
+                    earlier = np.unique(_gather(title_postings, title_shingles[position]))
+                    bounds = ratio_bounds(title_counts[earlier], title_lengths[earlier],
+                                          title_counts[position], title_lengths[position])
+                    matches = SubsequenceBound(feature.title).passing(
+                        earlier[bounds > self.min_similarity], titles, title_codes, title_lengths, self.min_similarity
+                    )
+                    for match in matches:
+                        # Edges with the key information flag pass every threshold, so their ratios stay 0
+                        if match in pairs:
+                            continue
+                        matcher = features[match].title_matcher()
+                        matcher.set_seq1(feature.title)
+                        if matcher.real_quick_ratio() > self.min_similarity and matcher.quick_ratio() > self.min_similarity:
+                            ratio = matcher.ratio()
+                            if ratio > self.min_similarity:
+                                pairs.setdefault(match, [False, 0.0, False])[1] = ratio
+                                
+                if descriptions[position]:
+                    earlier = np.unique(_gather(description_postings, description_shingles[position]))
+                    bounds = ratio_bounds(description_counts[earlier], description_lengths[earlier],
+                                          description_counts[position], description_lengths[position])
+                    matches = SubsequenceBound(feature.description).passing(
+                        earlier[bounds > description_threshold], descriptions, description_codes,
+                        description_lengths, description_threshold
+                    )
+                    for match in matches:
+                        if match in pairs and pairs[match][0]:
+                            continue
+                        matcher = features[match].description_matcher()
+                        matcher.set_seq1(feature.description)
+                        if matcher.real_quick_ratio() > description_threshold and \
+                                matcher.quick_ratio() > description_threshold and matcher.ratio() > description_threshold:
+                            pairs.setdefault(match, [False, 0.0, False])[2] = True
+                        
+                for match in sorted(pairs):
+                    sources.append(match)
+                    targets.append(position)
+                    key_info.append(pairs[match][0])
+                    title_ratio.append(pairs[match][1])
+                    description_similar.append(pairs[match][2])
+                    
+            # Every article is indexed, since any of them may be accepted under some settings
+            for postings, tokens in ((entity_postings, entity_ids), (title_postings, title_shingles),
+                                     (description_postings, description_shingles)):
+                for token in tokens[position].tolist():
+                    postings[token].append(position)
+                    
+        self.edge_source = np.array(sources, dtype=np.int64)
+        self.edge_target = np.array(targets, dtype=np.int64)
+        self.edge_key_info = np.array(key_info, dtype=bool)
+        self.edge_title_ratio = np.array(title_ratio, dtype=np.float64)
+        self.edge_description_similar = np.array(description_similar, dtype=bool)
+        
+    def _rarest_shingles(self, texts: List[str]) -> List[np.ndarray]:
+        """Corpus frequency ranks of the rarest shingles of each text
+        
+        Each text keeps all but ceil(min_shared_shingles * shingles) - 1 of
+        its shingles, so two texts sharing that fraction of them have a kept
+        shingle in common, and the postings of common ones are never scanned.
+        """
+        shingles = [_shingles(text) for text in texts]
+        frequency = Counter(itertools.chain.from_iterable(shingles))
+        rank = {shingle: position for position, shingle in enumerate(sorted(frequency, key=lambda key: (frequency[key], key)))}
+        
+        rows = []
+        for row in shingles:
+            ranks = sorted(rank[shingle] for shingle in row)
+            kept = len(ranks) - math.ceil(self.min_shared_shingles * len(ranks)) + 1
+            rows.append(np.array(ranks[:kept], dtype=np.int64))
+        return rows
+        
+    def keyword_hits(self, keywords: Iterable[str]) -> np.ndarray:
+        """Boolean matrix of articles by keywords, scanning the corpus once for new keywords"""
+        keywords = [keyword.lower() for keyword in keywords]
+        missing = [keyword for keyword in dict.fromkeys(keywords) if keyword not in self._keyword_hits]
+        
+        if missing:
+            index = KeywordIndex()
+            for keyword in missing:
+                index.add(keyword, keyword)
+            columns = {keyword: np.zeros(len(self.articles), dtype=bool) for keyword in missing}
+            for position, text in enumerate(self._texts):
+                for keyword in index.hits(text):
+                    columns[keyword][position] = True
+            self._keyword_hits.update(columns)
+            
+        if not keywords:
+            return np.zeros((len(self.articles), 0), dtype=bool)
+        return np.column_stack([self._keyword_hits[keyword] for keyword in keywords])
+        
+    def evaluate(self, filters: Dict[str, Any]) -> DuplicateStats:
+        """Counters filter_articles would report with these filter settings"""
+        threshold = filters.get('similarity_threshold', 0.75)
+        if threshold < self.min_similarity:
+            raise ValueError(f"similarity_threshold {threshold} is below min_similarity {self.min_similarity}")
+            
+        repeated = self.frame['repeated'].to_numpy()
+        processed = self.frame['processed'].to_numpy()
+        published = self.frame['published_ts'].to_numpy()
+        count = len(self.articles)
+        
+        exclude_keywords = filters.get('exclude_keywords', [])
+        required_keywords = filters.get('required_keywords', [])
+        excluded = self.keyword_hits(exclude_keywords).any(axis=1) if exclude_keywords else np.zeros(count, dtype=bool)
+        missing_required = ~self.keyword_hits(required_keywords).any(axis=1) if required_keywords \
+            else np.zeros(count, dtype=bool)
+            
+        # Articles without a timestamp count as recent
+        max_age = filters.get('duplicate_threshold_hours', 24) * 3600
+        too_old = (published > 0) & (published <= self.now - max_age)
+        
+        candidate = ~repeated & ~processed
+        eligible = ~excluded & ~missing_required & ~too_old
+        
+        # Only edges between two candidates whose earlier end could be accepted matter
+        passing = self.edge_key_info | (self.edge_title_ratio > threshold) | self.edge_description_similar
+        live = passing & candidate[self.edge_source] & eligible[self.edge_source] & candidate[self.edge_target]
+        
+        accepted = candidate & eligible
+        similar = np.zeros(count, dtype=bool)
+        # Edges are sorted by target and point forwards, so each source is final when reached
+        for source, target in zip(self.edge_source[live].tolist(), self.edge_target[live].tolist()):
+            if accepted[source] and not similar[target]:
+                similar[target] = True
+                accepted[target] = False
+                
+        remaining = candidate & ~similar
+        stats = DuplicateStats()
+        stats.total_articles = count
+        stats.duplicates_by_id = int((~candidate).sum())
+        stats.duplicates_by_similarity = int(similar.sum())
+        stats.excluded_by_keywords = int((remaining & excluded).sum())
+        stats.excluded_by_requirements = int((remaining & ~excluded & missing_required).sum())
+        stats.excluded_by_age = int((remaining & ~excluded & ~missing_required & too_old).sum())
+        stats.final_count = int(accepted.sum())
+        return stats
+        
+    def sweep(self, configurations: Iterable[Dict[str, Any]]) -> pd.DataFrame:
+        """Evaluate many filter settings; one row of settings and counters per configuration"""
+        configurations = list(configurations)
+        
+        # One corpus scan covers the keywords of every configuration
+        self.keyword_hits(itertools.chain.from_iterable(
+            filters.get('exclude_keywords', []) + filters.get('required_keywords', []) for filters in configurations
+        ))
+        
+        rows = []
+        for filters in configurations:
+            stats = self.evaluate(filters)
+            row = {
+                'similarity_threshold': filters.get('similarity_threshold', 0.75),
+                'duplicate_threshold_hours': filters.get('duplicate_threshold_hours', 24),
+                'exclude_keywords': len(filters.get('exclude_keywords', [])),
+                'required_keywords': len(filters.get('required_keywords', []))
+            }
+            row.update({counter: getattr(stats, counter) for counter in COUNTERS})
+            rows.append(row)
+        return pd.DataFrame(rows)
+        
+    @staticmethod
+    def grid(base: Dict[str, Any], **axes: List[Any]) -> List[Dict[str, Any]]:
+        """Filter settings for every combination of the given values over a base filters section"""
+        names = list(axes)
+        return [dict(base, **dict(zip(names, values))) for values in itertools.product(*axes.values())]
+
+
+def _shingles(text: str) -> Set[str]:
+    """Adjacent word pairs of a text, or its only word"""
+    words = text.split()
+    if len(words) == 1:
+        return set(words)
+    return {first + ' ' + second for first, second in zip(words, words[1:])}
+
+
+def _gather(postings: Dict[int, List[int]], tokens: np.ndarray) -> np.ndarray:
+    """Concatenated postings of tokens"""
+    return np.fromiter(
+        itertools.chain.from_iterable(postings.get(token, ()) for token in tokens.tolist()), dtype=np.int64
+    )
@@ -0,0 +1,77 @@
+"""
+Config file watching and section-level diffs for reloads in long-running mode
+"""
+
+import os
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sections diffed per entry, so one changed source or channel rebuilds only its own part
+PER_ENTRY_SECTIONS = ('sources', 'notifications', 'subscriptions')
+
+# Sections whose changes need a restart: they set up files, sockets and logging at startup
+RESTART_SECTIONS = ('storage', 'server', 'websub', 'logging')
+
+
+def diff_config(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Changed parts of a config: section names, or "section.entry" for per-entry sections"""
+    changed = []
+    for section in sorted(set(old) | set(new)):
+        before, after = old.get(section), new.get(section)
+        if before == after:
+            continue
+        if section in PER_ENTRY_SECTIONS and isinstance(before, dict) and isinstance(after, dict):
+            changed.extend(
+                f"{section}.{name}" for name in sorted(set(before) | set(after))
+                if before.get(name) != after.get(name)
+            )
+        else:
+            changed.append(section)
+    return changed
+
+
+class ConfigWatcher:
+    """Detect edits of the config file by polling its metadata
+    
+    A stat per poll is all an unchanged file costs; the content is read
+    only when the modification time or size moves, and an edit counts
+    only if the bytes differ, so touching the file or saving it unchanged
+    triggers nothing.
+    """
+    
+    def __init__(self, path: str):
+        """Remember the current state of the file"""
+        self.path = path
+        self._stat = self._signature()
+        self._digest = self._content_digest()
+        
+    def changed(self) -> bool:
+        """Check whether the file's content changed since the last call"""
+        signature = self._signature()
+        if signature == self._stat:
+            return False
+        self._stat = signature
+        digest = self._content_digest()
+        if digest == self._digest:
+            return False
+        self._digest = digest
+        return True
+        
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        """Modification time and size, or None while the file is missing"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+        
+    def _content_digest(self) -> Optional[bytes]:
+        """Hash of the file's bytes"""
+        try:
+            with open(self.path, 'rb') as f:
+                return hashlib.sha256(f.read()).digest()
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,113 @@
+"""
+Size-bounded on-disk LRU cache of text values
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+from typing import Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Eviction trims the cache to this fraction of its budget, so it does not run on every put
+LOW_WATERMARK = 0.9
+
+
+class DiskLRU:
+    """Text values on disk under string keys, evicting the least recently used
+    
+    Each value is a gzip file named by the SHA-256 of its key, under a
+    subdirectory of the first two hex digits. A file's modification time is
+    its last use: get() touches it, and eviction removes the oldest files
+    until the cache is back under its budget. Writes are atomic renames, so
+    concurrent runs can share a cache; a value evicted by another process
+    is simply a miss.
+    """
+    
+    def __init__(self, root: str, max_bytes: int):
+        """Initialize cache under root"""
+        self.root = root
+        self.max_bytes = max_bytes
+        # Bytes on disk, counted on the first put
+        self._size: Optional[int] = None
+        os.makedirs(root, exist_ok=True)
+        
+    def get(self, key: str) -> Optional[str]:
+        """Cached value of key, or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = gzip.decompress(f.read()).decode('utf-8')
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+            return None
+        return value
+        
+    def put(self, key: str, value: str):
+        """Store value under key, evicting old entries if over budget"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = gzip.compress(value.encode('utf-8'), mtime=0)
+        
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+            
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+        
+    def evict(self) -> int:
+        """Remove least recently used entries down to the low watermark; returns entries removed"""
+        entries = sorted(self._entries())
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * LOW_WATERMARK
+        removed = 0
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed += 1
+            
+        self._size = size
+        if removed:
+            logger.info(f"Evicted {removed} entries from {self.root}")
+        return removed
+        
+    def _scan_size(self) -> int:
+        """Bytes of all entries on disk"""
+        return sum(size for _, size, _ in self._entries())
+        
+    def _entries(self) -> Iterator[Tuple[float, int, str]]:
+        """(last use, bytes, path) of every entry"""
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+                
+    def _path(self, key: str) -> str:
+        """File holding the value of key"""
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
@@ -20,6 +20,16 @@ class DuplicateStats:
         self.excluded_by_age = 0
         self.final_count = 0
         
+    def merge(self, other: 'DuplicateStats'):
+        """Add the counts of another batch, e.g. one chunk of a backfill"""
+        self.total_articles += other.total_articles
+        self.duplicates_by_id += other.duplicates_by_id
+        self.duplicates_by_similarity += other.duplicates_by_similarity
+        self.excluded_by_keywords += other.excluded_by_keywords
+        self.excluded_by_requirements += other.excluded_by_requirements
+        self.excluded_by_age += other.excluded_by_age
+        self.final_count += other.final_count
+        
     def log_stats(self):
         """Log the duplicate detection statistics"""
         logger.info("=" * 50)
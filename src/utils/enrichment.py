@@ -0,0 +1,167 @@
+"""
+Full-text enrichment of top-ranked articles from their pages
+"""
+
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+from .article import Article
+from .disk_lru import DiskLRU
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'max_articles': 25,           # Articles enriched per run, from the top of the ranking
+    'concurrency': 8,             # Page fetches in flight in total
+    'per_host': 2,                # Page fetches in flight per host
+    'timeout_seconds': 10,        # Per-page request timeout
+    'max_page_bytes': 2097152,    # Larger pages are truncated before extraction
+    'workers': 2,                 # Extraction processes
+    'cache_dir': 'data/cache/pages',
+    'cache_max_mb': 200,
+}
+
+
+def extract_text(url: str, html: bytes) -> str:
+    """Main text of an article page; runs in a worker process
+    
+    Uses newspaper3k, falling back to the page's paragraphs when it is not
+    installed.
+    """
+    try:
+        from newspaper import Article as Page
+    except ImportError:
+        return _paragraph_text(html)
+        
+    page = Page(url, fetch_images=False)
+    page.download(input_html=html)
+    page.parse()
+    return page.text
+
+
+def _paragraph_text(html: bytes) -> str:
+    """Text of the paragraphs of a page"""
+    from bs4 import BeautifulSoup
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    paragraphs = (paragraph.get_text(' ', strip=True) for paragraph in soup.find_all('p'))
+    return '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+
+
+class Enricher:
+    """Fetch the pages of the top-ranked articles and set their body to the extracted text
+    
+    Pages are fetched with a cap on requests in flight, in total and per
+    host, and extracted in a process pool as they arrive. Extracted bodies
+    are cached on disk by canonical URL, so re-runs never refetch a page,
+    and articles sharing a URL share one fetch. Pages that are not HTML or
+    yield no text are cached as empty; failed fetches and extractions are
+    retried next run. Fetches still running at the deadline are cancelled
+    and their articles keep their feed summary.
+    """
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """Initialize enricher and open its cache"""
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.max_articles = settings['max_articles']
+        self.concurrency = settings['concurrency']
+        self.per_host = settings['per_host']
+        self.timeout_seconds = settings['timeout_seconds']
+        self.max_page_bytes = settings['max_page_bytes']
+        self.workers = settings['workers']
+        cache_dir = settings['cache_dir']
+        self.cache = DiskLRU(cache_dir, settings['cache_max_mb'] * 1024 * 1024) if cache_dir else None
+        
+    async def enrich(self, articles: List[Article], deadline: Optional[float] = None) -> int:
+        """Set the body of the first max_articles articles; returns the number given one"""
+        by_url: Dict[str, List[Article]] = {}
+        for article in articles[:self.max_articles]:
+            if article.url and not article.body:
+                by_url.setdefault(article.url, []).append(article)
+                
+        bodies: Dict[str, str] = {}
+        missing = []
+        for url in by_url:
+            body = self.cache.get(url) if self.cache is not None else None
+            if body is None:
+                missing.append(url)
+            else:
+                bodies[url] = body
+        cached = len(bodies)
+        
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if missing and (remaining is None or remaining > 0):
+            try:
+                await asyncio.wait_for(self._fetch_all(missing, bodies), remaining)
+            except asyncio.TimeoutError:
+                logger.warning(f"Enrichment stopped at the run deadline with {len(missing) + cached - len(bodies)} pages left")
+                
+        enriched = 0
+        for url, body in bodies.items():
+            if not body:
+                continue
+            for article in by_url[url]:
+                article.body = body
+                enriched += 1
+                
+        logger.info(f"Enriched {enriched} articles ({cached} pages cached, {len(bodies) - cached} fetched)")
+        return enriched
+        
+    async def _fetch_all(self, urls: List[str], bodies: Dict[str, str]):
+        """Fetch and extract pages into bodies"""
+        import aiohttp
+        
+        limit = asyncio.Semaphore(self.concurrency)
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)) as session:
+                await asyncio.gather(*(
+                    self._enrich_page(session, url, limit, host_limits, pool, bodies) for url in urls
+                ))
+        finally:
+            # Extractions left at the deadline are abandoned, not awaited
+            pool.shutdown(wait=False, cancel_futures=True)
+            
+    async def _enrich_page(self, session, url: str, limit: asyncio.Semaphore,
+                           host_limits: Dict[str, asyncio.Semaphore], pool: ProcessPoolExecutor,
+                           bodies: Dict[str, str]):
+        """Fetch one page, extract its text and cache it; errors are logged"""
+        host = urlsplit(url).netloc.lower()
+        host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        
+        try:
+            async with limit, host_limit:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.debug(f"Skipping page {url}: HTTP {response.status}")
+                        return
+                    html = bytearray()
+                    if 'html' in response.headers.get('Content-Type', 'text/html'):
+                        async for chunk in response.content.iter_chunked(65536):
+                            html += chunk
+                            if len(html) >= self.max_page_bytes:
+                                break
+        except Exception as e:
+            logger.debug(f"Error fetching page {url}: {e}")
+            return
+            
+        # Extraction runs outside the fetch limits, so it does not hold up other requests
+        body = ''
+        if html:
+            try:
+                body = await asyncio.get_running_loop().run_in_executor(pool, extract_text, url, bytes(html))
+            except Exception as e:
+                logger.debug(f"Error extracting text from {url}: {e}")
+                return
+                
+        body = body.strip()
+        bodies[url] = body
+        if self.cache is not None:
+            self.cache.put(url, body)
@@ -0,0 +1,167 @@
+"""
+Memoized feed entry parsing: finished article records by feed, entry ID and update time
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from .article import Article
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached record layout changes
+FORMAT_VERSION = 1
+
+DEFAULT_SETTINGS = {
+    'max_entries': 20000,         # Least recently used entries are evicted past this
+    'max_age_hours': 72,          # Entries unused for this long are dropped
+}
+
+# digest, source, title, url, description, published_ts, categories, author, priority
+Record = Tuple[bytes, str, str, str, str, float, Tuple[str, ...], str, int]
+
+
+class EntryCache:
+    """Bounded LRU of parsed articles, so unchanged feed entries skip parsing
+    
+    Entries are keyed by feed URL, the entry's guid (or link) and its
+    updated or published string, plus a fingerprint of the scraper config
+    that shaped the record. A changed entry gets a new key and is parsed
+    again; its old record ages out. Hits return a fresh Article, since
+    later stages change priority and body in place.
+    
+    With a path, the cache is a pickle keyed by the source code version.
+    save() merges the entries this process added or used into it under a
+    lock, so sharded workers keep each other's entries.
+    """
+    
+    def __init__(self, path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        """Load cached entries from path, if given"""
+        self.path = path
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.max_entries = settings['max_entries']
+        self.max_age_hours = settings['max_age_hours']
+        
+        # Key -> (last use, record), least recently used first
+        self.entries: 'OrderedDict[str, Tuple[float, Record]]' = OrderedDict()
+        self._touched = set()
+        self._fingerprints: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        # Counters of the run last saved, for run reports
+        self.last_hits = 0
+        self.last_misses = 0
+        self._code_version = None
+        
+        if path:
+            self.entries = self._read()
+            
+    def key(self, scraper, feed_url: str, entry: Dict[str, Any]) -> Optional[str]:
+        """Cache key of a feed entry, or None when it has no guid or link"""
+        entry_id = entry.get('id') or entry.get('link')
+        if not entry_id:
+            return None
+        fingerprint = self._fingerprints.get(id(scraper))
+        if fingerprint is None:
+            config = json.dumps(scraper.config, sort_keys=True, default=str)
+            fingerprint = hashlib.sha1(f"{scraper.source_name}\0{config}".encode('utf-8')).hexdigest()[:16]
+            self._fingerprints[id(scraper)] = fingerprint
+        updated = entry.get('updated') or entry.get('published') or ''
+        return f"{fingerprint}\0{feed_url}\0{entry_id}\0{updated}"
+        
+    def get(self, key: str) -> Optional[Article]:
+        """Fresh article for a cached entry, or None"""
+        cached = self.entries.get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+            
+        self.hits += 1
+        self.entries[key] = (time.time(), cached[1])
+        self.entries.move_to_end(key)
+        self._touched.add(key)
+        digest, source, title, url, description, published_ts, categories, author, priority = cached[1]
+        return Article(
+            digest=digest, source=source, title=title, url=url, description=description,
+            published_ts=published_ts, categories=categories, author=author,
+            scraped_ts=time.time(), priority=priority
+        )
+        
+    def put(self, key: str, article: Article):
+        """Cache the record of a freshly parsed article"""
+        record = (
+            article.digest, article.source, article.title, article.url, article.description,
+            article.published_ts, article.categories, article.author, article.priority
+        )
+        self.entries[key] = (time.time(), record)
+        self.entries.move_to_end(key)
+        self._touched.add(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            
+    def save(self):
+        """Log the hit rate and merge this process's entries into the store"""
+        lookups = self.hits + self.misses
+        if lookups:
+            logger.info(
+                f"Entry cache: {self.hits}/{lookups} entries reused ({self.hits / lookups:.0%}), "
+                f"{len(self.entries)} cached"
+            )
+        self.last_hits, self.last_misses = self.hits, self.misses
+        self.hits = self.misses = 0
+        
+        oldest = time.time() - self.max_age_hours * 3600
+        while self.entries and next(iter(self.entries.values()))[0] < oldest:
+            self.entries.popitem(last=False)
+            
+        if not self.path or not self._touched:
+            return
+            
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with FileLock(f"{self.path}.lock"):
+            entries = self._read()
+            for key in self._touched:
+                if key in self.entries:
+                    entries[key] = self.entries[key]
+            # Merged entries are ordered by last use again before trimming
+            entries = OrderedDict(sorted(entries.items(), key=lambda item: item[1][0]))
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': self._version(), 'entries': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            
+        self.entries = entries
+        self._touched.clear()
+        
+    def _read(self) -> 'OrderedDict[str, Tuple[float, Record]]':
+        """Unexpired entries of the store, if it was written by this code"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            return OrderedDict()
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable entry cache {self.path}: {e}")
+            return OrderedDict()
+            
+        if not isinstance(data, dict) or data.get('version') != self._version():
+            return OrderedDict()
+        oldest = time.time() - self.max_age_hours * 3600
+        return OrderedDict((key, value) for key, value in data['entries'].items() if value[0] >= oldest)
+        
+    def _version(self) -> str:
+        """Format and source code version the store must match"""
+        if self._code_version is None:
+            from .warm_start import code_version
+            
+            self._code_version = f"{FORMAT_VERSION}:{code_version()}"
+        return self._code_version
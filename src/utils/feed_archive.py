@@ -0,0 +1,157 @@
+"""
+Content-addressed archive of raw feed responses for record/replay runs
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class FeedArchive:
+    """Append-only store of raw feed responses
+    
+    Layout under the archive root:
+        objects/<ab>/<sha256>.gz    gzip-compressed response bodies, one per distinct body
+        index/<YYYY-MM-DD>.jsonl    one line per recorded response (url, status, headers, digest)
+    """
+    
+    def __init__(self, root: str):
+        """Initialize feed archive"""
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_dir = os.path.join(root, 'index')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.run_id = None
+        
+    def start_run(self) -> str:
+        """Start a new recording run and return its ID"""
+        self.run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        return self.run_id
+        
+    def record(self, source: str, url: str, status: int, headers: Dict[str, str], body: bytes) -> str:
+        """Archive a raw response and return the digest of its body"""
+        if self.run_id is None:
+            self.start_run()
+            
+        digest = hashlib.sha256(body).hexdigest()
+        object_path = self._object_path(digest)
+        
+        # Identical bodies are stored once
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            tmp_path = f"{object_path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, object_path)
+            
+        fetched_at = datetime.utcnow()
+        entry = {
+            'run': self.run_id,
+            'source': source,
+            'url': url,
+            'status': status,
+            'headers': headers,
+            'fetched_at': fetched_at.isoformat(),
+            'digest': digest,
+            'size': len(body)
+        }
+        
+        index_path = os.path.join(self.index_dir, f"{fetched_at.strftime('%Y-%m-%d')}.jsonl")
+        with open(index_path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            
+        return digest
+        
+    def read_body(self, digest: str) -> bytes:
+        """Read an archived response body"""
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read()
+            
+    def list_runs(self, days: Optional[List[str]] = None) -> List[Tuple[str, datetime, Dict[str, Dict[str, Any]]]]:
+        """List recorded runs in order as (run_id, first fetch time, url -> entry)"""
+        runs = {}
+        
+        for filename in sorted(os.listdir(self.index_dir)):
+            if not filename.endswith('.jsonl'):
+                continue
+            if days and filename[:-len('.jsonl')] not in days:
+                continue
+                
+            with open(os.path.join(self.index_dir, filename), 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping corrupt index line in {filename}")
+                        continue
+                        
+                    responses = runs.setdefault(entry['run'], {})
+                    # Last response wins if a feed was fetched twice in one run
+                    responses[entry['url']] = entry
+                    
+        result = []
+        for run_id in sorted(runs):
+            responses = runs[run_id]
+            started_at = min(datetime.fromisoformat(e['fetched_at']) for e in responses.values())
+            result.append((run_id, started_at, responses))
+            
+        return result
+        
+    def replay_session(self, responses: Dict[str, Dict[str, Any]]) -> 'ReplaySession':
+        """Create a session stand-in that serves one recorded run"""
+        return ReplaySession(self, responses)
+        
+    def _object_path(self, digest: str) -> str:
+        """Path of the compressed object for a digest"""
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.gz")
+
+
+class ReplayResponse:
+    """Recorded response exposing the subset of aiohttp.ClientResponse used by scrapers"""
+    
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self._body = body
+        
+    async def __aenter__(self):
+        return self
+        
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+        
+    async def read(self) -> bytes:
+        return self._body
+        
+    async def text(self) -> str:
+        return self._body.decode('utf-8', errors='replace')
+
+
+class ReplaySession:
+    """Stand-in for aiohttp.ClientSession that serves archived responses"""
+    
+    def __init__(self, archive: FeedArchive, responses: Dict[str, Dict[str, Any]]):
+        self.archive = archive
+        self.responses = responses
+        
+    def get(self, url: str, **kwargs) -> ReplayResponse:
+        """Return the recorded response for a URL"""
+        entry = self.responses.get(url)
+        if entry is None:
+            logger.warning(f"No recorded response for {url}")
+            return ReplayResponse(404, {}, b'')
+        return ReplayResponse(entry['status'], entry.get('headers', {}), self.archive.read_body(entry['digest']))
+        
+    async def close(self):
+        """Nothing to release"""
+        pass
\ No newline at end of file
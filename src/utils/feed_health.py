@@ -0,0 +1,209 @@
+"""
+Persisted feed health: latency history, error streaks and per-host circuit breakers
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Latencies of the most recent successful fetches kept per feed
+LATENCY_SAMPLES = 50
+
+# Successful fetches needed before a feed's own latency drives its timeout and hedging
+MIN_SAMPLES = 10
+
+DEFAULT_SETTINGS = {
+    'timeout_seconds': 20,        # Per-request timeout for feeds without latency history
+    'min_timeout_seconds': 5,     # Floor for timeouts derived from latency history
+    'deadline_seconds': 120,      # Budget for all fetches of a run; retries stop when it runs out
+    'retries': 2,                 # Extra attempts after a failed request
+    'backoff_seconds': 1,         # Base of the jittered exponential backoff between attempts
+    'failure_threshold': 3,       # Consecutive failed fetches from a host before its circuit opens
+    'cooldown_minutes': 30,       # First cooldown of an open circuit; doubles while probes fail
+    'max_cooldown_minutes': 1440,
+    'hedge': True,                # Send a second request when a feed is slower than its p95
+}
+
+
+class FeedHealth:
+    """Per-feed latency and error history with the fetch policy derived from it
+    
+    Records are kept per feed URL (latencies of recent successes, error
+    streak, last success and error) and per host (error streak and circuit
+    state). After failure_threshold consecutive failed fetches a host's
+    circuit opens and its feeds are skipped. Once the cooldown passes one
+    feed is let through as a probe: success closes the circuit, failure
+    reopens it with twice the cooldown.
+    
+    The store is a JSON file. save() merges the records this process
+    touched into the file under a lock, so shards and worker processes
+    updating different feeds do not overwrite each other.
+    """
+    
+    def __init__(self, path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        """Load health records from path, if given"""
+        self.path = path
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.timeout_seconds = settings['timeout_seconds']
+        self.min_timeout_seconds = settings['min_timeout_seconds']
+        self.deadline_seconds = settings['deadline_seconds']
+        self.retries = settings['retries']
+        self.backoff_seconds = settings['backoff_seconds']
+        self.failure_threshold = settings['failure_threshold']
+        self.cooldown_minutes = settings['cooldown_minutes']
+        self.max_cooldown_minutes = settings['max_cooldown_minutes']
+        self.hedge = settings['hedge']
+        
+        self.feeds: Dict[str, Dict[str, Any]] = {}
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+        self._touched_feeds = set()
+        self._touched_hosts = set()
+        # Hosts whose probe was handed out this run
+        self._probing = set()
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+        
+        if path:
+            self.feeds, self.hosts = self._read()
+            
+    def check(self, url: str, now: Optional[float] = None) -> str:
+        """Circuit state for a fetch of url: 'closed', 'probe' or 'open' (skip)"""
+        now = now or time.time()
+        host = _host(url)
+        record = self.hosts.get(host)
+        if not record or not record.get('open_until'):
+            return 'closed'
+            
+        if now < record['open_until'] or host in self._probing:
+            self.skipped += 1
+            return 'open'
+            
+        self._probing.add(host)
+        return 'probe'
+        
+    def record_success(self, url: str, latency: float, now: Optional[float] = None):
+        """Record a successful fetch and close the host's circuit"""
+        now = now or time.time()
+        feed = self._feed(url)
+        feed['latencies'] = (feed['latencies'] + [round(latency, 3)])[-LATENCY_SAMPLES:]
+        feed['error_streak'] = 0
+        feed['last_success'] = now
+        
+        host = self._host_record(url)
+        if host.get('open_until'):
+            logger.info(f"Circuit for {_host(url)} closed after successful fetch")
+        host.update(error_streak=0, open_until=0, cooldown=0)
+        
+    def record_failure(self, url: str, error: str, now: Optional[float] = None, host_down: bool = True):
+        """Record a failed fetch; opens or reopens the host's circuit once failures persist
+        
+        host_down=False records a failure of the feed alone, e.g. a 404 from
+        a host that is otherwise answering.
+        """
+        now = now or time.time()
+        feed = self._feed(url)
+        feed['error_streak'] += 1
+        feed['last_error'] = now
+        feed['last_error_message'] = error[:200]
+        if not host_down:
+            return
+            
+        host = self._host_record(url)
+        host['error_streak'] += 1
+        if host['error_streak'] < self.failure_threshold:
+            return
+            
+        cooldown = host.get('cooldown') or 0
+        cooldown = min(cooldown * 2 if cooldown else self.cooldown_minutes * 60, self.max_cooldown_minutes * 60)
+        host.update(cooldown=cooldown, open_until=now + cooldown)
+        logger.warning(
+            f"Circuit for {_host(url)} open for {cooldown / 60:.0f} minutes "
+            f"after {host['error_streak']} consecutive failures ({error})"
+        )
+        
+    def percentile(self, url: str, fraction: float) -> Optional[float]:
+        """Latency percentile of a feed in seconds, or None without enough history"""
+        latencies = self.feeds.get(url, {}).get('latencies', [])
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+        
+    def timeout_for(self, url: str) -> float:
+        """Request timeout: a multiple of the feed's p95 when known, else the default"""
+        p95 = self.percentile(url, 0.95)
+        if p95 is None:
+            return self.timeout_seconds
+        return min(max(p95 * 4, self.min_timeout_seconds), self.timeout_seconds)
+        
+    def hedge_delay(self, url: str) -> Optional[float]:
+        """Seconds after which a second request is sent, or None to not hedge"""
+        if not self.hedge:
+            return None
+        return self.percentile(url, 0.95)
+        
+    def save(self):
+        """Merge the records touched by this process into the store"""
+        if self.hedged or self.skipped:
+            logger.info(
+                f"Feed health: {self.skipped} feeds skipped by open circuits, "
+                f"{self.hedged} hedged requests ({self.hedge_wins} won by the hedge)"
+            )
+        self._probing.clear()
+        self.hedged = self.hedge_wins = self.skipped = 0
+        
+        if not self.path or not (self._touched_feeds or self._touched_hosts):
+            return
+            
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with FileLock(f"{self.path}.lock"):
+            feeds, hosts = self._read()
+            for url in self._touched_feeds:
+                feeds[url] = self.feeds[url]
+            for host in self._touched_hosts:
+                hosts[host] = self.hosts[host]
+                
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'feeds': feeds, 'hosts': hosts}, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            
+        # Pick up records other processes wrote meanwhile
+        self.feeds, self.hosts = feeds, hosts
+        self._touched_feeds.clear()
+        self._touched_hosts.clear()
+        
+    def _feed(self, url: str) -> Dict[str, Any]:
+        """Mutable record of a feed"""
+        self._touched_feeds.add(url)
+        return self.feeds.setdefault(url, {'latencies': [], 'error_streak': 0, 'last_success': 0, 'last_error': 0})
+        
+    def _host_record(self, url: str) -> Dict[str, Any]:
+        """Mutable record of a feed's host"""
+        host = _host(url)
+        self._touched_hosts.add(host)
+        return self.hosts.setdefault(host, {'error_streak': 0, 'open_until': 0, 'cooldown': 0})
+        
+    def _read(self):
+        """Feed and host records from the store"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            return data.get('feeds', {}), data.get('hosts', {})
+        except FileNotFoundError:
+            return {}, {}
+        except ValueError:
+            logger.warning(f"Ignoring corrupt feed health store {self.path}")
+            return {}, {}
+
+
+def _host(url: str) -> str:
+    """Host a circuit is kept for"""
+    return urlsplit(url).netloc.lower()
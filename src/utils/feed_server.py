@@ -0,0 +1,201 @@
+"""
+Local read API serving the latest curated feed from an immutable snapshot
+"""
+
+import json
+import gzip
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+from xml.sax.saxutils import escape
+from .article import Article
+
+logger = logging.getLogger(__name__)
+
+
+class Representation:
+    """One pre-serialized body with its gzip variant and strong ETags"""
+    
+    __slots__ = ('content_type', 'body', 'etag', 'gzip_body', 'gzip_etag')
+    
+    def __init__(self, content_type: str, body: bytes):
+        """Compress and hash body once"""
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.content_type = content_type
+        self.body = body
+        self.etag = f'"{digest}"'
+        # mtime=0 keeps the compressed bytes identical for identical bodies
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.gzip_etag = f'"{digest}-gz"'
+
+
+class FeedSnapshot:
+    """Immutable JSON and RSS renderings of one run's curated articles
+    
+    Everything a request needs is computed here, once per run, so serving
+    a poll is a dict lookup and a write of ready-made bytes.
+    """
+    
+    def __init__(self, articles: List[Article], title: str = 'Financial News', link: str = '',
+                 generated_at: Optional[datetime] = None):
+        """Render articles in ranked order"""
+        self.articles = tuple(articles)
+        self.generated_at = generated_at or datetime.now(timezone.utc)
+        self.last_modified = format_datetime(self.generated_at, usegmt=True)
+        self.json = Representation('application/json', self._render_json())
+        self.rss = Representation('application/rss+xml', self._render_rss(title, link))
+        
+    def _render_json(self) -> bytes:
+        """Articles as a JSON document"""
+        document = {
+            'generated_at': self.generated_at.isoformat(),
+            'count': len(self.articles),
+            'articles': [article.to_dict() for article in self.articles]
+        }
+        return json.dumps(document, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        
+    def _render_rss(self, title: str, link: str) -> bytes:
+        """Articles as an RSS 2.0 document"""
+        items = []
+        for article in self.articles:
+            parts = [
+                f"<title>{escape(article.title)}</title>",
+                f"<link>{escape(article.url)}</link>",
+                f'<guid isPermaLink="false">{article.id}</guid>',
+                f"<description>{escape(article.description)}</description>",
+            ]
+            if article.published_ts:
+                published = datetime.fromtimestamp(article.published_ts, timezone.utc)
+                parts.append(f"<pubDate>{format_datetime(published, usegmt=True)}</pubDate>")
+            if article.author:
+                parts.append(f"<author>{escape(article.author)}</author>")
+            parts.extend(f"<category>{escape(category)}</category>" for category in article.categories)
+            parts.append(f"<category>{escape(article.source)}</category>")
+            items.append(f"<item>{''.join(parts)}</item>")
+            
+        document = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0"><channel>'
+            f"<title>{escape(title)}</title>"
+            f"<link>{escape(link)}</link>"
+            f"<description>{escape(title)}</description>"
+            f"<lastBuildDate>{self.last_modified}</lastBuildDate>"
+            f"{''.join(items)}"
+            '</channel></rss>\n'
+        )
+        return document.encode('utf-8')
+
+
+class FeedServer:
+    """Serve the current snapshot over HTTP
+    
+    Routes:
+        /feed.json   curated articles as JSON
+        /feed.rss    the same articles as RSS 2.0
+        /health      snapshot time and size
+        
+    Requests never touch the sources: publish() swaps in a new snapshot
+    after each run, and handlers only read the current one. Clients sending
+    Accept-Encoding: gzip get the precompressed body, and a matching
+    If-None-Match is answered with 304 Not Modified.
+    """
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, title: str = 'Financial News',
+                 max_items: int = 100, max_age: int = 60):
+        """Initialize server with an empty snapshot"""
+        self.host = host
+        self.port = port
+        self.title = title
+        self.max_items = max_items
+        self.max_age = max_age
+        self.link = f"http://{host}:{port}/feed.rss"
+        self.snapshot = FeedSnapshot([], title, self.link)
+        self._runner = None
+        
+    def publish(self, articles: List[Article]):
+        """Replace the snapshot; this run's articles first, then earlier ones up to max_items
+        
+        Runs that find nothing new keep the feed populated with what
+        earlier runs delivered, and leave the snapshot untouched.
+        """
+        merged = list(articles)
+        seen = {article.digest for article in merged}
+        merged.extend(article for article in self.snapshot.articles if article.digest not in seen)
+        merged = merged[:self.max_items]
+        
+        # An unchanged feed keeps its bytes and ETags, so pollers keep getting 304s
+        if [article.digest for article in merged] == [article.digest for article in self.snapshot.articles]:
+            return
+        self.snapshot = FeedSnapshot(merged, self.title, self.link)
+        logger.info(f"Serving {len(self.snapshot.articles)} articles ({len(articles)} from this run)")
+        
+    async def start(self, routes: Iterable[Tuple[str, str, Callable]] = ()):
+        """Start listening; routes are extra (method, path, handler) endpoints, such as WebSub callbacks"""
+        from aiohttp import web
+        
+        app = web.Application()
+        app.router.add_get('/feed.json', self._handle_json)
+        app.router.add_get('/feed.rss', self._handle_rss)
+        app.router.add_get('/health', self._handle_health)
+        for method, path, handler in routes:
+            app.router.add_route(method, path, handler)
+        
+        # No access log: polling clients would dominate the log
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving feed at http://{self.host}:{self.port}/feed.json and /feed.rss")
+        
+    async def stop(self):
+        """Stop listening"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+            
+    async def _handle_json(self, request):
+        snapshot = self.snapshot
+        return self._respond(request, snapshot, snapshot.json)
+        
+    async def _handle_rss(self, request):
+        snapshot = self.snapshot
+        return self._respond(request, snapshot, snapshot.rss)
+        
+    async def _handle_health(self, request):
+        from aiohttp import web
+        
+        snapshot = self.snapshot
+        return web.json_response({'generated_at': snapshot.generated_at.isoformat(), 'count': len(snapshot.articles)})
+        
+    def _respond(self, request, snapshot: FeedSnapshot, representation: Representation):
+        """Serve a representation, compressed if accepted, or 304 if the client has it"""
+        from aiohttp import web
+        
+        compressed = 'gzip' in request.headers.get('Accept-Encoding', '')
+        etag = representation.gzip_etag if compressed else representation.etag
+        headers = {
+            'ETag': etag,
+            'Last-Modified': snapshot.last_modified,
+            'Cache-Control': f"public, max-age={self.max_age}",
+            'Vary': 'Accept-Encoding',
+        }
+        
+        if _etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return web.Response(status=304, headers=headers)
+            
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+            body = representation.gzip_body
+        else:
+            body = representation.body
+        headers['Content-Type'] = f"{representation.content_type}; charset=utf-8"
+        return web.Response(body=body, headers=headers)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 asks)"""
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return '*' in candidates or any(candidate.removeprefix('W/') == etag for candidate in candidates)
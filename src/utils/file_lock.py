@@ -0,0 +1,103 @@
+"""
+Inter-process file lock for state shared by concurrent runs
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs there are expected to be single-process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class LockTimeout(Exception):
+    """Raised when a lock is not acquired within its timeout"""
+
+
+class FileLock:
+    """Exclusive POSIX record lock on a lock file
+    
+    Uses fcntl.lockf, which is honored across processes on one host and,
+    through the lock manager, across hosts on NFS. The lock is released
+    when the holder exits, so a crashed run cannot leave it stuck.
+    
+    Acquiring polls with time.sleep for up to timeout seconds, so code on
+    an event loop calls anything taking a lock through asyncio.to_thread.
+    Threads sharing one FileLock exclude each other too, and re-entry is
+    only granted to the thread holding it.
+    """
+    
+    def __init__(self, path: str, timeout: float = 60.0, poll_interval: float = 0.05):
+        """Initialize lock on path without acquiring it"""
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._owner: Optional[int] = None
+        # lockf locks belong to the process, so threads sharing this object queue here first
+        self._threads = threading.Lock()
+        
+    def acquire(self):
+        """Block until the lock is held or the timeout expires"""
+        # Re-entrant within the holding thread, so locked methods can call each other
+        if self._depth and self._owner == threading.get_ident():
+            self._depth += 1
+            return
+            
+        deadline = time.monotonic() + self.timeout
+        if not self._threads.acquire(timeout=self.timeout):
+            raise LockTimeout(f"Timed out after {self.timeout}s waiting for {self.path}")
+        try:
+            self._fd = self._lock_file(deadline)
+        except BaseException:
+            self._threads.release()
+            raise
+        self._owner = threading.get_ident()
+        self._depth = 1
+        
+    def _lock_file(self, deadline: float) -> int:
+        """Open the lock file and poll for its record lock until the deadline"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return fd
+            
+        while True:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockTimeout(f"Timed out after {self.timeout}s waiting for {self.path}")
+                time.sleep(self.poll_interval)
+                
+    def release(self):
+        """Release the lock"""
+        if not self._depth or self._owner != threading.get_ident():
+            return
+        self._depth -= 1
+        if self._depth:
+            return
+            
+        try:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._owner = None
+            self._threads.release()
+            
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+        
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
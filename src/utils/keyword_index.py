@@ -0,0 +1,108 @@
+"""
+Keyword index shared by the global filters and every subscription
+"""
+
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, Hashable, List, Optional
+
+
+class KeywordIndex:
+    """Match every configured keyword against a text in a single scan
+    
+    Keywords from all rule sets are compiled into one trie-shaped regex, so
+    scanning an article costs the same however many subscriptions exist.
+    Each keyword carries postings of the (owner, kind) tags that use it;
+    a scan returns how many distinct keywords hit each tag.
+    
+    Matching is case-insensitive substring matching, as in the original
+    `keyword in text` checks.
+    """
+    
+    def __init__(self):
+        """Initialize empty index"""
+        self.keywords: List[str] = []
+        self.postings: List[List[Hashable]] = []
+        self._ids: Dict[str, int] = {}
+        self._pattern: Optional[re.Pattern] = None
+        self._implied: List[FrozenSet[int]] = []
+        
+    def __len__(self) -> int:
+        return len(self.keywords)
+        
+    def add(self, keyword: str, tag: Hashable):
+        """Register a keyword under a tag such as ('crypto', 'required')"""
+        keyword = keyword.lower()
+        if not keyword:
+            return
+            
+        keyword_id = self._ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = self._ids[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+            self.postings.append([])
+        if tag not in self.postings[keyword_id]:
+            self.postings[keyword_id].append(tag)
+        self._pattern = None
+        
+    def add_all(self, keywords: List[str], tag: Hashable):
+        """Register several keywords under one tag"""
+        for keyword in keywords:
+            self.add(keyword, tag)
+            
+    def compile(self):
+        """Build the scanning regex; called automatically on first scan"""
+        trie: Dict[str, dict] = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+            
+        # A lookahead match at every position finds overlapping keywords
+        self._pattern = re.compile(f"(?=({_trie_pattern(trie)}))") if self.keywords else None
+        
+        # The regex reports the longest keyword at each position; shorter
+        # keywords contained in it are implied by that match
+        self._implied = [
+            frozenset(other_id for other_id, other in enumerate(self.keywords) if other in keyword)
+            for keyword in self.keywords
+        ]
+        
+    def scan(self, text: str) -> FrozenSet[int]:
+        """IDs of all keywords occurring in text"""
+        if self._pattern is None:
+            if not self.keywords:
+                return frozenset()
+            self.compile()
+            
+        ids = self._ids
+        found = {ids[match] for match in self._pattern.findall(text.lower())}
+        
+        matched = set()
+        for keyword_id in found:
+            matched.update(self._implied[keyword_id])
+        return frozenset(matched)
+        
+    def hits(self, text: str) -> Counter:
+        """Number of distinct keywords found in text per tag"""
+        counts = Counter()
+        for keyword_id in self.scan(text):
+            counts.update(self.postings[keyword_id])
+        return counts
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex alternation for a trie node, longest alternatives tried first"""
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+        
+    if len(branches) == 1:
+        body = branches[0]
+        if '' in node:
+            return f"(?:{body})?"
+        return body
+        
+    body = f"(?:{'|'.join(branches)})"
+    return body + '?' if '' in node else body
@@ -0,0 +1,47 @@
+"""
+Deferred loading of scraper and notifier classes with startup timing
+"""
+
+import time
+import importlib
+import logging
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Import times of lazily loaded modules and startup milestones"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: List[Tuple[str, float]] = []
+        self.marks: Dict[str, float] = {}
+        
+    def mark(self, name: str):
+        """Record the first time a milestone is reached"""
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.started
+            
+    def format(self) -> str:
+        """Render the report in the style of python -X importtime"""
+        lines = ["startup: cumulative [us] | lazily imported module"]
+        for module, seconds in self.imports:
+            lines.append(f"startup: {seconds * 1e6:>15.0f} | {module}")
+        for name, seconds in sorted(self.marks.items(), key=lambda item: item[1]):
+            lines.append(f"startup: {name} at {seconds * 1000:.1f} ms")
+        return "\n".join(lines)
+
+
+STARTUP = StartupReport()
+
+
+def load_object(path: str) -> Any:
+    """Import "package.module:Name" on first use and return the named object"""
+    module_name, _, attribute = path.partition(':')
+    
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    STARTUP.imports.append((module_name, time.perf_counter() - started))
+    
+    return getattr(module, attribute)
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Non-blocking logging setup: records are queued and written by a background listener
+"""
+
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+from typing import Any, Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """Cap DEBUG records per call site per second, counting what was dropped"""
+    
+    def __init__(self, lines_per_second: int):
+        super().__init__()
+        self.lines_per_second = lines_per_second
+        self._windows = {}
+        
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.DEBUG or self.lines_per_second <= 0:
+            return True
+            
+        key = (record.name, record.lineno)
+        second = int(record.created)
+        window = self._windows.get(key)
+        
+        if window is None or window[0] != second:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [second, 1, 0]
+            if suppressed:
+                record.msg = f"{record.getMessage()} ({suppressed} similar debug lines suppressed)"
+                record.args = None
+            return True
+            
+        if window[1] < self.lines_per_second:
+            window[1] += 1
+            return True
+            
+        window[2] += 1
+        return False
+
+
+def _level(config: Dict[str, Any]) -> int:
+    """Configured log level"""
+    return getattr(logging, str(config.get('level', 'INFO')).upper(), logging.INFO)
+
+
+def _formatter(config: Dict[str, Any]) -> logging.Formatter:
+    """Plain or JSON formatter as configured"""
+    if config.get('json'):
+        return JsonFormatter()
+    return logging.Formatter(DEFAULT_FORMAT)
+
+
+def setup_logging(config: Optional[Dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background listener
+    
+    Returns the started listener; call stop() on it at exit to flush.
+    """
+    config = config or {}
+    level = _level(config)
+    formatter = _formatter(config)
+    
+    handlers = []
+    
+    log_file = config.get('file', 'aggregator.log')
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=config.get('max_bytes', 10 * 1024 * 1024),
+            backupCount=config.get('backup_count', 5)
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+        
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    handlers.append(stream_handler)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(DebugRateLimitFilter(config.get('debug_lines_per_second', 5)))
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_worker_logging(config: Optional[Dict[str, Any]] = None):
+    """Log from a worker process to stdout only; the coordinator owns the log file"""
+    config = config or {}
+    
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_formatter(config))
+    handler.addFilter(DebugRateLimitFilter(config.get('debug_lines_per_second', 5)))
+    
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(_level(config))
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Event-loop lag and blocking-call detection, attributed to pipeline stages
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Frames under this directory are the aggregator's own, as opposed to libraries
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+DEFAULT_SETTINGS = {
+    'interval_ms': 50,            # Heartbeat period; lag is how late each beat wakes
+    'threshold_ms': 100,          # Lag beyond which the loop counts as blocked and its stack is captured
+    'max_stalls': 5,              # Longest stalls kept, with their stacks, per run
+    'stack_depth': 8,             # Innermost frames kept of a captured stack
+    'metrics_file': '',           # JSON lines of per-run results, if set
+}
+
+
+class LoopMonitor:
+    """Measure how long the event loop is held up, and by what
+    
+    A heartbeat task sleeps interval_ms at a time and records how late it
+    wakes. A watchdog thread checks the heartbeat; once it is threshold_ms
+    overdue, the loop is blocked by whatever callback is running, and the
+    thread captures that callback's stack from the loop thread's frame.
+    Blocked time is added to the pipeline stage entered with stage() while
+    the block lasts, so a stage that offloads its work shows up as freeing
+    the loop.
+    
+    stop() logs the lag percentiles, blocked time per stage and the
+    longest stalls with where they happened, and appends them to
+    metrics_file.
+    """
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """Initialize an idle monitor"""
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.interval = settings['interval_ms'] / 1000
+        self.threshold = settings['threshold_ms'] / 1000
+        self.max_stalls = settings['max_stalls']
+        self.stack_depth = settings['stack_depth']
+        self.metrics_file = settings['metrics_file']
+        
+        self.current_stage = 'other'
+        self._lock = threading.Lock()
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._reset()
+        
+    def start(self):
+        """Start the heartbeat and the watchdog; call from the loop"""
+        if self._task is not None:
+            return
+        self._reset()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._thread.start()
+        
+    async def stop(self) -> Dict[str, Any]:
+        """Stop measuring, log the results and append them to the metrics file; returns them"""
+        if self._task is None:
+            return {}
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        
+        report = self.report()
+        self._log(report)
+        if self.metrics_file:
+            self._append_metrics(report)
+        return report
+        
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute blocked time to a pipeline stage while in this block"""
+        previous = self.current_stage
+        self.current_stage = name
+        try:
+            yield
+        finally:
+            self.current_stage = previous
+            
+    def report(self) -> Dict[str, Any]:
+        """Lag percentiles, blocked seconds per stage and the longest stalls of this run"""
+        with self._lock:
+            lags = sorted(self._lags)
+            blocked = dict(self._blocked)
+            stalls = sorted(self._stalls, key=lambda stall: stall['seconds'], reverse=True)
+            
+        def percentile(fraction):
+            return lags[min(int(fraction * len(lags)), len(lags) - 1)] if lags else 0.0
+            
+        return {
+            'ts': time.time(),
+            'beats': len(lags),
+            'lag_p50_ms': round(percentile(0.5) * 1000, 1),
+            'lag_p99_ms': round(percentile(0.99) * 1000, 1),
+            'lag_max_ms': round((lags[-1] if lags else 0.0) * 1000, 1),
+            'blocked_seconds': {stage: round(seconds, 3) for stage, seconds in
+                                sorted(blocked.items(), key=lambda item: item[1], reverse=True)},
+            'stalls': [dict(stall, seconds=round(stall['seconds'], 3)) for stall in stalls],
+        }
+        
+    async def _heartbeat(self):
+        """Sleep one interval at a time and record how late each wake-up is"""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            with self._lock:
+                self._lags.append(lag)
+                if self._stall is not None:
+                    # The rest of the block goes to the stage the watchdog last saw
+                    stage = self._stall['stage']
+                    self._blocked[stage] = self._blocked.get(stage, 0.0) + max(lag - self._attributed, 0.0)
+                    self._close_stall(lag)
+                    self._attributed = 0.0
+                self._last_beat = time.monotonic()
+                
+    def _watch(self):
+        """Watchdog thread: capture the stack of a blocked loop and attribute the blocked time"""
+        while not self._stopped.wait(self.interval / 2):
+            with self._lock:
+                overdue = time.monotonic() - self._last_beat - self.interval
+                if overdue < self.threshold:
+                    continue
+                stage = self.current_stage
+                if self._stall is not None and self._stall['stage'] != stage:
+                    # A block running through several stages is reported per stage
+                    self._close_stall(overdue)
+                if self._stall is None:
+                    self._open_stall(stage, overdue if self._attributed else 0.0)
+                self._blocked[stage] = self._blocked.get(stage, 0.0) + overdue - self._attributed
+                self._attributed = overdue
+                
+    def _open_stall(self, stage: str, began: float):
+        """Capture the loop thread's stack as a stall starting began seconds into the block"""
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        self._stall = {
+            'stage': stage,
+            'where': _where(stack),
+            'stack': [f"{os.path.basename(item.filename)}:{item.lineno} {item.name}" for item in stack[-self.stack_depth:]],
+            'began': began,
+        }
+        
+    def _close_stall(self, overdue: float):
+        """Keep the current stall if it is among the longest, with its length up to overdue"""
+        stall = self._stall
+        stall['seconds'] = overdue - stall.pop('began')
+        self._stalls.append(stall)
+        self._stalls.sort(key=lambda item: item['seconds'], reverse=True)
+        del self._stalls[self.max_stalls:]
+        self._stall = None
+        
+    def _reset(self):
+        """Clear the results of the previous run"""
+        self._lags: List[float] = []
+        self._blocked: Dict[str, float] = {}
+        self._stalls: List[Dict[str, Any]] = []
+        self._stall = None
+        # Blocked seconds of the current block already added to a stage
+        self._attributed = 0.0
+        
+    def _log(self, report: Dict[str, Any]):
+        """Log the run's results"""
+        blocked = report['blocked_seconds']
+        total = sum(blocked.values())
+        stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in blocked.items())
+        logger.info(
+            f"Event loop: lag p50 {report['lag_p50_ms']:.1f} ms, p99 {report['lag_p99_ms']:.1f} ms, "
+            f"max {report['lag_max_ms']:.1f} ms; blocked {total:.2f}s" + (f" ({stages})" if stages else '')
+        )
+        for stall in report['stalls']:
+            logger.info(f"Event loop blocked {stall['seconds'] * 1000:.0f} ms in {stall['stage']} at {stall['where']}")
+            
+    def _append_metrics(self, report: Dict[str, Any]):
+        """Append the run's results as a JSON line; failures are logged"""
+        try:
+            os.makedirs(os.path.dirname(self.metrics_file) or '.', exist_ok=True)
+            with open(self.metrics_file, 'a') as f:
+                f.write(json.dumps(report) + '\n')
+        except OSError as e:
+            logger.error(f"Failed to write loop metrics to {self.metrics_file}: {e}")
+
+
+def _where(stack: traceback.StackSummary) -> str:
+    """Innermost frame of a stack outside asyncio, and the innermost of this code base if that is another"""
+    frames = [item for item in stack if os.sep + 'asyncio' + os.sep not in item.filename and item.filename != __file__]
+    if not frames:
+        return 'unknown'
+    where = f"{os.path.basename(frames[-1].filename)}:{frames[-1].lineno} in {frames[-1].name}"
+    if not frames[-1].filename.startswith(SRC_DIR):
+        own = [item for item in frames if item.filename.startswith(SRC_DIR)]
+        if own:
+            where += f" via {os.path.basename(own[-1].filename)}:{own[-1].lineno} in {own[-1].name}"
+    return where
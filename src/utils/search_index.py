@@ -0,0 +1,502 @@
+"""
+Incremental full-text search index over delivered articles
+"""
+
+import os
+import re
+import json
+import time
+import bisect
+import itertools
+import shutil
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from .article import Article
+from .article_archive import ArticleArchive, parse_time
+from .file_lock import FileLock, LockTimeout
+from .storage import _owner
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.lock'
+MERGE_LOCK_FILE = '.merge.lock'
+
+# Once more segments than this exist, this many of the smallest are merged into one
+MERGE_FACTOR = 8
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Title terms count this many times, so title matches outrank description matches
+TITLE_WEIGHT = 2
+
+# Search terms; a trailing * matches every term with that prefix
+_TERM_PATTERN = re.compile(r'\w+\*?')
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def document_terms(article: Article) -> Counter:
+    """Term frequencies of an article's lowercased title and description
+    
+    The raw text is tokenized rather than the filter's normalized text,
+    which drops everything up to a title's first colon or dash.
+    """
+    counts = Counter(_WORD_PATTERN.findall(article.description.lower()))
+    for term in _WORD_PATTERN.findall(article.title.lower()):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+class _TermList(Sequence):
+    """Sorted terms of a segment, decoded on access for binary search"""
+    
+    def __init__(self, blob: bytes, offsets: 'numpy.ndarray'):
+        self.blob = blob
+        self.offsets = offsets
+        
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+        
+    def __getitem__(self, index: int) -> str:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].decode('utf-8')
+        
+    def all(self) -> List[str]:
+        """Every term, decoded in one pass"""
+        import numpy as np
+        
+        offsets = np.asarray(self.offsets).tolist()
+        blob = self.blob
+        return [blob[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+
+class Segment:
+    """Immutable on-disk segment; numeric arrays are memory-mapped
+    
+    Files in a segment directory:
+        terms.bin, term_offsets.npy          sorted terms, UTF-8 concatenated
+        postings_offsets.npy                 postings range of each term
+        postings_docs.npy, postings_tf.npy   document numbers (uint32) and term frequencies (uint16)
+        doc_lengths.npy, doc_published.npy   per-document length in terms and publication time
+        doc_sources.npy, sources.json        per-document source code and the code table
+        docs.bin, doc_offsets.npy            per-document JSON for result display
+    """
+    
+    def __init__(self, path: str):
+        """Open segment at path"""
+        self.path = path
+        self.name = os.path.basename(path)
+        self.term_offsets = self._load('term_offsets')
+        self.postings_offsets = self._load('postings_offsets')
+        self.postings_docs = self._load('postings_docs')
+        self.postings_tf = self._load('postings_tf')
+        self.doc_lengths = self._load('doc_lengths')
+        self.doc_published = self._load('doc_published')
+        self.doc_sources = self._load('doc_sources')
+        self.doc_offsets = self._load('doc_offsets')
+        with open(os.path.join(path, 'terms.bin'), 'rb') as f:
+            self.terms = _TermList(f.read(), self.term_offsets)
+        with open(os.path.join(path, 'sources.json'), 'r') as f:
+            self.sources: List[str] = json.load(f)
+        self.total_length = int(self.doc_lengths.sum())
+        
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+        
+    def find(self, term: str) -> range:
+        """Term indexes matching a term, or every term starting with a prefix ending in *"""
+        if term.endswith('*'):
+            prefix = term[:-1]
+            start = bisect.bisect_left(self.terms, prefix)
+            end = start
+            while end < len(self.terms) and self.terms[end].startswith(prefix):
+                end += 1
+            return range(start, end)
+            
+        index = bisect.bisect_left(self.terms, term)
+        if index < len(self.terms) and self.terms[index] == term:
+            return range(index, index + 1)
+        return range(0)
+        
+    def postings(self, term_index: int) -> Tuple['numpy.ndarray', 'numpy.ndarray']:
+        """Document numbers and term frequencies of a term"""
+        start, end = self.postings_offsets[term_index], self.postings_offsets[term_index + 1]
+        return self.postings_docs[start:end], self.postings_tf[start:end]
+        
+    def document(self, position: int) -> Dict[str, Any]:
+        """Stored fields of a document"""
+        start, end = int(self.doc_offsets[position]), int(self.doc_offsets[position + 1])
+        with open(os.path.join(self.path, 'docs.bin'), 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+            
+    def _load(self, name: str) -> 'numpy.ndarray':
+        """Memory-map one array of the segment"""
+        import numpy as np
+        
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking, built from immutable segments
+    
+    Each add() writes one segment and lists it in the manifest, so indexing
+    a run costs only that run's articles. When more than merge_factor
+    segments exist, the smallest are merged by a background thread, which
+    keeps the number of segments a query visits logarithmic in the index
+    size. Queries memory-map the postings, score only the documents that
+    contain a query term, and pick the top results with argpartition.
+    
+    Documents are tokenized from their title and description; matching is
+    case-insensitive on whole words, with prefix* queries expanded against
+    the sorted term list.
+    """
+    
+    def __init__(self, root: str, merge_factor: int = MERGE_FACTOR):
+        """Initialize search index in root"""
+        self.root = root
+        self.merge_factor = merge_factor
+        os.makedirs(root, exist_ok=True)
+        self.lock = FileLock(os.path.join(root, LOCK_FILE))
+        self._segments: Dict[str, Segment] = {}
+        self._merge_thread: Optional[threading.Thread] = None
+        
+    def add(self, articles: Iterable[Article]) -> int:
+        """Index articles as a new segment; returns the number indexed"""
+        import numpy as np
+        
+        documents = [(article, document_terms(article)) for article in articles]
+        if not documents:
+            return 0
+            
+        postings: Dict[str, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+        for position, (article, terms) in enumerate(documents):
+            for term, count in terms.items():
+                docs, tfs = postings[term]
+                docs.append(position)
+                tfs.append(count)
+                
+        sources = sorted({article.source for article, _ in documents})
+        codes = {source: code for code, source in enumerate(sources)}
+        stored = [
+            json.dumps({
+                'id': article.id,
+                'source': article.source,
+                'published': article.published_ts,
+                'title': article.title,
+                'url': article.url
+            }, separators=(',', ':')).encode('utf-8')
+            for article, _ in documents
+        ]
+        
+        terms = sorted(postings)
+        lengths = np.array([len(postings[term][0]) for term in terms], dtype=np.uint64)
+        count = int(lengths.sum())
+        name = self._write_segment(
+            terms, lengths,
+            np.fromiter(itertools.chain.from_iterable(postings[term][0] for term in terms), np.uint32, count),
+            np.fromiter(itertools.chain.from_iterable(postings[term][1] for term in terms), np.uint16, count),
+            doc_lengths=np.array([min(sum(terms.values()), 65535) for _, terms in documents], dtype=np.uint16),
+            doc_published=np.array([article.published_ts for article, _ in documents], dtype=np.float64),
+            doc_sources=np.array([codes[article.source] for article, _ in documents], dtype=np.uint16),
+            sources=sources,
+            stored=[b''.join(stored)],
+            stored_lengths=[np.array([len(entry) for entry in stored], dtype=np.uint64)]
+        )
+        
+        with self.lock:
+            manifest = self._read_manifest()
+            manifest['segments'].append(self._describe(name))
+            self._write_manifest(manifest)
+            
+        logger.info(f"Indexed {len(documents)} articles for search")
+        self.merge_in_background()
+        return len(documents)
+        
+    def add_archive(self, archive: ArticleArchive, chunk_size: int = 100000) -> int:
+        """Index every delivered article of an article archive, one segment per chunk"""
+        columns = ['id', 'source', 'title', 'url', 'description', 'published']
+        pending = []
+        indexed = 0
+        
+        for batch in archive.scan(decision=['delivered'], columns=columns):
+            for row in batch.to_pylist():
+                published = row['published'].timestamp() if row['published'] else 0.0
+                pending.append(Article(
+                    bytes.fromhex(row['id']), row['source'], row['title'] or '', row['url'] or '',
+                    row['description'] or '', published
+                ))
+            if len(pending) >= chunk_size:
+                indexed += self.add(pending)
+                pending = []
+                
+        indexed += self.add(pending)
+        self.wait()
+        return indexed
+        
+    def search(self, query: str, sources: Optional[List[str]] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matches for a query, highest BM25 score first
+        
+        sources limits results to those sources; since and until bound the
+        publication time like archive queries (dates or ISO times, UTC).
+        """
+        import numpy as np
+        
+        terms = list(dict.fromkeys(_TERM_PATTERN.findall(query.lower())))
+        segments = self._open_segments()
+        if not terms or not segments:
+            return []
+            
+        total_docs = sum(len(segment) for segment in segments)
+        average_length = max(sum(segment.total_length for segment in segments) / total_docs, 1.0)
+        since_ts, until_ts = parse_time(since), parse_time(until, end=True)
+        
+        # Document frequencies are summed over segments so scores are comparable
+        matches = [[index for term in terms for index in segment.find(term)] for segment in segments]
+        document_frequency = Counter()
+        for segment, indexes in zip(segments, matches):
+            for index in indexes:
+                document_frequency[segment.terms[index]] += int(
+                    segment.postings_offsets[index + 1] - segment.postings_offsets[index]
+                )
+                
+        candidates = []
+        for segment, indexes in zip(segments, matches):
+            if not indexes:
+                continue
+                
+            all_docs = []
+            all_scores = []
+            for index in indexes:
+                docs, tfs = segment.postings(index)
+                df = document_frequency[segment.terms[index]]
+                idf = np.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                tf = tfs.astype(np.float32)
+                norm = K1 * (1 - B + B * segment.doc_lengths[docs] / average_length)
+                all_docs.append(docs)
+                all_scores.append(idf * tf * (K1 + 1) / (tf + norm))
+                
+            scores = np.bincount(np.concatenate(all_docs), weights=np.concatenate(all_scores), minlength=len(segment))
+            hits = np.flatnonzero(scores)
+            
+            if sources:
+                codes = [code for code, source in enumerate(segment.sources) if source in sources]
+                hits = hits[np.isin(segment.doc_sources[hits], codes)]
+            if since_ts:
+                hits = hits[segment.doc_published[hits] >= since_ts.timestamp()]
+            if until_ts:
+                hits = hits[segment.doc_published[hits] <= until_ts.timestamp()]
+                
+            if len(hits) > limit:
+                hits = hits[np.argpartition(-scores[hits], limit)[:limit]]
+            candidates.extend((float(scores[position]), segment, int(position)) for position in hits)
+            
+        # Equal scores rank newer articles first
+        candidates.sort(key=lambda candidate: (-candidate[0], -candidate[1].doc_published[candidate[2]]))
+        results = []
+        for score, segment, position in candidates[:limit]:
+            document = segment.document(position)
+            document['score'] = round(score, 4)
+            results.append(document)
+        return results
+        
+    def merge_in_background(self):
+        """Start a background merge if there are too many segments and none is running"""
+        if self._merge_thread is not None and self._merge_thread.is_alive():
+            return
+        if len(self._read_manifest()['segments']) <= self.merge_factor:
+            return
+            
+        self._merge_thread = threading.Thread(target=self.merge, name='search-index-merge', daemon=True)
+        self._merge_thread.start()
+        
+    def wait(self):
+        """Wait for a running background merge"""
+        if self._merge_thread is not None:
+            self._merge_thread.join()
+            self._merge_thread = None
+            
+    def merge(self) -> bool:
+        """Merge the smallest segments while there are too many; returns whether anything merged
+        
+        One merge runs at a time across processes. Segments added meanwhile
+        are kept, since the manifest is re-read before the merged segment
+        replaces its inputs.
+        """
+        merge_lock = FileLock(os.path.join(self.root, MERGE_LOCK_FILE), timeout=0)
+        try:
+            merge_lock.acquire()
+        except LockTimeout:
+            return False
+            
+        merged_any = False
+        try:
+            while True:
+                entries = self._read_manifest()['segments']
+                if len(entries) <= self.merge_factor:
+                    return merged_any
+                    
+                chosen = sorted(entries, key=lambda entry: entry['docs'])[:self.merge_factor]
+                started = time.perf_counter()
+                name = self._merge_segments([Segment(os.path.join(self.root, entry['name'])) for entry in chosen])
+                
+                chosen_names = {entry['name'] for entry in chosen}
+                with self.lock:
+                    manifest = self._read_manifest()
+                    manifest['segments'] = [
+                        entry for entry in manifest['segments'] if entry['name'] not in chosen_names
+                    ] + [self._describe(name)]
+                    self._write_manifest(manifest)
+                    
+                # Open readers keep their mappings after the files are removed
+                for entry_name in chosen_names:
+                    shutil.rmtree(os.path.join(self.root, entry_name), ignore_errors=True)
+                merged_any = True
+                logger.info(
+                    f"Merged {len(chosen)} search segments into {name} in {time.perf_counter() - started:.2f}s"
+                )
+        finally:
+            merge_lock.release()
+            
+    def clear(self):
+        """Remove every segment"""
+        self.wait()
+        with self.lock:
+            for entry in self._read_manifest()['segments']:
+                shutil.rmtree(os.path.join(self.root, entry['name']), ignore_errors=True)
+            self._write_manifest({'segments': []})
+        self._segments.clear()
+        
+    def __len__(self) -> int:
+        return sum(entry['docs'] for entry in self._read_manifest()['segments'])
+        
+    def _open_segments(self) -> List[Segment]:
+        """Segments of the current manifest, reusing those already open"""
+        names = [entry['name'] for entry in self._read_manifest()['segments']]
+        segments = {}
+        for name in names:
+            segment = self._segments.get(name)
+            if segment is None:
+                try:
+                    segment = Segment(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    # Merged away since the manifest was read; the next query sees its replacement
+                    continue
+            segments[name] = segment
+        self._segments = segments
+        return list(segments.values())
+        
+    def _merge_segments(self, segments: List[Segment]) -> str:
+        """Write one segment holding the documents of several; returns its name"""
+        import numpy as np
+        
+        segment_terms = [segment.terms.all() for segment in segments]
+        terms = sorted(set(itertools.chain.from_iterable(segment_terms)))
+        positions = {term: position for position, term in enumerate(terms)}
+        
+        # Tag every posting with its merged term number, then group by it; the
+        # stable sort keeps each term's documents in segment and document order
+        term_ids = []
+        docs = []
+        offset = 0
+        for segment, names in zip(segments, segment_terms):
+            mapping = np.array([positions[term] for term in names], dtype=np.uint32)
+            term_ids.append(np.repeat(mapping, np.diff(segment.postings_offsets).astype(np.int64)))
+            docs.append(segment.postings_docs + np.uint32(offset))
+            offset += len(segment)
+        term_ids = np.concatenate(term_ids)
+        order = np.argsort(term_ids, kind='stable')
+        
+        sources = sorted({source for segment in segments for source in segment.sources})
+        codes = {source: code for code, source in enumerate(sources)}
+        stored = []
+        for segment in segments:
+            with open(os.path.join(segment.path, 'docs.bin'), 'rb') as f:
+                stored.append(f.read())
+                
+        return self._write_segment(
+            terms, np.bincount(term_ids, minlength=len(terms)).astype(np.uint64),
+            np.concatenate(docs)[order], np.concatenate([segment.postings_tf for segment in segments])[order],
+            doc_lengths=np.concatenate([segment.doc_lengths for segment in segments]),
+            doc_published=np.concatenate([segment.doc_published for segment in segments]),
+            doc_sources=np.concatenate([
+                np.array([codes[source] for source in segment.sources], dtype=np.uint16)[segment.doc_sources]
+                for segment in segments
+            ]),
+            sources=sources,
+            stored=stored,
+            stored_lengths=[np.diff(segment.doc_offsets).astype(np.uint64) for segment in segments]
+        )
+        
+    def _write_segment(self, terms: List[str], postings_lengths: 'numpy.ndarray', postings_docs: 'numpy.ndarray',
+                       postings_tf: 'numpy.ndarray', doc_lengths: 'numpy.ndarray', doc_published: 'numpy.ndarray',
+                       doc_sources: 'numpy.ndarray', sources: List[str], stored: List[bytes],
+                       stored_lengths: List['numpy.ndarray']) -> str:
+        """Write a segment directory atomically; postings are grouped by term in sorted term order"""
+        import numpy as np
+        
+        name = f"seg-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{time.time_ns() % 10**9:09d}-{_owner()}"
+        # Dot-prefixed until renamed, so a crashed write is never listed
+        tmp_path = os.path.join(self.root, f".{name}.tmp")
+        os.makedirs(tmp_path)
+        
+        encoded = [term.encode('utf-8') for term in terms]
+        
+        arrays = {
+            'term_offsets': _offsets(np.array([len(term) for term in encoded], dtype=np.uint64)),
+            'postings_offsets': _offsets(postings_lengths),
+            'postings_docs': postings_docs,
+            'postings_tf': postings_tf,
+            'doc_lengths': doc_lengths,
+            'doc_published': doc_published,
+            'doc_sources': doc_sources,
+            'doc_offsets': _offsets(np.concatenate(stored_lengths)),
+        }
+        for array_name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{array_name}.npy"), array)
+        with open(os.path.join(tmp_path, 'terms.bin'), 'wb') as f:
+            f.write(b''.join(encoded))
+        with open(os.path.join(tmp_path, 'docs.bin'), 'wb') as f:
+            for blob in stored:
+                f.write(blob)
+        with open(os.path.join(tmp_path, 'sources.json'), 'w') as f:
+            json.dump(sources, f)
+            
+        os.rename(tmp_path, os.path.join(self.root, name))
+        return name
+        
+    def _describe(self, name: str) -> Dict[str, Any]:
+        """Manifest entry of a written segment"""
+        import numpy as np
+        
+        lengths = np.load(os.path.join(self.root, name, 'doc_lengths.npy'), mmap_mode='r')
+        return {'name': name, 'docs': int(len(lengths))}
+        
+    def _read_manifest(self) -> Dict[str, Any]:
+        """Current list of segments"""
+        try:
+            with open(os.path.join(self.root, MANIFEST), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': []}
+            
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """Atomically replace the manifest; the caller holds the lock"""
+        path = os.path.join(self.root, MANIFEST)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, path)
+
+
+def _offsets(lengths: 'numpy.ndarray') -> 'numpy.ndarray':
+    """Start offsets of consecutive items plus the end offset"""
+    import numpy as np
+    
+    offsets = np.zeros(len(lengths) + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
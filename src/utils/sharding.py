@@ -0,0 +1,95 @@
+"""
+Feed sharding across worker processes or hosts, and the spool they hand results through
+"""
+
+import os
+import time
+import glob
+import pickle
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+from .article import Article
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a 1-based "i/N" shard argument into a 0-based (index, count)"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like 2/4, got '{value}'")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard {value} is out of range")
+    return index - 1, count
+
+
+def shard_of(feed_url: str, count: int) -> int:
+    """Shard owning a feed; stable across processes and hosts"""
+    return int.from_bytes(hashlib.md5(feed_url.encode()).digest()[:4], 'big') % count
+
+
+def in_shard(feed_url: str, shard: Optional[Tuple[int, int]]) -> bool:
+    """Check if a feed belongs to the shard; every feed does when unsharded"""
+    if shard is None:
+        return True
+    index, count = shard
+    return shard_of(feed_url, count) == index
+
+
+def default_run_id() -> str:
+    """Run ID shared by the shards of one run: the CI run, else the current UTC hour"""
+    return os.getenv('GITHUB_RUN_ID') or time.strftime('%Y%m%dT%H', time.gmtime())
+
+
+def spool_path(spool_dir: str, run_id: str, shard: Tuple[int, int]) -> str:
+    """File a shard's articles are written to"""
+    index, count = shard
+    return os.path.join(spool_dir, run_id, f"shard-{index + 1}-of-{count}.pkl")
+
+
+def write_spool(spool_dir: str, run_id: str, shard: Tuple[int, int], articles: List[Article]):
+    """Atomically publish a shard's articles for the coordinator"""
+    path = spool_path(spool_dir, run_id, shard)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(articles, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    logger.info(f"Spooled {len(articles)} articles to {path}")
+
+
+def read_spool(spool_dir: str, run_id: str, count: int, wait_seconds: float = 0) -> List[Article]:
+    """Collect the articles of all shards of a run, waiting for late shards
+    
+    Shards still missing when the wait ends are reported and skipped; their
+    feeds are picked up again by the next run. Consumed files are removed.
+    """
+    run_dir = os.path.join(spool_dir, run_id)
+    expected = {spool_path(spool_dir, run_id, (index, count)) for index in range(count)}
+    deadline = time.monotonic() + wait_seconds
+    
+    while True:
+        present = expected & set(glob.glob(os.path.join(run_dir, 'shard-*.pkl')))
+        if present == expected or time.monotonic() >= deadline:
+            break
+        time.sleep(1)
+        
+    missing = len(expected - present)
+    if missing:
+        logger.warning(f"{missing} of {count} shards missing from {run_dir}")
+        
+    articles = []
+    for path in sorted(present):
+        with open(path, 'rb') as f:
+            articles.extend(pickle.load(f))
+        os.remove(path)
+        
+    try:
+        os.rmdir(run_dir)
+    except OSError:
+        pass
+        
+    return articles
@@ -3,77 +3,429 @@ Storage utilities for tracking processed articles
 """
 
 import os
+import re
 import json
+import time
+import shutil
+import socket
 import logging
 from datetime import datetime, timedelta
-from typing import Set, Dict, Any
+from typing import Set, Dict, Any, Iterable, List, Optional, Union
+from .file_lock import FileLock
 
 logger = logging.getLogger(__name__)
 
+# Article IDs are MD5 digests
+DIGEST_SIZE = 16
+
+# Segment written for a day once its run segments are compacted
+COMPACTED_SEGMENT = 'day.ids'
+
+# In-flight claims of concurrent runs, and the lock guarding all writes
+CLAIMS_DIR = 'claims'
+LOCK_FILE = '.lock'
+
+# Claims of runs that crashed before committing are ignored after this long
+CLAIM_TTL_SECONDS = 900
+
 
 class Storage:
-    """Store and manage processed article IDs"""
+    """Store and manage processed article IDs
+    
+    History is an append-only journal under history_dir, one directory per
+    UTC day holding segment files of sorted 16-byte binary digests:
     
-    def __init__(self, history_file: str):
-        """Initialize storage"""
-        self.history_file = history_file
+        data/history/2024-01-15/run-20240115T050012123456.ids
+        data/history/2024-01-14/day.ids
+        
+    Each run adds one small segment, so committing the history to git stores
+    only the new IDs. Closed days are compacted into a single segment, and
+    expiry deletes whole day directories without reading live entries.
+    
+    Concurrent runs sharing history_dir, as processes or as hosts on a
+    shared filesystem, serialize writes through a lock file. Before
+    notifying, a run claims its articles: the claim skips anything another
+    run has committed or is still delivering, and commit turns the claim
+    into a run segment.
+    """
+    
+    def __init__(self, history_dir: str, legacy_file: Optional[str] = None,
+                 snapshot: Optional[Dict[str, Any]] = None):
+        """Initialize storage, starting from a warm-start snapshot of the history if given"""
+        self.history_dir = history_dir
         self._ensure_directory()
-        self.processed_articles = self._load_history()
+        self.lock = FileLock(os.path.join(history_dir, LOCK_FILE))
+        self.buckets: Dict[str, Set[bytes]] = {}  # 'YYYY-MM-DD' -> article digests
+        # Sorted digests of the days restored from a snapshot, and indexes over them
+        # searched in place until the buckets are needed in full
+        self._frozen: Dict[str, memoryview] = {}
+        self._frozen_indexes: List[SortedDigests] = []
+        self._loaded_segments: Set[str] = set()
+        self._claim_path: Optional[str] = None
+        if snapshot and snapshot.get('history_dir') == history_dir:
+            self._restore(snapshot)
+        self._load_history()
+        
+        if legacy_file and os.path.exists(legacy_file):
+            with self.lock:
+                self._migrate_legacy_file(legacy_file)
+                
+    def _restore(self, snapshot: Dict[str, Any]):
+        """Take the segments and digests of a snapshot; days removed since are dropped"""
+        for day, digests in snapshot['days'].items():
+            if os.path.isdir(os.path.join(self.history_dir, day)):
+                self._frozen[day] = digests
+        self._loaded_segments.update(
+            segment for segment in snapshot['segments'] if segment.split('/', 1)[0] in self._frozen
+        )
         
+        # The combined index still holds expired days, so without all days each is searched instead
+        if len(self._frozen) == len(snapshot['days']):
+            self._frozen_indexes = [snapshot['index']]
+        else:
+            self._frozen_indexes = [SortedDigests(digests) for digests in self._frozen.values()]
+            
+    def snapshot(self) -> Dict[str, Any]:
+        """Loaded segments, sorted digests of each day and of all days, for a warm-start snapshot"""
+        self._thaw()
+        return {
+            'segments': sorted(self._loaded_segments),
+            'days': {day: b''.join(sorted(digests)) for day, digests in sorted(self.buckets.items())},
+            'index': b''.join(sorted(set().union(*self.buckets.values())))
+        }
+        
+    def _thaw(self):
+        """Move restored days into the in-memory buckets"""
+        for day, digests in self._frozen.items():
+            self.buckets.setdefault(day, set()).update(_split_digests(bytes(digests)))
+        self._frozen.clear()
+        self._frozen_indexes = []
+                
     def _ensure_directory(self):
-        """Ensure data directory exists"""
-        directory = os.path.dirname(self.history_file)
-        if directory and not os.path.exists(directory):
-            os.makedirs(directory)
+        """Ensure history directory exists"""
+        os.makedirs(os.path.join(self.history_dir, CLAIMS_DIR), exist_ok=True)
+        
+    def _load_history(self):
+        """Load segments of the processed articles journal not loaded yet"""
+        for day in sorted(os.listdir(self.history_dir)):
+            day_dir = os.path.join(self.history_dir, day)
+            if day == CLAIMS_DIR or not os.path.isdir(day_dir):
+                continue
+                
+            for filename in sorted(os.listdir(day_dir)):
+                segment = f"{day}/{filename}"
+                if not filename.endswith('.ids') or segment in self._loaded_segments:
+                    continue
+                try:
+                    with open(os.path.join(day_dir, filename), 'rb') as f:
+                        data = f.read()
+                except Exception as e:
+                    logger.error(f"Error loading history segment {day}/{filename}: {e}")
+                    continue
+                    
+                self.buckets.setdefault(day, set()).update(_split_digests(data))
+                self._loaded_segments.add(segment)
+                
+    def refresh(self):
+        """Pick up segments committed by other runs since loading"""
+        self._load_history()
+        
+    def _migrate_legacy_file(self, legacy_file: str):
+        """Import a JSON history file into the journal and remove it"""
+        try:
+            with open(legacy_file, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading legacy history {legacy_file}: {e}")
+            return
             
-    def _load_history(self) -> Dict[str, Any]:
-        """Load processed articles history"""
-        if os.path.exists(self.history_file):
-            try:
-                with open(self.history_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading history: {e}")
-                return {}
-        return {}
+        if data.get('version') == 2:
+            days = data.get('days', {})
+        else:
+            # {article_id: {'processed_at': iso}}; the date prefix is the bucket
+            days = {}
+            for article_id, entry in data.items():
+                days.setdefault(entry.get('processed_at', '')[:10], []).append(article_id)
+                
+        for day, article_ids in days.items():
+            if not day:
+                continue
+            self._thaw()
+            self._add_to_bucket(day, [self._digest(article_id) for article_id in article_ids])
+            self._write_segment(day, COMPACTED_SEGMENT, self.buckets[day])
+            
+        os.remove(legacy_file)
+        logger.info(f"Migrated {len(self)} entries from {legacy_file}")
+        
+    def _write_segment(self, day: str, filename: str, digests: Iterable[bytes]):
+        """Atomically write a sorted segment file"""
+        data = b''.join(sorted(digests))
+        if not data:
+            return
+            
+        day_dir = os.path.join(self.history_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        path = os.path.join(day_dir, filename)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
         
-    def _save_history(self):
-        """Save processed articles history"""
         try:
-            with open(self.history_file, 'w') as f:
-                json.dump(self.processed_articles, f, indent=2)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._loaded_segments.add(f"{day}/{filename}")
         except Exception as e:
-            logger.error(f"Error saving history: {e}")
+            logger.error(f"Error saving history segment {day}/{filename}: {e}")
             
-    def is_processed(self, article_id: str) -> bool:
-        """Check if article has been processed"""
-        return article_id in self.processed_articles
+    def _add_to_bucket(self, day: str, digests: Iterable[bytes]) -> Set[bytes]:
+        """Record digests under a day bucket and return the ones that were new"""
+        bucket = self.buckets.setdefault(day, set())
+        added = set()
+        for digest in digests:
+            if self._contains(digest):
+                continue
+            bucket.add(digest)
+            added.add(digest)
+        return added
+        
+    def _contains(self, digest: bytes) -> bool:
+        """Check every day bucket; there are only retention_days + 1 of them"""
+        for bucket in self.buckets.values():
+            if digest in bucket:
+                return True
+        return any(digest in index for index in self._frozen_indexes)
         
-    def add_processed_article(self, article_id: str):
+    def __len__(self) -> int:
+        self._thaw()
+        return sum(len(bucket) for bucket in self.buckets.values())
+        
+    @staticmethod
+    def _digest(article_id: Union[str, bytes]) -> bytes:
+        """Binary digest for a hex article ID"""
+        if isinstance(article_id, bytes):
+            return article_id
+        return bytes.fromhex(article_id)
+        
+    def is_processed(self, article_id: Union[str, bytes]) -> bool:
+        """Check if article has been processed"""
+        try:
+            return self._contains(self._digest(article_id))
+        except ValueError:
+            return False
+            
+    def add_processed_article(self, article_id: Union[str, bytes]):
         """Add article to processed history"""
-        self.processed_articles[article_id] = {
-            'processed_at': datetime.utcnow().isoformat()
-        }
-        self._save_history()
+        self.add_processed_articles([article_id])
+        
+    def add_processed_articles(self, article_ids: Iterable[Union[str, bytes]]):
+        """Append articles to processed history as one new segment"""
+        digests = [self._digest(article_id) for article_id in article_ids]
+        with self.lock:
+            self.refresh()
+            self._append_segment(digests)
+            
+    def add_processed_by_day(self, digests_by_day: Dict[str, Iterable[bytes]]):
+        """Append digests to the buckets of the given days, one new segment per day
+        
+        Used by backfills, so historical articles expire with the day they
+        were published rather than the day they were imported.
+        """
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        with self.lock:
+            self.refresh()
+            for day, digests in sorted(digests_by_day.items()):
+                added = self._add_to_bucket(day, digests)
+                self._write_segment(day, f"backfill-{stamp}-{_owner()}.ids", added)
+                
+    def _append_segment(self, digests: Iterable[bytes]):
+        """Write the new digests as a run segment; the caller holds the lock"""
+        now = datetime.utcnow()
+        day = now.strftime('%Y-%m-%d')
+        added = self._add_to_bucket(day, digests)
+        self._write_segment(day, f"run-{now.strftime('%Y%m%dT%H%M%S%f')}-{_owner()}.ids", added)
+        
+    def claim(self, article_ids: Iterable[Union[str, bytes]]) -> Set[bytes]:
+        """Reserve articles for delivery by this run
+        
+        Returns the digests that are neither processed nor claimed by another
+        live run. The claim lasts until commit() or release().
+        """
+        digests = [self._digest(article_id) for article_id in article_ids]
+        with self.lock:
+            self.refresh()
+            taken = self._active_claims()
+            claimed = {digest for digest in digests if digest not in taken and not self._contains(digest)}
+            
+            if self._claim_path is None:
+                self._claim_path = os.path.join(
+                    self.history_dir, CLAIMS_DIR, f"{_owner()}-{time.time_ns()}.ids"
+                )
+            with open(self._claim_path, 'ab') as f:
+                f.write(b''.join(sorted(claimed)))
+                
+        skipped = len(set(digests)) - len(claimed)
+        if skipped:
+            logger.info(f"Skipped {skipped} articles already delivered or claimed by another run")
+        return claimed
+        
+    def commit(self):
+        """Record this run's claimed articles as processed and drop the claim"""
+        if self._claim_path is None:
+            return
+            
+        with self.lock:
+            with open(self._claim_path, 'rb') as f:
+                digests = list(_split_digests(f.read()))
+            self.refresh()
+            self._append_segment(digests)
+            self.release()
+            
+    def release(self):
+        """Drop this run's claim without recording anything"""
+        if self._claim_path is None:
+            return
+            
+        try:
+            os.remove(self._claim_path)
+        except FileNotFoundError:
+            pass
+        self._claim_path = None
+        
+    def _active_claims(self) -> Set[bytes]:
+        """Digests claimed by other runs that have not expired"""
+        claims_dir = os.path.join(self.history_dir, CLAIMS_DIR)
+        cutoff = time.time() - CLAIM_TTL_SECONDS
+        taken = set()
+        
+        for filename in os.listdir(claims_dir):
+            path = os.path.join(claims_dir, filename)
+            if path == self._claim_path or not filename.endswith('.ids'):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    logger.warning(f"Removed stale claim {filename}")
+                    continue
+                with open(path, 'rb') as f:
+                    taken.update(_split_digests(f.read()))
+            except OSError:
+                continue
+                
+        return taken
         
     def cleanup_old_entries(self, retention_days: int):
-        """Remove old entries from history"""
-        cutoff_date = datetime.utcnow() - timedelta(days=retention_days)
+        """Remove old entries from history and compact closed days
+        
+        Expiry is per day: a day directory is deleted once its whole day is
+        older than the cutoff, so entries live between retention_days and
+        retention_days + 1 days. Both steps work from the day directories
+        on disk, leaving restored days frozen; cost is proportional to the
+        expired days and the segments compacted.
+        """
+        now = datetime.utcnow()
+        cutoff_day = (now - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+        
+        with self.lock:
+            # Day names are ISO dates, so string order is date order
+            expired_days = sorted(
+                {day for day in self._days() if day < cutoff_day} |
+                {day for day in list(self.buckets) + list(self._frozen) if day < cutoff_day}
+            )
+            
+            removed = 0
+            for day in expired_days:
+                day_dir = os.path.join(self.history_dir, day)
+                if os.path.isdir(day_dir):
+                    # Segment sizes count the entries without reading them
+                    sizes = [os.path.getsize(os.path.join(day_dir, name))
+                             for name in os.listdir(day_dir) if name.endswith('.ids')]
+                    removed += sum(sizes) // DIGEST_SIZE
+                    shutil.rmtree(day_dir, ignore_errors=True)
+                self.buckets.pop(day, None)
+                prefix = f"{day}/"
+                self._loaded_segments = {segment for segment in self._loaded_segments if not segment.startswith(prefix)}
+                
+            frozen_expired = [day for day in expired_days if day in self._frozen]
+            if frozen_expired:
+                for day in frozen_expired:
+                    del self._frozen[day]
+                # The combined index holds the expired days too
+                self._frozen_indexes = [SortedDigests(digests) for digests in self._frozen.values()]
+                
+            if expired_days:
+                logger.info(f"Cleaned up {removed} old entries")
+                
+            self._compact_closed_days(now.strftime('%Y-%m-%d'))
+            
+    def _days(self) -> List[str]:
+        """Day directories of the journal, in order"""
+        return sorted(
+            day for day in os.listdir(self.history_dir)
+            if day != CLAIMS_DIR and os.path.isdir(os.path.join(self.history_dir, day))
+        )
         
-        # Find entries to remove
-        to_remove = []
-        for article_id, data in self.processed_articles.items():
+    def _compact_closed_days(self, today: str):
+        """Merge the segments of days before today into one segment each, read from disk"""
+        for day in self._days():
+            if day >= today:
+                continue
+                
+            day_dir = os.path.join(self.history_dir, day)
+            segments = sorted(name for name in os.listdir(day_dir) if name.endswith('.ids'))
+            if segments == [COMPACTED_SEGMENT] or not segments:
+                continue
+                
+            digests = set()
             try:
-                processed_at = datetime.fromisoformat(data['processed_at'])
-                if processed_at < cutoff_date:
-                    to_remove.append(article_id)
+                for name in segments:
+                    with open(os.path.join(day_dir, name), 'rb') as f:
+                        data = f.read()
+                    digests.update(_split_digests(data))
+                    # Segments other runs committed since loading are taken in as well
+                    if f"{day}/{name}" not in self._loaded_segments:
+                        self.buckets.setdefault(day, set()).update(_split_digests(data))
             except Exception as e:
-                logger.error(f"Error parsing date for {article_id}: {e}")
+                logger.error(f"Error reading history segments of {day} for compaction: {e}")
+                continue
                 
-        # Remove old entries
-        for article_id in to_remove:
-            del self.processed_articles[article_id]
-            
-        if to_remove:
-            logger.info(f"Cleaned up {len(to_remove)} old entries")
-            self._save_history()
\ No newline at end of file
+            self._write_segment(day, COMPACTED_SEGMENT, digests)
+            for name in segments:
+                if name != COMPACTED_SEGMENT:
+                    os.remove(os.path.join(day_dir, name))
+                    self._loaded_segments.discard(f"{day}/{name}")
+            logger.info(f"Compacted {len(segments)} history segments for {day}")
+
+
+class SortedDigests:
+    """Sorted digests packed back to back in a buffer, searched in place
+    
+    Wraps a slice of a memory-mapped warm-start snapshot, so restoring the
+    history costs nothing until digests are looked up, by binary search.
+    """
+    
+    __slots__ = ('buffer', '_keys')
+    
+    def __init__(self, buffer):
+        """Wrap a buffer of sorted digests; numpy is imported on first use"""
+        import numpy as np
+        
+        self.buffer = buffer
+        # Fixed-width byte strings compare like the digests, byte by byte
+        self._keys = np.frombuffer(buffer, dtype=f"S{DIGEST_SIZE}")
+        
+    def __len__(self) -> int:
+        return len(self._keys)
+        
+    def __contains__(self, digest: bytes) -> bool:
+        index = int(self._keys.searchsorted(digest))
+        return index < len(self._keys) and self.buffer[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE] == digest
+
+
+def _split_digests(data: bytes) -> Iterable[bytes]:
+    """Digests packed back to back in a segment"""
+    return (data[i:i + DIGEST_SIZE] for i in range(0, len(data) - DIGEST_SIZE + 1, DIGEST_SIZE))
+
+
+def _owner() -> str:
+    """Host and process name safe for use in file names"""
+    host = re.sub(r'[^A-Za-z0-9.-]', '_', socket.gethostname()) or 'host'
+    return f"{host}-{os.getpid()}"
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Delivered stories and the messages carrying them, for adding later coverage in place
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .article import Article
+from .article_features import DESCRIPTION_PREFIX, ArticleFeatures, SimilarityIndex, normalize_text
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'enabled': False,
+    'max_age_hours': 24,          # Copies of older stories are sent as new messages
+    'max_sources': 5,             # Other outlets listed per story
+}
+
+# Days of message counts kept
+COUNT_DAYS = 30
+
+# A message edit: notifier key, message reference, its stories and their other outlets by story ID
+Edit = Tuple[str, List[Any], List[Dict[str, Any]], Dict[str, List[List[str]]]]
+
+
+class StoryIndex:
+    """Remember the messages that carried each delivered story
+    
+    A story is a delivered article plus the other outlets that covered it.
+    Notifiers able to edit their messages return a reference for each one
+    they send (Telegram chat and message ID, Slack channel and timestamp).
+    Articles of a later run similar to a delivered story are not sent
+    again: their outlets are added to the story, and each message carrying
+    it is edited once with the story's sources. Stories and messages
+    expire after max_age_hours, and only the fields a message is rendered
+    from are kept.
+    
+    Messages sent and edited and the sources added are counted per day.
+    """
+    
+    def __init__(self, path: Optional[str], settings: Optional[Dict[str, Any]] = None,
+                 similarity_threshold: float = 0.75):
+        """Load the unexpired stories and messages of earlier runs"""
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.path = path
+        self.max_age_hours = settings['max_age_hours']
+        self.max_sources = settings['max_sources']
+        self.similarity_threshold = similarity_threshold
+        # Counts added since the last save, merged into the store's on saving
+        self._counted: Dict[str, Dict[str, int]] = {}
+        
+        state = self._read()
+        self.stories: Dict[str, Dict[str, Any]] = state['stories']
+        self.messages: Dict[str, Dict[str, Any]] = state['messages']
+        self.counts: Dict[str, Dict[str, int]] = state['counts']
+        self._touched_stories = set()
+        self._touched_messages = set()
+        self._build_index()
+        
+    @staticmethod
+    def notifier_key(notifier) -> str:
+        """Key of a notifier that outlives config reloads: its channel and subscription"""
+        return f"{getattr(notifier, 'channel', '')}/{getattr(notifier, 'subscription', None) or ''}"
+        
+    def match(self, articles: List[Article], copies: Dict[bytes, List[Article]]
+              ) -> Tuple[List[Article], Dict[str, List[Article]]]:
+        """Split filtered articles into new stories and later copies of delivered ones
+        
+        copies are the articles the filter dropped as similar to each kept
+        one; they count as coverage of the same story. Returns the new
+        articles and, by story ID, the copies of delivered stories.
+        """
+        oldest = self._expire()
+        fresh = []
+        updates: Dict[str, List[Article]] = {}
+        for article in articles:
+            position = self._index.find_similar(article.features)
+            story_id = self._indexed[position] if position is not None else None
+            if story_id is None or story_id not in self.stories or self.stories[story_id]['ts'] < oldest:
+                fresh.append(article)
+                continue
+            updates.setdefault(story_id, []).append(article)
+            updates[story_id].extend(copies.get(article.digest, ()))
+            
+        followups = sum(len(found) for found in updates.values())
+        if followups:
+            logger.info(f"{followups} articles cover {len(updates)} stories already delivered")
+        return fresh, updates
+        
+    def other_sources(self, articles: Iterable[Article], copies: Dict[bytes, List[Article]]
+                      ) -> Dict[str, List[List[str]]]:
+        """Other outlets of each article, as [source, url], from the copies dropped as similar"""
+        also = {}
+        for article in articles:
+            sources = self._merge_sources(article.source, [], copies.get(article.digest, ()))
+            if sources:
+                also[article.id] = sources
+        return also
+        
+    def record(self, notifier, articles: List[Article], sent: List[Tuple[Any, List[str]]],
+               also: Dict[str, List[List[str]]]):
+        """Remember delivered articles as stories and the messages a notifier sent with them"""
+        now = time.time()
+        for article in articles:
+            if article.id in self.stories:
+                continue
+            self.stories[article.id] = {
+                'title': article.title,
+                'url': article.url,
+                'source': article.source,
+                'priority': article.priority,
+                # One character past what notifiers show, so they still mark the cut
+                'description': article.description[:DESCRIPTION_PREFIX + 1],
+                'also': also.get(article.id, []),
+                'ts': now,
+            }
+            self._touched_stories.add(article.id)
+            self._add_to_index(article.id)
+            
+        notifier_key = self.notifier_key(notifier)
+        for ref, story_ids in sent:
+            key = f"{notifier_key} {' '.join(str(part) for part in ref)}"
+            self.messages[key] = {'notifier': notifier_key, 'ref': list(ref), 'stories': list(story_ids), 'ts': now}
+            self._touched_messages.add(key)
+            for story_id in story_ids:
+                self._carriers.setdefault(story_id, []).append(key)
+        self._count('sent', len(sent))
+        
+    def add_sources(self, updates: Dict[str, List[Article]]) -> List[Edit]:
+        """Add the outlets of later copies to their stories; returns the message edits needed"""
+        self._expire()
+        changed = set()
+        added = 0
+        for story_id, found in updates.items():
+            story = self.stories.get(story_id)
+            if story is None:
+                continue
+            sources = self._merge_sources(story['source'], story['also'], found)
+            if len(sources) > len(story['also']):
+                added += len(sources) - len(story['also'])
+                story['also'] = sources
+                self._touched_stories.add(story_id)
+                changed.update(self._carriers.get(story_id, ()))
+        self._count('sources_added', added)
+        
+        edits = []
+        for key in sorted(changed):
+            message = self.messages.get(key)
+            if message is None:
+                continue
+            stories = [dict(self.stories[story_id], id=story_id) for story_id in message['stories'] if story_id in self.stories]
+            also = {story['id']: story['also'] for story in stories if story['also']}
+            edits.append((message['notifier'], message['ref'], stories, also))
+        return edits
+        
+    def count_edits(self, edited: int):
+        """Count the message edits that went through"""
+        self._count('edited', edited)
+        
+    def save(self):
+        """Log today's message counts and merge this process's stories and messages into the store"""
+        today = self.counts.get(_today())
+        if today:
+            logger.info(
+                f"Messages today: {today.get('sent', 0)} sent, {today.get('edited', 0)} edited "
+                f"with {today.get('sources_added', 0)} more sources"
+            )
+        if not self.path:
+            return
+            
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with FileLock(f"{self.path}.lock"):
+            state = self._read()
+            for story_id in self._touched_stories:
+                if story_id in self.stories:
+                    state['stories'][story_id] = self.stories[story_id]
+            for key in self._touched_messages:
+                state['messages'][key] = self.messages[key]
+            for day, counts in self._counted.items():
+                stored = state['counts'].setdefault(day, {})
+                for name, count in counts.items():
+                    stored[name] = stored.get(name, 0) + count
+            for day in sorted(state['counts'])[:-COUNT_DAYS]:
+                del state['counts'][day]
+                
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+            
+        self.counts = state['counts']
+        self._counted = {}
+        self._touched_stories.clear()
+        self._touched_messages.clear()
+        
+    def _merge_sources(self, source: str, sources: List[List[str]], found: Iterable[Article]) -> List[List[str]]:
+        """Sources plus the outlets of found articles other than source, up to max_sources"""
+        merged = list(sources)
+        seen = {source} | {name for name, _ in sources}
+        for article in found:
+            if len(merged) >= self.max_sources:
+                break
+            if article.source not in seen:
+                seen.add(article.source)
+                merged.append([article.source, article.url])
+        return merged
+        
+    def _expire(self) -> float:
+        """Drop stories and messages past max_age_hours, re-indexing if any went; returns the cutoff
+        
+        A long-running process keeps one index, so expiry cannot be left to
+        loading the store.
+        """
+        oldest = time.time() - self.max_age_hours * 3600
+        stories = [story_id for story_id, story in self.stories.items() if story['ts'] < oldest]
+        messages = [key for key, message in self.messages.items() if message['ts'] < oldest]
+        if not stories and not messages:
+            return oldest
+            
+        for story_id in stories:
+            del self.stories[story_id]
+            self._touched_stories.discard(story_id)
+        for key in messages:
+            del self.messages[key]
+            self._touched_messages.discard(key)
+        self._build_index()
+        return oldest
+        
+    def _build_index(self):
+        """Messages carrying each story, and the features of the stories for matching copies"""
+        self._carriers: Dict[str, List[str]] = {}
+        for key, message in self.messages.items():
+            for story_id in message['stories']:
+                self._carriers.setdefault(story_id, []).append(key)
+        self._index = SimilarityIndex(self.similarity_threshold)
+        self._indexed: List[str] = []
+        for story_id in self.stories:
+            self._add_to_index(story_id)
+            
+    def _add_to_index(self, story_id: str):
+        """Index a story's features for matching later copies"""
+        story = self.stories[story_id]
+        self._index.add(ArticleFeatures(normalize_text(story['title']), normalize_text(story['description'])))
+        self._indexed.append(story_id)
+        
+    def _count(self, name: str, count: int):
+        """Add to today's count of name, in memory and for the next save"""
+        if not count:
+            return
+        today = _today()
+        for counts in (self.counts, self._counted):
+            day = counts.setdefault(today, {})
+            day[name] = day.get(name, 0) + count
+            
+    def _read(self) -> Dict[str, Any]:
+        """Unexpired stories and messages of the store, and its daily counts"""
+        state = {'stories': {}, 'messages': {}, 'counts': {}}
+        if self.path:
+            try:
+                with open(self.path) as f:
+                    state.update(json.load(f))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable story index {self.path}: {e}")
+                
+        oldest = time.time() - self.max_age_hours * 3600
+        state['stories'] = {key: story for key, story in state['stories'].items() if story['ts'] >= oldest}
+        state['messages'] = {key: message for key, message in state['messages'].items() if message['ts'] >= oldest}
+        return state
+
+
+def _today() -> str:
+    """UTC date the daily counts are kept under"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
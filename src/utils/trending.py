@@ -0,0 +1,289 @@
+"""
+Trending entity detection with count-min sketches over hourly windows
+"""
+
+import os
+import math
+import time
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from .article import Article
+from .article_features import extract_entities
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'windows': 24,                # Hourly windows kept; the oldest is dropped as a new hour starts
+    'recent_hours': 2,            # Latest windows whose rate is compared with the rest
+    'min_history_hours': 6,       # Hours of baseline needed before anything is flagged
+    'min_count': 5,               # Articles naming an entity in the recent windows to flag it
+    'ratio': 3.0,                 # Recent rate over baseline rate to flag an entity
+    'z_score': 3.0,               # Standard deviations of the recent count above its expected count
+    'boost': 15,                  # Priority added to an article per trending entity it names
+    'width': 4096,                # Counters per sketch row
+    'depth': 4,                   # Sketch rows; estimates take the minimum over rows
+    'bloom_bits': 131072,         # Bits per window of the filter of counted articles
+}
+
+# Hash positions per article in the filter of counted articles
+BLOOM_HASHES = 4
+
+SECONDS_PER_WINDOW = 3600
+
+
+def trend_entities(article: Article) -> List[str]:
+    """Named entities of an article's title; numbers are left out"""
+    return sorted(entity for entity in extract_entities(article.title) if not entity[0].isdigit())
+
+
+class TrendTracker:
+    """Rates of entities across articles, in constant memory
+    
+    Each hourly window holds a count-min sketch of the entities named by
+    the articles published in it, and a Bloom filter of the articles
+    counted, so an article seen again by a later run or through another
+    feed is counted once. Memory is windows x (depth x width counters +
+    bloom_bits), whatever the number of distinct entities.
+    
+    An entity trends when it was named by at least min_count articles in
+    the recent windows, at ratio times its hourly rate over the baseline
+    windows before them and z_score deviations above the count that rate
+    predicts. Sketches only estimate counts, so candidates are
+    the entities of the articles being ranked.
+    
+    The state is an .npz file. save() adds this process's counts to the
+    stored ones under a lock, so overlapping runs do not lose counts.
+    """
+    
+    def __init__(self, path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None):
+        """Load sketches from path, if given"""
+        import numpy as np
+        
+        self.path = path
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.windows = settings['windows']
+        self.recent_hours = settings['recent_hours']
+        self.min_history_hours = settings['min_history_hours']
+        self.min_count = settings['min_count']
+        self.ratio = settings['ratio']
+        self.z_score = settings['z_score']
+        self.boost = settings['boost']
+        self.width = settings['width']
+        self.depth = settings['depth']
+        self.bloom_bits = settings['bloom_bits']
+        
+        self.sketches, self.blooms, self.window_ids, self.first_window = self._empty()
+        # Counts added since the last save, merged into the stored sketches then
+        self._added = np.zeros_like(self.sketches)
+        if path:
+            self._load()
+            
+    def observe(self, articles: Iterable[Article], now: Optional[float] = None) -> int:
+        """Count the entities of articles not counted before; returns the number counted"""
+        import numpy as np
+        
+        now = now or time.time()
+        current = int(now // SECONDS_PER_WINDOW)
+        self._advance(current)
+        
+        counted = 0
+        for article in articles:
+            window = int(article.published_ts // SECONDS_PER_WINDOW) if article.published_ts else current
+            if window > current:
+                window = current
+            if window <= current - self.windows:
+                continue
+                
+            slot = window % self.windows
+            if self.window_ids[slot] != window:
+                continue
+            positions, masks = self._bloom_bits(article.digest)
+            if self._seen(positions, masks):
+                continue
+            np.bitwise_or.at(self.blooms[slot], positions, masks)
+            
+            for entity in trend_entities(article):
+                self._increment(slot, entity)
+            counted += 1
+            
+        return counted
+        
+    def trending(self, entities: Iterable[str], now: Optional[float] = None) -> Dict[str, float]:
+        """Trending entities among the given ones, with their recent to baseline rate ratio"""
+        import numpy as np
+        
+        current = int((now or time.time()) // SECONDS_PER_WINDOW)
+        self._advance(current)
+        if self.first_window is None or current - self.first_window < self.min_history_hours:
+            return {}
+            
+        # Windows are split into recent ones and the baseline before them
+        recent = np.zeros(self.windows, dtype=bool)
+        baseline = np.zeros(self.windows, dtype=bool)
+        for window in range(current - self.windows + 1, current + 1):
+            slot = window % self.windows
+            if self.window_ids[slot] != window or window < self.first_window:
+                continue
+            if window > current - self.recent_hours:
+                recent[slot] = True
+            else:
+                baseline[slot] = True
+        baseline_hours = int(baseline.sum())
+        if not baseline_hours:
+            return {}
+            
+        found = {}
+        for entity in set(entities):
+            columns = self._columns(entity)
+            rows = np.arange(self.depth)
+            counts = self.sketches[:, rows, columns].min(axis=1)
+            recent_count = int(counts[recent].sum())
+            if recent_count < self.min_count:
+                continue
+            # One article of smoothing keeps entities new to the baseline from dividing by zero
+            recent_rate = recent_count / self.recent_hours
+            baseline_rate = (int(counts[baseline].sum()) + 1) / baseline_hours
+            if recent_rate < self.ratio * baseline_rate:
+                continue
+            # Counts are treated as Poisson, so rare entities need more than a chance cluster
+            expected = baseline_rate * self.recent_hours
+            if (recent_count - expected) / math.sqrt(expected + 1) >= self.z_score:
+                found[entity] = recent_rate / baseline_rate
+                
+        return found
+        
+    def rank(self, articles: List[Article], now: Optional[float] = None) -> Dict[str, float]:
+        """Boost the priority of articles naming trending entities; returns the trending entities"""
+        entities = {article.digest: trend_entities(article) for article in articles}
+        found = self.trending((entity for names in entities.values() for entity in names), now)
+        if not found:
+            return found
+            
+        for article in articles:
+            article.priority += self.boost * sum(1 for entity in entities[article.digest] if entity in found)
+            
+        top = sorted(found.items(), key=lambda item: item[1], reverse=True)[:10]
+        logger.info("Trending: " + ', '.join(f"{entity} ({ratio:.1f}x)" for entity, ratio in top))
+        return found
+        
+    def save(self):
+        """Add the counts of this process to the stored sketches"""
+        import numpy as np
+        
+        if not self.path:
+            return
+            
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with FileLock(f"{self.path}.lock"):
+            added, blooms, window_ids = self._added, self.blooms, self.window_ids
+            first_window = self.first_window
+            self.sketches, self.blooms, self.window_ids, self.first_window = self._empty()
+            self._load()
+            
+            # Windows the store has moved past are dropped; newer ones are taken from this process
+            for slot in range(self.windows):
+                window = int(window_ids[slot])
+                if window < 0 or window < self.window_ids[slot]:
+                    continue
+                if window > self.window_ids[slot]:
+                    self.sketches[slot] = 0
+                    self.blooms[slot] = 0
+                    self.window_ids[slot] = window
+                self.sketches[slot] += added[slot]
+                self.blooms[slot] |= blooms[slot]
+            if first_window is not None:
+                self.first_window = min(first_window, self.first_window or first_window)
+                
+            tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(
+                tmp_path, sketches=self.sketches, blooms=self.blooms, window_ids=self.window_ids,
+                first_window=np.array(-1 if self.first_window is None else self.first_window, dtype=np.int64)
+            )
+            os.replace(tmp_path, self.path)
+            
+        self._added = np.zeros_like(self.sketches)
+        
+    def _increment(self, slot: int, entity: str):
+        """Conservative update: raise only the counters at the entity's current estimate"""
+        import numpy as np
+        
+        columns = self._columns(entity)
+        rows = np.arange(self.depth)
+        counters = self.sketches[slot, rows, columns]
+        estimate = counters.min()
+        raise_rows = counters == estimate
+        self.sketches[slot, rows[raise_rows], columns[raise_rows]] += 1
+        self._added[slot, rows[raise_rows], columns[raise_rows]] += 1
+        
+    def _columns(self, entity: str) -> 'numpy.ndarray':
+        """Counter of an entity in each sketch row, by double hashing"""
+        import numpy as np
+        
+        digest = hashlib.blake2b(entity.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return np.array([(first + row * second) % self.width for row in range(self.depth)], dtype=np.int64)
+        
+    def _bloom_bits(self, digest: bytes) -> Tuple['numpy.ndarray', 'numpy.ndarray']:
+        """Bytes and bit masks of an article in a window's filter"""
+        import numpy as np
+        
+        digest = hashlib.blake2b(digest, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        bits = np.array([(first + i * second) % self.bloom_bits for i in range(BLOOM_HASHES)], dtype=np.int64)
+        return bits >> 3, (1 << (bits & 7)).astype(np.uint8)
+        
+    def _seen(self, positions: 'numpy.ndarray', masks: 'numpy.ndarray') -> bool:
+        """Check the filters of all live windows for an article"""
+        # Only the tested bytes of each window are gathered, never whole filters
+        hits = ((self.blooms[:, positions] & masks) == masks).all(axis=1)
+        return bool((hits & (self.window_ids >= 0)).any())
+        
+    def _advance(self, current: int):
+        """Start the windows up to the current hour, clearing the ones they replace"""
+        latest = int(self.window_ids.max())
+        # After a gap longer than all windows, the baseline starts over
+        if latest < 0 or current - latest >= self.windows:
+            self.first_window = None
+        for window in range(max(current - self.windows + 1, latest + 1), current + 1):
+            slot = window % self.windows
+            self.sketches[slot] = 0
+            self._added[slot] = 0
+            self.blooms[slot] = 0
+            self.window_ids[slot] = window
+        if self.first_window is None:
+            self.first_window = current
+            
+    def _empty(self) -> Tuple['numpy.ndarray', 'numpy.ndarray', 'numpy.ndarray', Optional[int]]:
+        """Zeroed sketches, filters and window IDs"""
+        import numpy as np
+        
+        return (
+            np.zeros((self.windows, self.depth, self.width), dtype=np.uint32),
+            np.zeros((self.windows, math.ceil(self.bloom_bits / 8)), dtype=np.uint8),
+            np.full(self.windows, -1, dtype=np.int64),
+            None
+        )
+        
+    def _load(self):
+        """Read the stored state if it matches the configured dimensions"""
+        import numpy as np
+        
+        try:
+            with np.load(self.path) as data:
+                sketches, blooms, window_ids = data['sketches'], data['blooms'], data['window_ids']
+                first_window = int(data['first_window'])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable trend store {self.path}: {e}")
+            return
+            
+        if sketches.shape != self.sketches.shape or blooms.shape != self.blooms.shape:
+            logger.warning(f"Trend store {self.path} has other dimensions than configured; starting over")
+            return
+        self.sketches, self.blooms, self.window_ids = sketches, blooms, window_ids
+        self.first_window = None if first_window < 0 else first_window
@@ -0,0 +1,133 @@
+"""
+URL canonicalization so the same article maps to one ID across feeds
+"""
+
+import logging
+from typing import Any, Dict, FrozenSet, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'cmpid', 'icid',
+    'ref', 'ref_src', 'ito', 'tpcc'
+})
+TRACKING_PREFIXES = ('utm_', 'at_', 'pk_', 'hsa_')
+
+# Host prefixes that serve the same content as the bare domain
+HOST_PREFIXES = ('www.', 'm.', 'amp.', 'mobile.')
+
+# Redirect wrappers: host -> query parameter holding the target URL
+REDIRECT_HOSTS = {
+    'google.com': 'url',
+    'news.google.com': 'url',
+    'l.facebook.com': 'u',
+    'out.reddit.com': 'url'
+}
+
+# Per-source rules; config may extend these under sources.<name>.url_rules
+SOURCE_RULES = {
+    'bloomberg': {'strip_params': ['srnd', 'sref', 'leadsource', 'embedded-checkout']},
+    'cnbc': {'strip_params': ['__source', 'par', 'qsearchterm']},
+    'ft': {'strip_params': ['ftcamp', 'segmentid', 'emailid', 'shareType', 'accesstoken']},
+    'wsj': {'strip_params': ['mod', 'st', 'reflink', 'cx_testid', 'cx_testvariant']},
+    'forbes': {'strip_params': ['sh', 'ss']},
+    'economist': {'strip_params': ['fsrc', 'ppccampaignid', 'ppcadid']}
+}
+
+
+class UrlCanonicalizer:
+    """Canonicalize article URLs and pick stable article keys for one source"""
+    
+    def __init__(self, source: str, rules: Optional[Dict[str, Any]] = None):
+        """Initialize with built-in rules for the source plus config overrides"""
+        self.source = source
+        merged = dict(SOURCE_RULES.get(source, {}))
+        if rules:
+            merged['strip_params'] = list(merged.get('strip_params', [])) + list(rules.get('strip_params', []))
+            if 'use_guid' in rules:
+                merged['use_guid'] = rules['use_guid']
+        self.strip_params: FrozenSet[str] = frozenset(p.lower() for p in merged.get('strip_params', []))
+        self.use_guid = merged.get('use_guid', True)
+        
+    def article_key(self, entry: Dict[str, Any]) -> str:
+        """Stable key for an RSS entry: the feed's guid if stable, else the canonical link"""
+        link = entry.get('link', '') or ''
+        guid = (entry.get('id', '') or '').strip()
+        
+        # A non-permalink guid is the feed's own stable identifier for the item
+        if self.use_guid and guid and not entry.get('guidislink') and not guid.startswith(('http://', 'https://')):
+            return f"{self.source}:guid:{guid}"
+            
+        return self.canonical(link or guid)
+        
+    def clean(self, url: str) -> str:
+        """Unwrap redirects and strip tracking parameters, keeping the original host"""
+        if not url:
+            return url
+            
+        try:
+            parts = urlsplit(self._unwrap_redirect(url.strip()))
+        except ValueError:
+            return url
+            
+        query = urlencode(self._filter_query(parts.query))
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+        
+    def canonical(self, url: str) -> str:
+        """Canonical form used for article IDs"""
+        if not url:
+            return url
+            
+        try:
+            parts = urlsplit(self._unwrap_redirect(url.strip()))
+        except ValueError:
+            return url
+            
+        host = self._normalize_host(parts.hostname or '')
+        
+        # Trailing slashes and AMP variants point to the same page
+        path = parts.path or '/'
+        if path.endswith('/amp') or path.endswith('/amp/'):
+            path = path[:path.rindex('/amp')]
+        path = path.rstrip('/') or '/'
+        
+        query = urlencode(sorted(self._filter_query(parts.query)))
+        
+        # Scheme is forced to https so http and https collapse
+        return urlunsplit(('https', host, path, query, ''))
+        
+    def _filter_query(self, query: str):
+        """Drop tracking and source-specific parameters"""
+        kept = []
+        for key, value in parse_qsl(query, keep_blank_values=True):
+            lowered = key.lower()
+            if lowered in TRACKING_PARAMS or lowered in self.strip_params:
+                continue
+            if lowered.startswith(TRACKING_PREFIXES):
+                continue
+            kept.append((key, value))
+        return kept
+        
+    def _normalize_host(self, host: str) -> str:
+        """Lowercase host without mirror prefixes"""
+        host = host.lower().rstrip('.')
+        for prefix in HOST_PREFIXES:
+            if host.startswith(prefix) and host.count('.') > 1:
+                host = host[len(prefix):]
+                break
+        return host
+        
+    def _unwrap_redirect(self, url: str) -> str:
+        """Follow query-string redirect wrappers without fetching them"""
+        for _ in range(3):
+            parts = urlsplit(url)
+            param = REDIRECT_HOSTS.get(self._normalize_host(parts.hostname or ''))
+            if not param:
+                break
+            target = dict(parse_qsl(parts.query)).get(param, '')
+            if not target.startswith(('http://', 'https://')):
+                break
+            url = target
+        return url
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Warm-start snapshot of state derived at startup, reused by the next run
+"""
+
+import os
+import mmap
+import pickle
+import struct
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+from .storage import SortedDigests
+
+logger = logging.getLogger(__name__)
+
+# Default location; the CI workflow caches data/cache between runs
+WARM_START_FILE = 'data/cache/warm_start.bin'
+
+# Bump when the layout of the snapshot or of the state in it changes
+FORMAT_VERSION = 1
+
+# Magic, format version, state key, checksum of the rest, length of the pickled state
+_HEADER = struct.Struct('<8sH32s32sQ')
+_MAGIC = b'NEWSWARM'
+
+
+def code_version() -> str:
+    """Hash of the source files, so snapshots written by other code are ignored"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name != '__pycache__')
+        for filename in sorted(filenames):
+            if not filename.endswith('.py'):
+                continue
+            path = os.path.join(directory, filename)
+            digest.update(os.path.relpath(path, root).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class WarmStart:
+    """Versioned, checksummed snapshot of a run's derived state
+    
+    The snapshot holds the parsed config and the processed history as
+    sorted digests, per day and across all days. It is keyed by the
+    snapshot format, the hash of the source files and the bytes of the
+    config file, so editing either makes the next run start cold and
+    write a fresh snapshot. The digests
+    are memory-mapped rather than read, and a checksum over the whole file
+    rejects truncated or corrupt snapshots.
+    
+    Layout: header, pickled state, then the digests of each day.
+    
+    Loading happens before logging is set up, since the snapshot holds the
+    config logging is set up from; why a snapshot was not used is kept in
+    outcome and logged by log_outcome() once logging is ready.
+    """
+    
+    def __init__(self, path: str, config_path: str):
+        """Compute the key snapshots must carry to be used"""
+        self.path = path
+        self.config_path = config_path
+        digest = hashlib.sha256(str(FORMAT_VERSION).encode('ascii'))
+        digest.update(code_version().encode('ascii'))
+        with open(config_path, 'rb') as f:
+            digest.update(f.read())
+        self.key = digest.digest()
+        # (level, message) explaining why the last load started cold
+        self.outcome: Optional[Tuple[int, str]] = None
+        
+    def load(self) -> Optional[Dict[str, Any]]:
+        """State of the last run, or None when there is no valid snapshot"""
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        except OSError as e:
+            self.outcome = (logging.WARNING, f"Ignoring unreadable warm-start snapshot {self.path}: {e}")
+            return None
+            
+        if len(mapped) < _HEADER.size:
+            return None
+        magic, version, key, checksum, state_length = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC or version != FORMAT_VERSION or key != self.key:
+            self.outcome = (logging.INFO, "Warm-start snapshot is stale (config or code changed); starting cold")
+            return None
+            
+        view = memoryview(mapped)[_HEADER.size:]
+        if hashlib.sha256(view).digest() != checksum:
+            self.outcome = (logging.WARNING, f"Ignoring corrupt warm-start snapshot {self.path}")
+            return None
+            
+        state = pickle.loads(view[:state_length])
+        history = state['history']
+        data = view[state_length:]
+        regions = {name: data[offset:offset + length] for name, (offset, length) in history.pop('regions').items()}
+        history['index'] = SortedDigests(regions.pop('index'))
+        history['days'] = regions
+        return state
+        
+    def log_outcome(self):
+        """Log why the last load started cold, if it did for a reason worth reporting"""
+        if self.outcome is not None:
+            logger.log(*self.outcome)
+            
+    def save(self, config: Dict[str, Any], storage):
+        """Write the snapshot for the next run; failures are logged"""
+        history = storage.snapshot()
+        blobs = list(history['days'].items()) + [('index', history['index'])]
+        regions = {}
+        offset = 0
+        for name, blob in blobs:
+            regions[name] = (offset, len(blob))
+            offset += len(blob)
+            
+        state = {
+            'config': config,
+            'history': {'history_dir': storage.history_dir, 'segments': history['segments'], 'regions': regions}
+        }
+        body = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        checksum = hashlib.sha256(body)
+        for _, blob in blobs:
+            checksum.update(blob)
+        header = _HEADER.pack(_MAGIC, FORMAT_VERSION, self.key, checksum.digest(), len(body))
+        
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(body)
+                for _, blob in blobs:
+                    f.write(blob)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to write warm-start snapshot {self.path}: {e}")
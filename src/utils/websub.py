@@ -0,0 +1,303 @@
+"""
+WebSub subscriber: pushed feed updates for the long-running mode
+"""
+
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .article import Article
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'lease_seconds': 86400,       # Lease asked of hubs; hubs may grant another
+    'renew_before_seconds': 3600, # Renew leases this long before they expire
+    'retry_seconds': 3600,        # Wait before asking a hub again after a failed request
+    'check_seconds': 60,          # Interval of the subscription maintenance loop
+    'batch_seconds': 2,           # Pushes arriving within this window go through the pipeline together
+}
+
+
+def hub_links(feed, feed_url: str) -> Tuple[Optional[str], str]:
+    """Hub URL and topic advertised by a parsed feed; the topic defaults to the feed URL"""
+    hub = None
+    topic = feed_url
+    for link in feed.get('feed', {}).get('links', []):
+        rel = link.get('rel')
+        if rel == 'hub' and not hub:
+            hub = link.get('href')
+        elif rel == 'self' and link.get('href'):
+            topic = link['href']
+    return hub, topic
+
+
+class WebSubSubscriber:
+    """Subscribe to the hubs of polled feeds and hand pushed entries to the pipeline
+    
+    Scrapers report the hub links of every feed they parse. Feeds with a
+    hub get a subscription: a POST to the hub naming an unguessable
+    callback URL and a secret. The hub verifies it by GETting the callback
+    with a challenge, which is echoed only for the pending topic. Content
+    pushed to the callback is checked against the secret's HMAC signature,
+    parsed by the scraper that owns the feed and passed to on_articles.
+    
+    Feeds with a verified, unexpired lease are not polled. Leases are
+    renewed before they expire; a lease that lapses, a hub that refuses or
+    fails puts the feed back on polling. Subscriptions are kept in a JSON
+    file so pushes to existing callbacks keep working across restarts.
+    """
+    
+    def __init__(self, callback_url: str, path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None,
+                 on_articles: Optional[Callable[[List[Article]], Awaitable[None]]] = None):
+        """Load subscriptions from path, if given"""
+        self.callback_url = callback_url.rstrip('/')
+        self.path = path
+        settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.lease_seconds = settings['lease_seconds']
+        self.renew_before_seconds = settings['renew_before_seconds']
+        self.retry_seconds = settings['retry_seconds']
+        self.check_seconds = settings['check_seconds']
+        self.batch_seconds = settings['batch_seconds']
+        self.on_articles = on_articles
+        
+        # Feed URL -> subscription record; tokens name callbacks
+        self.subscriptions: Dict[str, Dict[str, Any]] = self._read()
+        self._tokens = {record['token']: feed_url for feed_url, record in self.subscriptions.items()}
+        # Source name -> scraper parsing its pushed content
+        self._scrapers: Dict[str, Any] = {}
+        self._session = None
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._background = set()
+        self.pushes = 0
+        
+    def register(self, scraper):
+        """Have a scraper report the hubs of its feeds and parse their pushed content"""
+        scraper.websub = self
+        self._scrapers[scraper.source_name] = scraper
+        
+    def unregister(self, scraper):
+        """Stop parsing pushed content with a scraper that was replaced or removed"""
+        if self._scrapers.get(scraper.source_name) is scraper:
+            del self._scrapers[scraper.source_name]
+            
+    def discover(self, scraper, feed_url: str, feed):
+        """Note the hub of a parsed feed; new hubs are subscribed by the maintenance loop"""
+        hub, topic = hub_links(feed, feed_url)
+        if not hub:
+            return
+            
+        record = self.subscriptions.get(feed_url)
+        if record is not None and record['hub'] == hub and record['topic'] == topic:
+            return
+            
+        token = hashlib.sha256(os.urandom(32)).hexdigest()[:32]
+        self.subscriptions[feed_url] = {
+            'hub': hub,
+            'topic': topic,
+            'source': scraper.source_name,
+            'token': token,
+            'secret': os.urandom(20).hex(),
+            'state': 'new',
+            'expires': 0,
+            'retry_at': 0,
+        }
+        self._tokens[token] = feed_url
+        logger.info(f"Found WebSub hub {hub} for {feed_url}")
+        self._wakeup.set()
+        
+    def is_active(self, feed_url: str, now: Optional[float] = None) -> bool:
+        """Check if a feed is delivered by push, so polling can skip it"""
+        record = self.subscriptions.get(feed_url)
+        return bool(record and record['state'] == 'active' and record['expires'] > (now or time.time()))
+        
+    def routes(self) -> List[Tuple[str, str, Callable]]:
+        """(method, path, handler) of the callback endpoints, for the feed server"""
+        from urllib.parse import urlsplit
+        
+        path = urlsplit(self.callback_url).path.rstrip('/') or ''
+        return [
+            ('GET', f"{path}/{{token}}", self._handle_verification),
+            ('POST', f"{path}/{{token}}", self._handle_content),
+        ]
+        
+    async def start(self):
+        """Start the maintenance loop"""
+        import aiohttp
+        
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        self._task = asyncio.ensure_future(self._maintain())
+        
+    async def stop(self):
+        """Stop the maintenance loop and save subscriptions; leases are left to expire"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.save()
+        
+    async def maintain_once(self, now: Optional[float] = None):
+        """Subscribe new feeds, renew expiring leases and retry failed requests"""
+        now = now or time.time()
+        requests = []
+        for feed_url, record in self.subscriptions.items():
+            if record['state'] in ('new', 'failed', 'denied') and now >= record['retry_at']:
+                requests.append(feed_url)
+            elif record['state'] == 'active' and record['expires'] - now < self.renew_before_seconds:
+                requests.append(feed_url)
+            elif record['state'] == 'pending' and now >= record['retry_at']:
+                # The hub never verified; ask again
+                requests.append(feed_url)
+        if requests:
+            await asyncio.gather(*(self._subscribe(feed_url, now) for feed_url in requests))
+            self.save()
+            
+    async def _maintain(self):
+        """Run maintain_once whenever a hub is found, and every check_seconds"""
+        while True:
+            try:
+                await self.maintain_once()
+            except Exception as e:
+                logger.error(f"WebSub maintenance failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_seconds)
+            except asyncio.TimeoutError:
+                pass
+                
+    async def _subscribe(self, feed_url: str, now: float):
+        """Send a subscription request to a feed's hub"""
+        record = self.subscriptions[feed_url]
+        data = {
+            'hub.mode': 'subscribe',
+            'hub.topic': record['topic'],
+            'hub.callback': f"{self.callback_url}/{record['token']}",
+            'hub.lease_seconds': str(self.lease_seconds),
+            'hub.secret': record['secret'],
+        }
+        try:
+            async with self._session.post(record['hub'], data=data) as response:
+                status = response.status
+                text = (await response.text())[:200] if status >= 300 else ''
+        except Exception as e:
+            status, text = None, str(e)
+            
+        if status is not None and 200 <= status < 300:
+            # Verification arrives as a GET on the callback; a lease stays in force until then
+            if record['state'] != 'active':
+                record['state'] = 'pending'
+            record['retry_at'] = now + self.retry_seconds
+        else:
+            logger.warning(f"WebSub hub {record['hub']} refused {feed_url}: {status or ''} {text}".rstrip())
+            if record['state'] != 'active':
+                record['state'] = 'failed'
+            record['retry_at'] = now + self.retry_seconds
+            
+    async def _handle_verification(self, request):
+        """Answer a hub's intent verification, or record a denial"""
+        from aiohttp import web
+        
+        feed_url = self._tokens.get(request.match_info['token'])
+        record = self.subscriptions.get(feed_url) if feed_url else None
+        query = request.query
+        if record is None or query.get('hub.topic') != record['topic']:
+            return web.Response(status=404)
+            
+        mode = query.get('hub.mode')
+        if mode == 'denied':
+            record.update(state='denied', expires=0, retry_at=time.time() + self.retry_seconds)
+            logger.warning(f"WebSub hub denied {feed_url}: {query.get('hub.reason', '')}")
+            self.save()
+            return web.Response(text='')
+            
+        if mode != 'subscribe' or record['state'] not in ('pending', 'active'):
+            return web.Response(status=404)
+            
+        # A lease the hub garbles is taken as the one requested
+        try:
+            lease = int(query.get('hub.lease_seconds') or self.lease_seconds)
+        except ValueError:
+            lease = self.lease_seconds
+        record.update(state='active', expires=time.time() + lease)
+        logger.info(f"WebSub subscription to {feed_url} verified for {lease / 3600:.0f} hours")
+        self.save()
+        return web.Response(text=query.get('hub.challenge', ''))
+        
+    async def _handle_content(self, request):
+        """Accept pushed content; it is parsed and filtered after the hub has its answer"""
+        from aiohttp import web
+        
+        feed_url = self._tokens.get(request.match_info['token'])
+        record = self.subscriptions.get(feed_url) if feed_url else None
+        if record is None:
+            return web.Response(status=404)
+            
+        body = await request.read()
+        # Content with a missing or wrong signature is acknowledged and dropped, as WebSub asks
+        if not _signature_matches(request.headers.get('X-Hub-Signature', ''), record['secret'], body):
+            logger.warning(f"Dropping WebSub content for {feed_url} with a bad signature")
+            return web.Response(status=202)
+            
+        self.pushes += 1
+        headers = {key.lower(): value for key, value in request.headers.items()}
+        task = asyncio.ensure_future(self._ingest(feed_url, body, headers))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return web.Response(status=202)
+        
+    async def _ingest(self, feed_url: str, body: bytes, headers: Dict[str, str]):
+        """Parse pushed content with the feed's scraper and hand the articles on"""
+        scraper = self._scrapers.get(self.subscriptions[feed_url]['source'])
+        if scraper is None or self.on_articles is None:
+            logger.warning(f"No scraper for pushed content of {feed_url}")
+            return
+        try:
+            articles = scraper.parse_feed(feed_url, body, headers)
+            if articles:
+                logger.info(f"WebSub push for {feed_url}: {len(articles)} entries")
+                await self.on_articles(articles)
+        except Exception as e:
+            logger.error(f"Failed to process WebSub push for {feed_url}: {e}")
+            
+    def save(self):
+        """Write subscriptions to the store"""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.subscriptions, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        """Subscriptions from the store"""
+        if not self.path:
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Ignoring corrupt WebSub store {self.path}")
+            return {}
+
+
+def _signature_matches(header: str, secret: str, body: bytes) -> bool:
+    """Check an X-Hub-Signature header ("method=hexdigest") against the body"""
+    method, _, signature = header.partition('=')
+    if method not in ('sha1', 'sha256', 'sha384', 'sha512') or not signature:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, method).hexdigest()
+    return hmac.compare_digest(expected, signature.lower())